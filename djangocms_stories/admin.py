@@ -14,7 +14,7 @@ from django.contrib.admin.utils import unquote
 from django.contrib.sites.models import Site
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
-from django.db.models import Prefetch, signals
+from django.db.models import signals
 from django.http import Http404, HttpResponseRedirect
 from django.template.response import TemplateResponse
 from django.urls import path
@@ -499,6 +499,22 @@ class PostAdmin(
 
     # Make bulk action menu entries localizable
 
+    def get_search_fields(self, request):
+        """Content fields are searched in the full-text search index, if enabled"""
+        search_fields = super().get_search_fields(request)
+        if get_setting("ENABLE_SEARCH"):
+            return [field for field in search_fields if not field.startswith("content__")]
+        return search_fields
+
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if get_setting("ENABLE_SEARCH") and search_term.strip():
+            if not self.get_search_fields(request):
+                results = queryset.none()
+            contents = PostContent.admin_manager.search(search_term)
+            results = results | queryset.filter(pk__in=contents.values("post_id"))
+        return results, may_have_duplicates
+
     def get_list_filter(self, request):
         filters = [
             "categories",
@@ -646,7 +662,7 @@ class PostAdmin(
         if sites.exists():
             pks = list(sites.all().values_list("pk", flat=True))
             qs = qs.filter(sites__in=pks)
-        return qs.distinct().prefetch_related(Prefetch("postcontent_set", queryset=PostContent.admin_manager.all()))
+        return qs.distinct().with_contents(draft=True)
 
     def save_related(self, request, form, formsets, change):
         if self.get_restricted_sites(request).exists():
@@ -715,9 +731,10 @@ class ConfigAdmin(TranslatableAdmin):
                 _("Layout"),
                 {
                     "fields": (
-                        "paginate_by",
+                        ("paginate_by", "cursor_pagination"),
                         "url_patterns",
                         ("menu_structure", "menu_empty_categories"),
+                        ("menu_posts_grouping", "menu_posts_limit", "menu_posts_current_branch"),
                         "template_prefix",
                         ("default_image_full", "default_image_thumbnail"),
                     ),
@@ -786,13 +803,6 @@ class ConfigAdmin(TranslatableAdmin):
 
     def save_model(self, request, obj, form, change):
         """
-        Clear menu cache when changing menu structure
-        """
-        if "config.menu_structure" in form.changed_data:
-            from menus.menu_pool import menu_pool
-
-            menu_pool.clear(all=True)
-        """
         Reload urls when changing url config
         """
         if "config.urlconf" in form.changed_data:
@@ -1,5 +1,6 @@
 from django.apps import AppConfig
 from django.core.checks import Warning, register
+from django.db.models.signals import post_migrate
 from django.utils.translation import gettext_lazy as _
 
 
@@ -10,9 +11,18 @@ class BlogAppConfig(AppConfig):
 
     def ready(self):
         register(check_settings)
+        post_migrate.connect(create_search_structures, sender=self)
         return super().ready()
 
 
+def create_search_structures(sender, using="default", **kwargs):
+    from .search import create_search_structures
+    from .settings import get_setting
+
+    if get_setting("ENABLE_SEARCH"):
+        create_search_structures(using)
+
+
 def check_settings(*args, **kwargs):  # pragma: no cover
     from django.conf import settings
     from .settings import params
@@ -0,0 +1,222 @@
+"""
+Pre-generated sitemap shards and feeds.
+
+Sitemap sections of :py:class:`~djangocms_stories.sitemaps.StoriesSitemaps` (one page of
+50,000 urls per shard) and the latest entries feed of each config and language are rendered
+by the ``stories_build_artifacts`` command, gzip-compressed and written to the
+:ref:`ARTIFACTS_STORAGE <ARTIFACTS_STORAGE>` storage, in files named after their checksum.
+A :py:class:`~djangocms_stories.models.StoriesArtifact` row points each artifact to its current
+file: a new file is written first, then the row is updated, so readers never see a partial
+file. Unchanged artifacts are not written again.
+
+With :ref:`ARTIFACTS_ON_SAVE <ARTIFACTS_ON_SAVE>`, saving or deleting a post rebuilds the
+feeds of its config and, for each language, the sitemap shard of the post and the following
+ones (their items are shifted when posts are added or removed).
+
+Artifacts are built for the current site (``SITE_ID``), with the urls of its domain and of the
+:ref:`SITE_PROTOCOL <SITE_PROTOCOL>` scheme, and served by
+:py:func:`djangocms_stories.sitemaps.sitemap` and
+:py:class:`~djangocms_stories.feeds.LatestEntriesFeed` when present, dynamic rendering is used
+otherwise.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import posixpath
+import re
+import threading
+from functools import partial
+
+from cms.utils import get_language_list
+from django.contrib.sites.models import Site
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.db import transaction
+from django.http import HttpRequest, HttpResponse
+from django.template.loader import render_to_string
+from django.urls import NoReverseMatch, reverse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import quote_etag
+from django.utils.translation import override
+
+from .cms_appconfig import config_registry
+from .conditional import get_not_modified_response, set_validators
+from .models import StoriesArtifact
+from .settings import get_setting
+from .utils import get_site_request
+
+_accepts_gzip_re = re.compile(r"\bgzip\b")
+_pending = threading.local()
+
+
+def get_storage():
+    return storages[get_setting("ARTIFACTS_STORAGE")]
+
+
+def get_sitemap_name(site_id: int, section: str, page: int) -> str:
+    return f"sitemap/{site_id}/{section}-{page}.xml"
+
+
+def get_feed_name(site_id: int, namespace: str, language: str) -> str:
+    return f"feed/{site_id}/{namespace}-{language}.xml"
+
+
+def get_artifact(name: str) -> StoriesArtifact | None:
+    return StoriesArtifact.objects.filter(name=name).first()
+
+
+def write_artifact(name: str, content: bytes, content_type: str) -> bool:
+    """
+    Store the artifact content, unless it is unchanged.
+
+    :return: whether the artifact has been written
+    """
+    checksum = hashlib.sha256(content).hexdigest()
+    artifact = get_artifact(name)
+    if artifact and artifact.checksum == checksum:
+        return False
+    storage = get_storage()
+    stem, extension = posixpath.splitext(name)
+    path = f"{get_setting('ARTIFACTS_PATH')}/{stem}.{checksum[:16]}{extension}.gz"
+    if not storage.exists(path):
+        path = storage.save(path, ContentFile(gzip.compress(content, mtime=0)))
+    StoriesArtifact.objects.update_or_create(
+        name=name, defaults={"file": path, "checksum": checksum, "content_type": content_type}
+    )
+    if artifact and artifact.file != path:
+        transaction.on_commit(partial(storage.delete, artifact.file))
+    return True
+
+
+def delete_artifacts(artifacts) -> None:
+    """Delete the artifacts of the queryset and their files"""
+    storage = get_storage()
+    for path in artifacts.values_list("file", flat=True):
+        transaction.on_commit(partial(storage.delete, path))
+    artifacts.delete()
+
+
+def serve_artifact(request: HttpRequest, artifact: StoriesArtifact) -> HttpResponse | None:
+    """
+    Returns the response serving the artifact, compressed if the client accepts it, or
+    ``None`` if its file is missing.
+    """
+    validators = (quote_etag(artifact.checksum), artifact.date_modified)
+    response = get_not_modified_response(request, validators)
+    if response is None:
+        try:
+            with get_storage().open(artifact.file) as file:
+                content = file.read()
+        except OSError:
+            return None
+        if _accepts_gzip_re.search(request.headers.get("Accept-Encoding", "")):
+            response = HttpResponse(content, content_type=artifact.content_type)
+            response.headers["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(gzip.decompress(content), content_type=artifact.content_type)
+        set_validators(response, validators)
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
+
+
+def build_sitemap(namespace: str, language: str, first_page: int = 1) -> int:
+    """
+    Build the sitemap shards of the config and language, from the given page.
+
+    Shards after the last page are deleted.
+
+    :return: number of written shards
+    """
+    from .sitemaps import StoriesSitemaps
+
+    site = Site.objects.get_current()
+    section = StoriesSitemaps.get_section_name(namespace, language)
+    sitemap = StoriesSitemaps.sitemap_class(namespace, language)
+    paginator = sitemap.paginator
+    num_pages = paginator.num_pages if paginator.count else 0
+    written = 0
+    for page in range(first_page, num_pages + 1):
+        urls = sitemap.get_urls(page=page, site=site, protocol=get_setting("SITE_PROTOCOL"))
+        content = render_to_string("sitemap.xml", {"urlset": urls}).encode("utf-8")
+        written += write_artifact(get_sitemap_name(site.pk, section, page), content, "application/xml")
+    stale = []
+    prefix = f"sitemap/{site.pk}/{section}-"
+    for name in StoriesArtifact.objects.filter(name__startswith=prefix).values_list("name", flat=True):
+        page = name[len(prefix) : -len(".xml")]
+        if page.isdigit() and int(page) > num_pages:
+            stale.append(name)
+    delete_artifacts(StoriesArtifact.objects.filter(name__in=stale))
+    return written
+
+
+def build_feed(namespace: str, language: str) -> int:
+    """
+    Build the latest entries feed of the config in the given language.
+
+    :return: number of written feeds
+    """
+    from .feeds import LatestEntriesFeed
+
+    name = get_feed_name(Site.objects.get_current().pk, namespace, language)
+    with override(language):
+        try:
+            path = reverse(f"{namespace}:posts-latest-feed", current_app=namespace)
+        except NoReverseMatch:
+            delete_artifacts(StoriesArtifact.objects.filter(name=name))
+            return 0
+        request = get_site_request(path, language)
+        feed = LatestEntriesFeed()
+        feed.serve_artifacts = False
+        response = feed(request)
+    return int(write_artifact(name, response.content, response.headers["Content-Type"]))
+
+
+def build_artifacts(namespaces=None, languages=None) -> int:
+    """
+    Build all the sitemap shards and feeds.
+
+    :param namespaces: only build the artifacts of these configs
+    :param languages: only build the artifacts in these languages
+    :return: number of written artifacts
+    """
+    written = 0
+    for config in config_registry.all():
+        if namespaces and config.namespace not in namespaces:
+            continue
+        for language in languages or get_language_list():
+            written += build_sitemap(config.namespace, language) + build_feed(config.namespace, language)
+    return written
+
+
+def update_artifacts(namespace: str, language: str, content_pk: int) -> int:
+    """
+    Rebuild the artifacts affected by a changed post content: the feed and the sitemap shards
+    from the one listing the content.
+
+    :return: number of written artifacts
+    """
+    from .sitemaps import StoriesSitemaps
+
+    sitemap = StoriesSitemaps.sitemap_class(namespace, language)
+    first_page = sitemap.get_queryset().filter(pk__lt=content_pk).count() // sitemap.limit + 1
+    return build_sitemap(namespace, language, first_page) + build_feed(namespace, language)
+
+
+def _flush_artifacts() -> None:
+    pending = _pending.__dict__.pop("contents", {})
+    for (namespace, language), content_pk in pending.items():
+        if config_registry.get(namespace):
+            update_artifacts(namespace, language, content_pk)
+
+
+def schedule_artifacts(namespace: str, language: str, content_pk: int) -> None:
+    """
+    Rebuild the artifacts affected by a changed post content once the transaction is
+    committed. Changes in the same transaction are coalesced.
+    """
+    contents = _pending.__dict__.setdefault("contents", {})
+    key = (namespace, language)
+    contents[key] = min(contents.get(key, content_pk), content_pk)
+    transaction.on_commit(_flush_artifacts)
@@ -0,0 +1,139 @@
+"""
+Cache helpers for djangocms-stories.
+
+Cached values which depend on many objects are not deleted one by one: their keys embed a
+*generation* number which is bumped when any of the underlying objects change, so that stale
+entries are not read anymore and just expire.
+
+Expensive values are computed once, even when many requests miss them at the same time
+(see :py:func:`get_or_compute`):
+
+* the process computing a value holds a lock key in the cache, the other ones wait for it;
+* expired values are kept for :ref:`CACHE_STALE_TIMEOUT <CACHE_STALE_TIMEOUT>` more seconds
+  and served while a single process computes the new one;
+* values are recomputed a bit before they expire, with a probability growing as the expiry
+  approaches and with the time taken to compute them ("XFetch" early expiry).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import random
+import time
+from typing import Any, Callable, NamedTuple
+
+from django.core.cache import cache
+
+from .settings import get_setting
+
+GENERATION_KEY = "djangocms-stories:generation:{}"
+MODIFIED_KEY = "djangocms-stories:modified:{}"
+LOCK_KEY = "{}:lock"
+LOCK_POLL_INTERVAL = 0.05
+
+
+class CacheEntry(NamedTuple):
+    """A cached value, with the time it becomes stale and the seconds it took to compute."""
+
+    value: Any
+    expires: float
+    delta: float = 0.0
+
+
+def get_generation(name: str) -> int:
+    """Returns the current generation of the named cache."""
+    key = GENERATION_KEY.format(name)
+    generation = cache.get(key)
+    if generation is None:
+        # Start from a timestamp: after an eviction, old generations are never reused
+        cache.add(key, time.time_ns(), None)
+        cache.add(MODIFIED_KEY.format(name), time.time(), None)
+        generation = cache.get(key, time.time_ns())
+    return generation
+
+
+def get_modified(name: str) -> float | None:
+    """Returns the timestamp of the last invalidation of the named cache."""
+    return cache.get(MODIFIED_KEY.format(name))
+
+
+def bump_generation(name: str) -> None:
+    """Invalidates all the entries of the named cache."""
+    key = GENERATION_KEY.format(name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+    cache.set(MODIFIED_KEY.format(name), time.time(), None)
+
+
+def get_cache_key(name: str, *parts) -> str:
+    """Returns the cache key of an entry of the named cache for the current generation."""
+    digest = hashlib.md5(":".join(str(part) for part in parts).encode("utf-8"), usedforsecurity=False).hexdigest()
+    return f"djangocms-stories:{name}:{get_generation(name)}:{digest}"
+
+
+def make_entry(value: Any, timeout: float | None, delta: float = 0.0) -> tuple[CacheEntry, float | None]:
+    """Returns the entry of the value and the timeout to store it with, including the stale period."""
+    if timeout is None:
+        return CacheEntry(value, math.inf, delta), None
+    return CacheEntry(value, time.time() + timeout, delta), timeout + get_setting("CACHE_STALE_TIMEOUT")
+
+
+def set_entry(key: str, value: Any, timeout: float | None, delta: float = 0.0) -> None:
+    entry, timeout = make_entry(value, timeout, delta)
+    cache.set(key, entry, timeout)
+
+
+def needs_refresh(entry: CacheEntry) -> bool:
+    """Returns whether the entry is stale, or should be recomputed early."""
+    jitter = -entry.delta * get_setting("CACHE_EARLY_EXPIRY_BETA") * math.log(1.0 - random.random())
+    return time.time() + jitter >= entry.expires
+
+
+def acquire_lock(key: str) -> bool:
+    """Lock the computation of the cached value; returns ``False`` if another process holds the lock."""
+    return cache.add(LOCK_KEY.format(key), True, get_setting("CACHE_LOCK_TIMEOUT"))
+
+
+def release_lock(*keys: str) -> None:
+    cache.delete_many([LOCK_KEY.format(key) for key in keys])
+
+
+def _compute(key: str, compute: Callable[[], Any], timeout: float | None) -> Any:
+    start = time.monotonic()
+    try:
+        value = compute()
+        set_entry(key, value, timeout, time.monotonic() - start)
+    finally:
+        release_lock(key)
+    return value
+
+
+def get_or_compute(key: str, compute: Callable[[], Any], timeout: float | None) -> Any:
+    """
+    Returns the cached value of the key, computing it once for all the concurrent readers.
+
+    :param key: cache key
+    :param compute: callable returning the value
+    :param timeout: seconds the value is fresh for (``None`` for ever, ``0`` disables the cache)
+    """
+    if timeout == 0:
+        return compute()
+    entry = cache.get(key)
+    if isinstance(entry, CacheEntry):
+        if needs_refresh(entry) and acquire_lock(key):
+            return _compute(key, compute, timeout)
+        # Fresh, or stale while another process computes it
+        return entry.value
+    deadline = time.monotonic() + get_setting("CACHE_LOCK_TIMEOUT")
+    while not acquire_lock(key):
+        if time.monotonic() >= deadline:
+            # The process holding the lock is too slow or died
+            return compute()
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(key)
+        if isinstance(entry, CacheEntry):
+            return entry.value
+    return _compute(key, compute, timeout)
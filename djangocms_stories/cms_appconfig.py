@@ -1,14 +1,19 @@
 from __future__ import annotations
 
+import copy
+import threading
+from collections import defaultdict
+
 from cms.apphook_pool import apphook_pool
 from django.db import models
 from django.http import HttpRequest
 from django.urls import Resolver404, resolve
-from django.utils.translation import get_language_from_request, gettext_lazy as _, override
+from django.utils.translation import get_language, get_language_from_request, gettext_lazy as _, override
 from filer.models import ThumbnailOption
 from parler.models import TranslatableModel, TranslatedFields
 
-from .settings import MENU_TYPE_COMPLETE, get_setting
+from .cache import bump_generation, get_generation
+from .settings import MENU_POSTS_BY_CATEGORY, MENU_POSTS_GROUPINGS, MENU_TYPE_COMPLETE, get_setting
 
 config_defaults = {
     "default_image_full": None,
@@ -19,9 +24,13 @@ config_defaults = {
     "use_related": int(get_setting("USE_RELATED")),
     "set_author": get_setting("AUTHOR_DEFAULT"),
     "paginate_by": get_setting("PAGINATION"),
+    "cursor_pagination": False,
     "template_prefix": "",
     "menu_structure": MENU_TYPE_COMPLETE,
     "menu_empty_categories": get_setting("MENU_EMPTY_CATEGORIES"),
+    "menu_posts_grouping": MENU_POSTS_BY_CATEGORY,
+    "menu_posts_limit": 0,
+    "menu_posts_current_branch": False,
     "sitemap_changefreq": get_setting("SITEMAP_CHANGEFREQ_DEFAULT"),
     "sitemap_priority": get_setting("SITEMAP_PRIORITY_DEFAULT"),
     "object_type": get_setting("TYPE"),
@@ -61,9 +70,13 @@ class StoriesConfig(TranslatableModel):
         urlconf (models.CharField): Represents the URL config.
         set_author (models.BooleanField): Represents whether to set author by default.
         paginate_by (models.SmallIntegerField): Represents the number of articles per page for pagination.
+        cursor_pagination (models.BooleanField): Represents whether to use keyset pagination in list views.
         template_prefix (models.CharField): Represents the alternative directory to load the stories templates from.
         menu_structure (models.CharField): Represents the menu structure.
         menu_empty_categories (models.BooleanField): Represents whether to show empty categories in menu.
+        menu_posts_grouping (models.CharField): Represents how the post nodes are grouped in the menu.
+        menu_posts_limit (models.PositiveSmallIntegerField): Represents the number of post nodes per group in menu.
+        menu_posts_current_branch (models.BooleanField): Represents whether to show the posts of the viewed group only.
         sitemap_changefreq (models.CharField): Represents the changefreq attribute for sitemap items.
         sitemap_priority (models.DecimalField): Represents the priority attribute for sitemap items.
         object_type (models.CharField): Represents the object type.
@@ -153,6 +166,15 @@ class StoriesConfig(TranslatableModel):
         null=True,
         help_text=_("When paginating list views, how many articles per page?"),
     )
+    #: Use keyset pagination in list views (default: ``False``)
+    cursor_pagination = models.BooleanField(
+        verbose_name=_("Cursor pagination"),
+        default=config_defaults["cursor_pagination"],
+        help_text=_(
+            "Paginate list views with next / previous links only. "
+            "Recommended for large archives as pages do not need to count the articles."
+        ),
+    )
     #: Alternative directory to load the stories templates from (default: "")
     template_prefix = models.CharField(
         max_length=200,
@@ -172,6 +194,29 @@ class StoriesConfig(TranslatableModel):
         verbose_name=_("Show empty categories in menu"),
         help_text=_("Show categories with no post attached in the menu"),
     )
+    #: Grouping of the post nodes in menu (default: ``MENU_POSTS_BY_CATEGORY``)
+    menu_posts_grouping = models.CharField(
+        max_length=20,
+        choices=MENU_POSTS_GROUPINGS,
+        default=config_defaults["menu_posts_grouping"],
+        verbose_name=_("Menu posts grouping"),
+        help_text=_("Show the posts under their category, or under year and month nodes"),
+    )
+    #: Latest posts shown in each group of the menu, 0 for all (default: ``0``)
+    menu_posts_limit = models.PositiveSmallIntegerField(
+        default=config_defaults["menu_posts_limit"],
+        verbose_name=_("Menu posts limit"),
+        help_text=_("Number of latest posts shown in each category or month of the menu, 0 for all"),
+    )
+    #: Show the posts of the viewed category or month only (default: ``False``)
+    menu_posts_current_branch = models.BooleanField(
+        default=config_defaults["menu_posts_current_branch"],
+        verbose_name=_("Menu posts of current branch only"),
+        help_text=_(
+            "Only show the posts of the category or month being viewed. "
+            "Recommended for large archives as the cached menu stays small."
+        ),
+    )
     #: Sitemap changefreq (default: :ref:`SITEMAP_CHANGEFREQ_DEFAULT <SITEMAP_CHANGEFREQ_DEFAULT>`,
     #: see: :ref:`SITEMAP_CHANGEFREQ <SITEMAP_CHANGEFREQ>`)
     sitemap_changefreq = models.CharField(
@@ -242,20 +287,6 @@ class StoriesConfig(TranslatableModel):
     def get_app_title(self):
         return getattr(self, "app_title", _("untitled"))
 
-    def save(self, *args, **kwargs):
-        """Delete menu cache upon safe"""
-        from menus.menu_pool import menu_pool
-
-        menu_pool.clear(all=True)
-        return super().save(*args, **kwargs)
-
-    def delete(self, *args, **kwargs):
-        """Delete menu cache upon delete"""
-        from menus.menu_pool import menu_pool
-
-        menu_pool.clear(all=True)
-        return super().delete(*args, **kwargs)
-
     @property
     def schemaorg_type(self):
         """Compatibility shim to fetch data from legacy gplus_type field."""
@@ -268,6 +299,80 @@ class StoriesConfig(TranslatableModel):
             return str(e)
 
 
+class StoriesConfigRegistry:
+    """
+    In-process registry of the :py:class:`StoriesConfig` instances, with their translations.
+
+    Configurations are loaded once per process and reloaded when the ``stories-config`` cache
+    generation changes: as it's bumped when any configuration is saved or deleted, all the
+    processes sharing the cache see the changes.
+
+    Each lookup returns a copy of the registered instance, set to the current language.
+    """
+
+    generation_name = "stories-config"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = None
+        self._by_namespace = {}
+        self._by_pk = {}
+
+    def _load(self) -> None:
+        generation = get_generation(self.generation_name)
+        if generation == self._generation:
+            return
+        with self._lock:
+            configs = list(
+                StoriesConfig.objects.select_related("default_image_full", "default_image_thumbnail")
+                .prefetch_related("translations")
+                .order_by("namespace")
+            )
+            self._by_namespace = {config.namespace: config for config in configs}
+            self._by_pk = {config.pk: config for config in configs}
+            self._generation = generation
+
+    @staticmethod
+    def _get_copy(config: StoriesConfig | None) -> StoriesConfig | None:
+        if config is None:
+            return None
+        # The copy owns its translations: changing them must not change the registered instance
+        translations = config._prefetched_objects_cache["translations"]
+        copies = [copy.copy(translation) for translation in translations]
+        prefetched = translations._chain()
+        prefetched._result_cache, prefetched._prefetch_done = copies, True
+        config = copy.copy(config)
+        config._prefetched_objects_cache = {**config._prefetched_objects_cache, "translations": prefetched}
+        config._translations_cache = defaultdict(
+            dict, {translations.model: {translation.language_code: translation for translation in copies}}
+        )
+        config.set_current_language(get_language() or config.get_current_language())
+        return config
+
+    def get(self, namespace: str) -> StoriesConfig | None:
+        """Return the configuration with the given namespace, ``None`` if it does not exist."""
+        self._load()
+        return self._get_copy(self._by_namespace.get(namespace))
+
+    def get_by_pk(self, pk: int) -> StoriesConfig | None:
+        """Return the configuration with the given primary key, ``None`` if it does not exist."""
+        self._load()
+        return self._get_copy(self._by_pk.get(pk))
+
+    def all(self) -> list[StoriesConfig]:
+        """Return all the configurations, sorted by namespace."""
+        self._load()
+        return [self._get_copy(config) for config in self._by_namespace.values()]
+
+    def clear(self) -> None:
+        """Reload the configurations in all the processes on next access."""
+        bump_generation(self.generation_name)
+        self._generation = None
+
+
+config_registry = StoriesConfigRegistry()
+
+
 def get_namespace_from_request(request: HttpRequest) -> str:
     """
     Return current app instance namespace
@@ -295,8 +400,5 @@ def get_app_instance(request: HttpRequest) -> tuple[str, StoriesConfig | None]:
                 namespace = get_namespace_from_request(request)
                 config = app.get_config(namespace)
     else:
-        try:
-            config = StoriesConfig.objects.get(namespace=namespace)
-        except (StoriesConfig.DoesNotExist, StoriesConfig.MultipleObjectsReturned):
-            pass
+        config = config_registry.get(namespace)
     return namespace, config
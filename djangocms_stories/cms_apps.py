@@ -1,9 +1,9 @@
 from cms.app_base import CMSApp
 from cms.apphook_pool import apphook_pool
-from django.core.exceptions import ObjectDoesNotExist
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
+from .cms_appconfig import config_registry
 from .cms_menus import PostCategoryMenu
 from .models import StoriesConfig
 from .settings import get_setting
@@ -45,10 +45,7 @@ class StoriesApp(CMSApp):
         return self.app_config.objects.all()
 
     def get_config(self, namespace):
-        try:
-            return self.app_config.objects.get(namespace=namespace)
-        except ObjectDoesNotExist:
-            return None
+        return config_registry.get(namespace)
 
     def get_config_add_url(self):
         try:
@@ -48,12 +48,12 @@ class StoriesCMSConfig(CMSAppConfig):
         from django.utils.translation import gettext
         from django.utils.functional import lazy
 
-        from .cms_appconfig import StoriesConfig
+        from .cms_appconfig import config_registry
         from .cms_wizards import PostWizard, PostWizardForm
 
         def generator():
             try:
-                for item, config in enumerate(StoriesConfig.objects.all().order_by("namespace"), start=1):
+                for item, config in enumerate(config_registry.all(), start=1):
                     seed = f"Story{item}Wizard"
                     new_wizard = type(str(seed), (PostWizard,), {})
                     new_form = type(f"{seed}Form", (PostWizardForm,), {"default_appconfig": config.pk})
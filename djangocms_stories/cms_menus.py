@@ -1,18 +1,94 @@
+from __future__ import annotations
+
 import logging
+import threading
+import weakref
+from collections import defaultdict
+from functools import partial
 
 from cms.apphook_pool import apphook_pool
 from cms.menu_bases import CMSAttachMenu
 from django.contrib.sites.shortcuts import get_current_site
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber, TruncMonth
+from django.urls import reverse
+from django.utils.formats import date_format
+from django.utils.timezone import localtime
 from django.utils.translation import get_language_from_request, gettext_lazy as _
 from menus.base import Modifier, NavigationNode
 from menus.menu_pool import menu_pool
+from parler.utils.i18n import get_active_language_choices
 
-from djangocms_stories.cms_appconfig import get_namespace_from_request
+from djangocms_stories.cms_appconfig import config_registry, get_namespace_from_request
 
-from .models import PostCategory, StoriesConfig, PostContent
-from .settings import MENU_TYPE_CATEGORIES, MENU_TYPE_COMPLETE, MENU_TYPE_POSTS, get_setting
+from .models import Post, PostCategory, PostContent, StoriesConfig
+from .permalinks import get_category_slug, get_permalink_builder
+from .settings import MENU_POSTS_BY_DATE, MENU_TYPE_CATEGORIES, MENU_TYPE_COMPLETE, MENU_TYPE_POSTS, get_setting
 
 logger = logging.getLogger(__name__)
+_pending = threading.local()
+
+
+def _translate(translations: dict, languages) -> str | None:
+    """Returns the first translation in the given languages"""
+    return next((translations[code] for code in languages if code in translations), None)
+
+
+def get_post_contents(request, config: StoriesConfig, language: str):
+    """Returns the post contents of the config shown in the menu: current versions in edit mode, published otherwise"""
+    site = get_current_site(request)
+    if getattr(request, "toolbar", False) and request.toolbar.edit_mode_active:
+        post_contents = PostContent.admin_manager.current_content(language=language)
+    else:
+        post_contents = PostContent.objects.filter(language=language)
+    return post_contents.filter(app_config=config.pk).on_site(site)
+
+
+def get_post_rows(post_contents, config: StoriesConfig, categories_menu: bool) -> list[dict]:
+    """
+    Returns the values of the post nodes, with their primary category id and month.
+
+    With :py:attr:`~djangocms_stories.cms_appconfig.StoriesConfig.menu_posts_limit`, only the latest
+    posts of each month (or category, in menus with categories) are returned.
+    """
+    limit = config.menu_posts_limit
+    rows = post_contents.annotate(
+        primary_category_id=F("post__primary_category_id"), month=TruncMonth("date_published")
+    )
+    if limit:
+        if config.menu_posts_grouping == MENU_POSTS_BY_DATE:
+            partition_by = [F("month")]
+        elif categories_menu:
+            partition_by = [F("primary_category_id")]
+        else:
+            partition_by = None
+        order_by = [F("date_published").desc(nulls_last=True), F("pk").desc()]
+        rows = rows.annotate(menu_rank=Window(RowNumber(), partition_by=partition_by, order_by=order_by)).filter(
+            menu_rank__lte=limit
+        )
+    return list(
+        rows.values(
+            "pk",
+            "title",
+            "slug",
+            "post_id",
+            "date_featured",
+            "date_published",
+            "post__date_created",
+            "primary_category_id",
+            "post__primary_category_slugs",
+            "month",
+        )
+    )
+
+
+def _make_post_node(row: dict, builder, language: str, parent_id: str | None):
+    # Same as Post.get_absolute_url()
+    category = get_category_slug(row["post__primary_category_slugs"], language)
+    date = row["date_featured"] or row["date_published"] or row["post__date_created"]
+    url = builder.format_url(builder.make_kwargs(date, row["slug"], category), language)
+    return NavigationNode(row["title"], url, f"PostContent-{row['pk']}", parent_id)
 
 
 class PostCategoryMenu(CMSAttachMenu):
@@ -23,7 +99,6 @@ class PostCategoryMenu(CMSAttachMenu):
     """
 
     name = _("Post category menu")
-    _config = {}
 
     def get_nodes(self, request):
         """
@@ -42,81 +117,126 @@ class PostCategoryMenu(CMSAttachMenu):
             return []
 
         if self.instance and self.instance.application_urls == "StoriesApp":
-            try:
-                self._config.setdefault(
-                    self.instance.application_namespace,
-                    StoriesConfig.objects.get(namespace=self.instance.application_namespace),
-                )
-            except StoriesConfig.DoesNotExist as e:
-                logger.exception(e)
+            config = config_registry.get(self.instance.application_namespace)
+            if config is None:
+                logger.error("StoriesConfig with namespace %s does not exist", self.instance.application_namespace)
                 return []
-            config = self._config[self.instance.application_namespace]
             categories_menu = config and config.menu_structure in (MENU_TYPE_COMPLETE, MENU_TYPE_CATEGORIES)
             posts_menu = config and config.menu_structure in (MENU_TYPE_COMPLETE, MENU_TYPE_POSTS)
         else:
             # No page assigned to?
             return []
 
-        used_categories = []
+        by_date = config.menu_posts_grouping == MENU_POSTS_BY_DATE
+        # Post nodes of the viewed branch only are added by PostMenuBranchModifier
+        branch_only = config.menu_posts_current_branch and (by_date or categories_menu)
+        post_rows, months, used_categories = [], [], set()
         if posts_menu:
-            site = get_current_site(request)
-            if getattr(request, "toolbar", False) and request.toolbar.edit_mode_active:
-                post_contents = PostContent.admin_manager.current_content(language=language).on_site(site)
-            else:
-                post_contents = PostContent.objects.filter(language=language)
-            if hasattr(self, "instance") and self.instance:
-                post_contents = post_contents.filter(
-                    post__app_config__namespace=self.instance.application_namespace
-                ).on_site(site)
-            post_contents = (
-                post_contents.distinct()
-                .select_related("post", "post__app_config")
-                .prefetch_related("post__categories")
-            )
-            for post_content in post_contents:
-                postcontent_id = None
-                parent = None
-                used_categories.extend(post_content.post.categories.values_list("pk", flat=True))
-                if categories_menu:
-                    category = post_content.post.categories.first()
-                    if category:
-                        parent = f"{category.__class__.__name__}-{category.pk}"
-                        postcontent_id = (f"{post_content.__class__.__name__}-{post_content.pk}",)
-                else:
-                    postcontent_id = (f"{post_content.__class__.__name__}-{post_content.pk}",)
-                if postcontent_id:
-                    node = NavigationNode(
-                        post_content.title, post_content.get_absolute_url(language), postcontent_id, parent
+            post_contents = get_post_contents(request, config, language)
+            if not branch_only:
+                post_rows = get_post_rows(post_contents, config, categories_menu)
+            if by_date:
+                months = (
+                    post_contents.annotate(month=TruncMonth("date_published"))
+                    .filter(month__isnull=False)
+                    .values_list("month", flat=True)
+                    .distinct()
+                    .order_by("-month")
+                )
+            if categories_menu:
+                used_categories = set(
+                    Post.categories.through.objects.filter(post_id__in=post_contents.values("post_id")).values_list(
+                        "postcategory_id", flat=True
                     )
-                    nodes.append(node)
+                )
 
+        category_rows = {}
         if categories_menu:
-            categories = PostCategory.objects
-            if config:
-                categories = categories.filter(app_config__namespace=self.instance.application_namespace)
+            categories = PostCategory.objects.active_translations(language).with_post_counts(
+                site=current_site,
+                namespace=self.instance.application_namespace if config else None,
+                language=language,
+            )
             if config and not config.menu_empty_categories:
-                categories = categories.active_translations(language).filter(pk__in=used_categories).distinct()
+                # used_categories covers the draft posts shown in edit mode
+                categories = categories.filter(Q(post_count__gt=0) | Q(pk__in=used_categories))
+            # Ordering by the names in all languages repeats the categories: keep their first row
+            category_rows = dict.fromkeys(
+                categories.order_by("parent__id", "translations__name").values_list("pk", "parent_id")
+            )
+
+        builder = get_permalink_builder(config)
+        names, slugs = self._get_category_translations({category_id for category_id, _parent_id in category_rows})
+        languages = get_active_language_choices(language)
+
+        for row in post_rows:
+            if by_date:
+                if not row["month"]:
+                    continue
+                parent = f"PostArchive-{row['month']:%Y-%m}"
+            elif categories_menu:
+                if not row["primary_category_id"]:
+                    continue
+                parent = f"PostCategory-{row['primary_category_id']}"
             else:
-                categories = categories.active_translations(language).distinct()
-            categories = (
-                categories.order_by("parent__id", "translations__name")
-                .select_related("app_config")
-                .prefetch_related("translations")
+                parent = None
+            nodes.append(_make_post_node(row, builder, language, parent))
+
+        years = set()
+        for month in months:
+            if month.year not in years:
+                years.add(month.year)
+                url = reverse(
+                    f"{config.namespace}:posts-archive", kwargs={"year": month.year}, current_app=config.namespace
+                )
+                nodes.append(NavigationNode(str(month.year), url, f"PostArchive-{month.year}"))
+            url = reverse(
+                f"{config.namespace}:posts-archive",
+                kwargs={"year": month.year, "month": month.month},
+                current_app=config.namespace,
+            )
+            nodes.append(
+                NavigationNode(
+                    date_format(month, "YEAR_MONTH_FORMAT"),
+                    url,
+                    f"PostArchive-{month:%Y-%m}",
+                    f"PostArchive-{month.year}",
+                    attr={"stories_branch": (config.namespace, month.year, month.month)} if branch_only else None,
+                )
+            )
+
+        fallback = get_setting("USE_FALLBACK_LANGUAGE_IN_URL")
+        for category_id, parent_id in category_rows:
+            # Same as PostCategory.get_absolute_url()
+            slug = slugs[category_id].get(language) or (fallback and _translate(slugs[category_id], languages))
+            if slug:
+                url = reverse(
+                    f"{config.namespace}:posts-category", kwargs={"category": slug}, current_app=config.namespace
+                )
+            else:
+                url = reverse(f"{config.namespace}:posts-latest", current_app=config.namespace)
+            nodes.append(
+                NavigationNode(
+                    _translate(names[category_id], languages) or "",
+                    url,
+                    f"PostCategory-{category_id}",
+                    f"PostCategory-{parent_id}" if parent_id else None,
+                    attr={"stories_branch": (config.namespace, category_id)} if branch_only and not by_date else None,
+                )
             )
-            added_categories = []
-            for category in categories:
-                if category.pk not in added_categories:
-                    node = NavigationNode(
-                        category.name,
-                        category.get_absolute_url(),
-                        f"{category.__class__.__name__}-{category.pk}",
-                        (f"{category.__class__.__name__}-{category.parent.id}" if category.parent else None),
-                    )
-                    nodes.append(node)
-                    added_categories.append(category.pk)
 
         return nodes
 
+    @staticmethod
+    def _get_category_translations(category_ids) -> tuple[dict, dict]:
+        """Returns the names and slugs of the categories, by category id and language, in one query"""
+        names, slugs = defaultdict(dict), defaultdict(dict)
+        translations = PostCategory._parler_meta.root_model.objects.filter(master_id__in=category_ids)
+        for category_id, code, name, slug in translations.values_list("master_id", "language_code", "name", "slug"):
+            names[category_id][code] = name
+            slugs[category_id][code] = slug
+        return names, slugs
+
 
 class PostCategoryNavModifier(Modifier):
     """
@@ -125,8 +245,6 @@ class PostCategoryNavModifier(Modifier):
     a corresponding category is selected in menu
     """
 
-    _config = {}
-
     def modify(self, request, nodes, namespace, root_id, post_cut, breadcrumb):
         """
         Actual modifier function
@@ -148,10 +266,7 @@ class PostCategoryNavModifier(Modifier):
             if not namespace:
                 # Potentially a 404, might be a menu on a 404 page
                 return nodes
-            if not self._config.get(namespace, False):
-                # Not cached yet
-                self._config[namespace] = app.get_config(namespace)
-                config = self._config[namespace]
+            config = app.get_config(namespace)
         try:
             if config and (not isinstance(config, StoriesConfig) or config.menu_structure != MENU_TYPE_CATEGORIES):
                 return nodes
@@ -161,29 +276,150 @@ class PostCategoryNavModifier(Modifier):
         if post_cut:
             return nodes
         current_postcontent = getattr(request, get_setting("CURRENT_POST_IDENTIFIER"), None)
-        category = None
+        category_id = None
         if current_postcontent and current_postcontent.__class__ == PostContent:
-            category = current_postcontent.categories.first()
-        if not category:
+            category_id = current_postcontent.post.primary_category_id
+        if not category_id:
             return nodes
 
         for node in nodes:
-            if f"{category.__class__.__name__}-{category.pk}" == node.id:
+            if f"PostCategory-{category_id}" == node.id:
                 node.selected = True
         return nodes
 
 
+class PostMenuBranchModifier(Modifier):
+    """
+    Adds the post nodes of the category or month being viewed, or of the viewed post, for the
+    configs showing the current branch only (see
+    :py:attr:`~djangocms_stories.cms_appconfig.StoriesConfig.menu_posts_current_branch`).
+
+    Only the category and month nodes are cached with the menu, the post nodes are loaded on
+    each request, in one query.
+    """
+
+    def modify(self, request, nodes, namespace, root_id, post_cut, breadcrumb):
+        if post_cut:
+            return nodes
+        current_postcontent = getattr(request, get_setting("CURRENT_POST_IDENTIFIER"), None)
+        if current_postcontent.__class__ != PostContent:
+            current_postcontent = None
+        current_branches = {}
+        for index, node in enumerate(nodes):
+            branch = node.attr.get("stories_branch")
+            if not branch:
+                continue
+            if not node.selected and current_postcontent:
+                if branch[0] not in current_branches:
+                    current_branches[branch[0]] = self.get_post_branch(current_postcontent, branch[0])
+                if current_branches[branch[0]] != branch:
+                    continue
+            elif not node.selected:
+                continue
+            post_nodes = self.get_post_nodes(request, branch)
+            for post_node in post_nodes:
+                self.attach(request, node, post_node)
+            nodes[index + 1 : index + 1] = post_nodes
+            break
+        return nodes
+
+    @staticmethod
+    def get_post_branch(postcontent: PostContent, namespace: str) -> tuple | None:
+        """Returns the branch of the post in the menu of the config"""
+        config = config_registry.get(namespace)
+        post = postcontent.post
+        if config is None or post.app_config_id != config.pk:
+            return None
+        if config.menu_posts_grouping == MENU_POSTS_BY_DATE:
+            if not post.date_published:
+                return None
+            date = localtime(post.date_published)
+            return namespace, date.year, date.month
+        return post.primary_category_id and (namespace, post.primary_category_id)
+
+    @staticmethod
+    def get_post_nodes(request, branch: tuple) -> list[NavigationNode]:
+        config = config_registry.get(branch[0])
+        if config is None:
+            return []
+        language = get_language_from_request(request, check_path=True)
+        post_contents = get_post_contents(request, config, language)
+        if len(branch) == 3:
+            post_contents = post_contents.filter(date_published__year=branch[1], date_published__month=branch[2])
+        else:
+            post_contents = post_contents.filter(post__primary_category=branch[1])
+        post_rows = get_post_rows(post_contents, config, categories_menu=len(branch) == 2)
+        builder = get_permalink_builder(config)
+        return [_make_post_node(row, builder, language, None) for row in post_rows]
+
+    @staticmethod
+    def attach(request, parent: NavigationNode, node: NavigationNode) -> None:
+        """Link the node to its parent and mark it like the menu renderer does"""
+        node.parent = parent
+        node.parent_id = parent.id
+        node.namespace = node.parent_namespace = parent.namespace
+        parent.children.append(node)
+        if getattr(parent, "level", None) is not None:
+            node.level = parent.level + 1
+        node.descendant = parent.selected or parent.descendant
+        if node.is_selected(request):
+            node.selected = True
+            ancestor = parent
+            while ancestor:
+                ancestor.ancestor = True
+                ancestor = ancestor.parent
+        for sibling in parent.children:
+            if sibling is not node and (sibling.selected or node.selected):
+                sibling.sibling = node.sibling = True
+
+
 menu_pool.register_modifier(PostCategoryNavModifier)
+menu_pool.register_modifier(PostMenuBranchModifier)
 menu_pool.register_menu(PostCategoryMenu)
 
 
-# def clear_menu_cache(**kwargs):
-#     """
-#     Empty menu cache when saving categories
-#     """
-#     menu_pool.clear(all=True)
+def get_menu_caches(namespaces=None) -> set[tuple[int, str]]:
+    """
+    Returns the sites and languages of the cached menus showing the given configs: those of
+    their apphook pages (all the stories apphook pages if ``namespaces`` is ``None``).
+    """
+    from cms.models import Page, PageContent
 
+    pages = Page.objects.filter(application_urls="StoriesApp")
+    if namespaces is not None:
+        pages = pages.filter(application_namespace__in=namespaces)
+    # django CMS 4.1 stores the site on the page tree node
+    site_field = "page__site" if hasattr(Page, "site") else "page__node__site"
+    return set(
+        PageContent.admin_manager.filter(page__in=pages).values_list(site_field, "language").distinct().order_by()
+    )
 
-# post_save.connect(clear_menu_cache, sender=PostCategory)
-# post_delete.connect(clear_menu_cache, sender=PostCategory)
-# post_delete.connect(clear_menu_cache, sender=StoriesConfig)
+
+def clear_menu_caches(namespaces=None) -> None:
+    """Clear the cached menus showing the given configs (all the stories menus if ``namespaces`` is ``None``)"""
+    for site_id, language in get_menu_caches(namespaces):
+        menu_pool.clear(site_id=site_id, language=language)
+
+
+def _flush_menu_caches() -> None:
+    namespaces = _pending.__dict__.pop("namespaces", None)
+    if namespaces:
+        clear_menu_caches(None if None in namespaces else namespaces)
+
+
+def schedule_menu_invalidation(namespace: str | None) -> None:
+    """
+    Clear the cached menus showing the config once the transaction is committed, or all the
+    stories menus if ``namespace`` is ``None``. Changes in the same transaction (e.g. an admin
+    request) are coalesced.
+    """
+    namespaces = _pending.__dict__.setdefault("namespaces", set())
+    # The flush is registered with the first pending change, or again if it has been discarded
+    # with a rolled back transaction: nothing holds the discarded callback anymore
+    flush = _pending.__dict__.get("flush")
+    register = not namespaces or flush is None or flush() is None
+    namespaces.add(namespace)
+    if register:
+        callback = partial(_flush_menu_caches)
+        _pending.flush = weakref.ref(callback)
+        transaction.on_commit(callback)
@@ -1,20 +1,63 @@
+from __future__ import annotations
+
 import os.path
+from datetime import datetime
 
 from cms.plugin_base import CMSPluginBase
 from cms.plugin_pool import plugin_pool
 from django.contrib.sites.shortcuts import get_current_site
+from django.core.cache import cache
 from django.db import models
+from django.db.models import Min
 from django.template.loader import select_template
+from django.utils.safestring import mark_safe
+from django.utils.timezone import now
+from django.utils.translation import get_language
 
+from .cache import get_cache_key, get_generation, get_or_compute
+from .cms_appconfig import StoriesConfig, config_registry
 from .forms import AuthorPostsForm, BlogPluginForm, LatestEntriesForm
-from .models import AuthorEntriesPlugin, PostCategory, FeaturedPostsPlugin, GenericBlogPlugin, LatestPostsPlugin, Post
+from .models import (
+    AuthorEntriesPlugin,
+    PostCategory,
+    FeaturedPostsPlugin,
+    GenericBlogPlugin,
+    LatestPostsPlugin,
+    Post,
+    PostMonthCount,
+)
 from .settings import get_setting
 
 
+def get_next_transition(app_config: StoriesConfig | None) -> datetime | None:
+    """
+    Returns the next time a post of the config (of any config if ``None``) is scheduled to be
+    published or unpublished, ``None`` if there is none.
+    """
+    namespace = app_config.namespace if app_config else ""
+    key = get_cache_key(f"plugins:{namespace}", get_generation("plugins"), "transition")
+    current = now()
+    cached = cache.get(key)
+    if cached is not None and (cached[0] is None or cached[0] > current):
+        return cached[0]
+    posts = Post.objects.filter(app_config=app_config) if app_config else Post.objects.all()
+    transitions = posts.aggregate(
+        publish=Min("date_published", filter=models.Q(date_published__gt=current)),
+        unpublish=Min("date_published_end", filter=models.Q(date_published_end__gt=current)),
+    )
+    transition = min((value for value in transitions.values() if value), default=None)
+    cache.set(key, (transition,), get_setting("PLUGIN_CACHE_TIMEOUT"))
+    return transition
+
+
 class StoriesPlugin(CMSPluginBase):
     module = get_setting("PLUGIN_MODULE_NAME")
     form = BlogPluginForm
     fields = []
+    #: Cache the rendered plugin (see :ref:`PLUGIN_CACHE_TIMEOUT <PLUGIN_CACHE_TIMEOUT>`)
+    render_cache = True
+    #: Context variables the rendered plugin depends on, added to its cache key
+    render_cache_vary_on = ("year", "month")
 
     def get_fields(self, request, obj=None):
         """
@@ -28,12 +71,84 @@ class StoriesPlugin(CMSPluginBase):
             fields.append("template_folder")
         return fields
 
+    def get_app_config(self, instance):
+        """Load the plugin config from :py:data:`config_registry` instead of querying it."""
+        field = instance._meta.get_field("app_config")
+        if instance.app_config_id and not field.is_cached(instance):
+            config = config_registry.get_by_pk(instance.app_config_id)
+            if config:
+                field.set_cached_value(instance, config)
+        return instance.app_config
+
+    def render(self, context, instance, placeholder):
+        """
+        Render the plugin from the cache if :py:attr:`render_cache` is set, the context is
+        otherwise filled by :py:meth:`get_render_context`.
+        """
+        self.get_app_config(instance)
+        context = super().render(context, instance, placeholder)
+        context["stories_plugin_output"] = None
+        key = self.get_render_cache_key(context["request"], instance, context)
+        if key is None:
+            return self.get_render_context(context, instance, placeholder)
+
+        def render_plugin():
+            plugin_context = self.get_render_context(context, instance, placeholder)
+            template = select_template([self.get_render_template(plugin_context, instance, placeholder)])
+            return template.render(plugin_context.flatten())
+
+        transition = get_next_transition(instance.app_config)
+        timeout = get_setting("PLUGIN_CACHE_TIMEOUT")
+        if transition:
+            timeout = min(timeout, max(int((transition - now()).total_seconds()), 0))
+        context["stories_plugin_output"] = mark_safe(get_or_compute(key, render_plugin, timeout))
+        return context
+
+    def get_render_context(self, context, instance, placeholder):
+        """Add the plugin data to the context."""
+        return context
+
+    def get_render_cache_key(self, request, instance, context=None) -> str | None:
+        """
+        Returns the cache key of the rendered plugin, ``None`` if it must not be cached (e.g.
+        in edit mode).
+
+        Keys include the generation of the plugin config, bumped by changes of its posts
+        (see :py:func:`djangocms_stories.models.invalidate_plugins`), and the context variables
+        listed in :py:attr:`render_cache_vary_on`.
+        """
+        toolbar = getattr(request, "toolbar", None)
+        if (
+            not self.render_cache
+            or not get_setting("PLUGIN_CACHE_TIMEOUT")
+            or (toolbar and (toolbar.edit_mode_active or toolbar.preview_mode_active))
+        ):
+            return None
+        namespace = instance.app_config.namespace if instance.app_config else ""
+        return get_cache_key(
+            f"plugins:{namespace}",
+            get_generation("plugins"),
+            instance.pk,
+            instance.changed_date.isoformat(),
+            get_language(),
+            get_current_site(request).pk,
+            *(context.get(name) if context else None for name in self.render_cache_vary_on),
+        )
+
+    def get_cache_expiration(self, request, instance, placeholder):
+        """The placeholder cache expires when a post of the config is published or unpublished."""
+        self.get_app_config(instance)
+        return get_next_transition(instance.app_config)
+
     def get_render_template(self, context, instance, placeholder):
         """
         Select the template used to render the plugin.
 
         Check the default folder as well as the folders provided to the apphook config.
         """
+        if context.get("stories_plugin_output") is not None:
+            return "djangocms_stories/plugins/cached.html"
+        self.get_app_config(instance)
         templates = [os.path.join("djangocms_stories", instance.template_folder, self.base_render_template)]
         if instance.app_config and instance.app_config.template_prefix:
             templates.insert(
@@ -56,12 +171,13 @@ class BlogLatestEntriesPlugin(StoriesPlugin):
     form = LatestEntriesForm
     filter_horizontal = ("categories",)
     cache = False
+    render_cache = False
     base_render_template = "latest_entries.html"
     fields = ["app_config", "latest_posts", "tags", "categories"]
 
-    def render(self, context, instance, placeholder):
-        """Render the plugin."""
-        context = super().render(context, instance, placeholder)
+    def get_render_context(self, context, instance, placeholder):
+        """Add the plugin data to the context."""
+        context = super().get_render_context(context, instance, placeholder)
         context["postcontent_list"] = instance.get_post_contents(context["request"])
         context["TRUNCWORDS_COUNT"] = get_setting("POSTS_LIST_TRUNCWORDS_COUNT")
         return context
@@ -75,6 +191,7 @@ class BlogLatestEntriesPluginCached(BlogLatestEntriesPlugin):
 
     name = get_setting("LATEST_ENTRIES_PLUGIN_NAME_CACHED")
     cache = True
+    render_cache = True
 
 
 @plugin_pool.register_plugin
@@ -87,12 +204,13 @@ class BlogFeaturedPostsPlugin(StoriesPlugin):
     model = FeaturedPostsPlugin
     form = BlogPluginForm
     cache = False
+    render_cache = False
     base_render_template = "featured_posts.html"
     fields = ["app_config", "posts"]
 
-    def render(self, context, instance, placeholder):
-        """Render the plugin."""
-        context = super().render(context, instance, placeholder)
+    def get_render_context(self, context, instance, placeholder):
+        """Add the plugin data to the context."""
+        context = super().get_render_context(context, instance, placeholder)
         context["postcontent_list"] = instance.get_posts(context["request"])
         context["TRUNCWORDS_COUNT"] = get_setting("POSTS_LIST_TRUNCWORDS_COUNT")
         return context
@@ -106,6 +224,7 @@ class BlogFeaturedPostsPluginCached(BlogFeaturedPostsPlugin):
 
     name = get_setting("FEATURED_POSTS_PLUGIN_NAME_CACHED")
     cache = True
+    render_cache = True
 
 
 @plugin_pool.register_plugin
@@ -120,9 +239,9 @@ class BlogAuthorPostsPlugin(StoriesPlugin):
     filter_horizontal = ["authors"]
     fields = ["app_config", "current_site", "authors"]
 
-    def render(self, context, instance, placeholder):
-        """Render the plugin."""
-        context = super().render(context, instance, placeholder)
+    def get_render_context(self, context, instance, placeholder):
+        """Add the plugin data to the context."""
+        context = super().get_render_context(context, instance, placeholder)
         context["authors_list"] = instance.get_authors(context["request"])
         return context
 
@@ -146,12 +265,14 @@ class BlogTagsPlugin(StoriesPlugin):
     base_render_template = "tags.html"
     show_add_form = False
 
-    def render(self, context, instance, placeholder):
-        """Render the plugin."""
-        context = super().render(context, instance, placeholder)
+    def get_render_context(self, context, instance, placeholder):
+        """Add the plugin data to the context."""
+        context = super().get_render_context(context, instance, placeholder)
         site = get_current_site(context["request"])
         qs = Post.objects.on_site(site).filter(app_config=instance.app_config)
-        context["tags"] = Post.objects.tag_cloud(queryset=qs)
+        toolbar = getattr(context["request"], "toolbar", None)
+        published = not (toolbar and (toolbar.edit_mode_active or toolbar.preview_mode_active))
+        context["tags"] = Post.objects.tag_cloud(queryset=qs, published=published, limit=get_setting("TAG_CLOUD_SIZE"))
         return context
 
 
@@ -165,19 +286,19 @@ class BlogCategoryPlugin(StoriesPlugin):
     base_render_template = "categories.html"
     show_add_form = False
 
-    def render(self, context, instance, placeholder):
-        """Render the plugin."""
-        context = super().render(context, instance, placeholder)
-        qs = PostCategory.objects.active_translations()
-        if instance.app_config:
-            qs = qs.filter(app_config__namespace=instance.app_config.namespace)
+    def get_render_context(self, context, instance, placeholder):
+        """Add the plugin data to the context."""
+        context = super().get_render_context(context, instance, placeholder)
+        site = get_current_site(context["request"])
+        qs = PostCategory.objects.active_translations().with_post_counts(
+            site=site, namespace=instance.app_config.namespace if instance.app_config else None
+        )
         if instance.current_site:
-            site = get_current_site(context["request"])
-            qs = qs.filter(models.Q(posts__sites__isnull=True) | models.Q(posts__sites=site.pk))
-        categories = qs.distinct()
+            # Hide categories whose posts are all on other sites
+            qs = qs.filter(models.Q(post_count__gt=0) | models.Q(post_count_all_sites=0))
         if instance.app_config and not instance.app_config.menu_empty_categories:
-            categories = qs.filter(posts__isnull=False).distinct()
-        context["categories"] = categories
+            qs = qs.filter(post_count__gt=0)
+        context["categories"] = qs.distinct()
         return context
 
 
@@ -190,11 +311,14 @@ class BlogArchivePlugin(StoriesPlugin):
     model = GenericBlogPlugin
     base_render_template = "archive.html"
     show_add_form = False
+    # The current archive month is highlighted
+    render_cache_vary_on = ("year", "month")
 
-    def render(self, context, instance, placeholder):
-        """Render the plugin."""
-        context = super().render(context, instance, placeholder)
+    def get_render_context(self, context, instance, placeholder):
+        """Add the plugin data to the context."""
+        context = super().get_render_context(context, instance, placeholder)
         site = get_current_site(context["request"])
-        qs = Post.objects.on_site(site).filter(app_config=instance.app_config)
-        context["dates"] = Post.objects.get_months(queryset=qs)
+        context["dates"] = PostMonthCount.objects.get_months(
+            instance.app_config, site, months=get_setting("ARCHIVE_PLUGIN_MONTHS")
+        )
         return context
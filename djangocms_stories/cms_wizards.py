@@ -1,14 +1,13 @@
 from django import forms
-from django.core.exceptions import ObjectDoesNotExist
 from django.utils.translation import gettext_lazy as _
 
 from cms.api import add_plugin
 from cms.utils.permissions import get_current_user
 from cms.wizards.wizard_base import Wizard
 
-from .cms_appconfig import StoriesConfig
+from .cms_appconfig import config_registry
 from .fields import slugify
-from .models import Post, PostContent
+from .models import Post, PostContent, PostSearchDocument
 from .settings import get_setting
 
 
@@ -64,8 +63,10 @@ class PostWizardForm(forms.ModelForm):
         if autocreate_plugin:
             del instance_dict["post_text"]  # Create a plugin later
         self.instance = self.Meta.model.objects.with_user(user).create(**instance_dict)
-        if autocreate_plugin:
+        if autocreate_plugin and post_text:
             self.add_plugin(post_text)  # Create plugin now
+            if get_setting("ENABLE_SEARCH"):
+                PostSearchDocument.objects.update_document(self.instance)
         return self.instance
 
     def create_slug(self):
@@ -87,9 +88,10 @@ class PostWizardForm(forms.ModelForm):
 
     def clean_app_config(self):
         try:
-            pk = int(self.cleaned_data.get("app_config", self.default_appconfig))
-            config = StoriesConfig.objects.get(pk=pk)
-        except (ValueError, TypeError, ObjectDoesNotExist):
+            config = config_registry.get_by_pk(int(self.cleaned_data.get("app_config", self.default_appconfig)))
+        except (ValueError, TypeError):
+            config = None
+        if config is None:
             self.add_error(None, _("Selected story not available any more. Close wizard."))
             return 0  # Invalid PK
         return config
@@ -0,0 +1,99 @@
+"""
+Conditional GET support (``ETag`` and ``Last-Modified``) for the stories views and feeds.
+
+Validators are computed from indexed data (the last modification date and the number of the
+listed objects) and from the ``posts`` cache generation, which is bumped whenever posts, their
+contents, plugins, categories or tags change. Requests whose validators match are answered
+with a ``304 Not Modified`` response before any rendering.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from datetime import datetime, timezone
+
+from django.db.models import Count, Max
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .cache import get_generation, get_modified
+
+GENERATIONS = ("posts", "stories-config")
+
+
+def get_validators(last_modified: datetime | None, *parts) -> tuple[str, datetime | None]:
+    """
+    Returns the ETag and the last modification date of a response.
+
+    :param last_modified: last modification date of the objects in the response
+    :param parts: values identifying the response content
+    """
+    generations = [get_generation(name) for name in GENERATIONS]
+    dates = [datetime.fromtimestamp(stamp, tz=timezone.utc) for stamp in map(get_modified, GENERATIONS) if stamp]
+    if last_modified:
+        dates.append(last_modified)
+    value = ":".join(str(part) for part in (*generations, last_modified, *parts))
+    etag = hashlib.md5(value.encode("utf-8"), usedforsecurity=False).hexdigest()
+    return quote_etag(etag), max(dates, default=None)
+
+
+def get_queryset_validators(queryset, date_field: str, *parts, count: bool = True) -> tuple[str, datetime | None]:
+    """
+    Returns the validators of a response listing the objects of the queryset, in one query.
+
+    :param queryset: listed objects
+    :param date_field: lookup of the modification date of the objects
+    :param parts: values identifying the response content
+    :param count: validate the number of objects as well
+    """
+    if not queryset.query.is_sliced:
+        queryset = queryset.order_by()  # The order of a slice defines the listed objects
+    aggregates = {"last_modified": Max(date_field)}
+    if count:
+        aggregates["count"] = Count("pk")
+    values = queryset.aggregate(**aggregates)
+    return get_validators(values.pop("last_modified"), *values.values(), *parts)
+
+
+def get_not_modified_response(request: HttpRequest, validators) -> HttpResponse | None:
+    """Returns the ``304`` (or ``412``) response to the conditional request, if it applies."""
+    etag, last_modified = validators
+    return get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified.timestamp()) if last_modified else None
+    )
+
+
+def set_validators(response: HttpResponse, validators) -> HttpResponse:
+    etag, last_modified = validators
+    response.headers["ETag"] = etag
+    if last_modified:
+        response.headers["Last-Modified"] = http_date(last_modified.timestamp())
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Answer the conditional requests of anonymous users without rendering the response.
+
+    Views define :py:meth:`get_validators`; responses to authenticated users depend on
+    the toolbar and on permissions, and are always rendered.
+    """
+
+    def get_validators(self) -> tuple[str, datetime | None] | None:
+        """Returns the ETag and last modification date of the response, ``None`` to skip the check."""
+        return None
+
+    def dispatch(self, request, *args, **kwargs):
+        validators = None
+        user = getattr(request, "user", None)
+        if request.method in ("GET", "HEAD") and not (user and user.is_authenticated):
+            validators = self.get_validators()
+        if validators:
+            response = get_not_modified_response(request, validators)
+            if response is not None:
+                return response
+        response = super().dispatch(request, *args, **kwargs)
+        if validators and response.status_code == 200:
+            set_validators(response, validators)
+        return response
@@ -1,32 +1,204 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from html import unescape
 from io import BytesIO
 
 from django.contrib.sites.models import Site
 from django.contrib.syndication.views import Feed
 from django.core.cache import cache
+from django.db import connections, transaction
+from django.http import Http404
 from django.urls import reverse
 from django.utils.encoding import force_str
 from django.utils.feedgenerator import Rss201rev2Feed
 from django.utils.html import strip_tags
 from django.utils.safestring import mark_safe
 from django.utils.text import normalize_newlines
-from django.utils.translation import get_language_from_request, gettext as _
+from django.utils.translation import get_language_from_request, gettext as _, override
 from lxml import etree
 
+from .cache import CacheEntry, acquire_lock, make_entry, needs_refresh, release_lock
 from .cms_appconfig import get_app_instance
+from .conditional import get_not_modified_response, get_queryset_validators, get_validators, set_validators
 from .models import Post
 from .settings import get_setting
+from .utils import get_site_request
 from .views import PostDetailView
 
+logger = logging.getLogger(__name__)
+_warm_executor = None
+_warm_lock = threading.Lock()
+_warm_pending = set()
+
+
+def clean_instant_article(content: bytes) -> bytes:
+    """Remove the empty paragraphs and turn the headings into the ones supported by Instant Articles."""
+    body = BytesIO(content)
+    document = etree.iterparse(body, html=True)
+    for _a, element in document:
+        if not (element.text and element.text.strip()) and len(element) == 0 and element.tag == "p":
+            element.getparent().remove(element)
+        if element.tag in ("h3", "h4", "h5", "h6") and "op-kicker" not in element.attrib.get("class", ""):
+            element.tag = "h2"
+    return etree.tostring(document.root)
+
+
+def render_instant_article(path: str, slug: str, language: str) -> bytes | None:
+    """
+    Render the cleaned Instant Article body of a post, outside of any request.
+
+    :param path: URL of the post detail
+    :param slug: slug of the post content
+    :param language: language of the post content
+    :return: the article body, or ``None`` if the post content is not published
+    """
+    request = get_site_request(path, language)
+    with override(language):
+        try:
+            response = PostDetailView.as_view(instant_article=True)(request, slug=slug)
+        except Http404:
+            return None
+        response.render()
+    return clean_instant_article(response.content)
+
+
+def _render_job(job: tuple) -> tuple[bytes | None, float]:
+    start = time.monotonic()
+    content = render_instant_article(*job)
+    return content, time.monotonic() - start
+
+
+def _render_in_thread(job: tuple) -> tuple[bytes | None, float]:
+    try:
+        return _render_job(job)
+    finally:
+        connections.close_all()
+
+
+def warm_instant_articles(posts, languages=None, workers: int | None = None) -> int:
+    """
+    Render the Instant Articles of the given posts and store them in the feed cache.
+
+    Articles are rendered in a pool of ``workers`` threads (defaults to
+    :ref:`FEED_WARM_WORKERS <FEED_WARM_WORKERS>`) and are stored under the
+    ``post.get_cache_key(language, "feed")`` keys read by :py:class:`FBInstantArticles`.
+    Articles locked by another process, which is already rendering them, are skipped.
+
+    :param posts: iterable of :py:class:`djangocms_stories.models.Post` instances
+    :param languages: languages to render (defaults to the languages of each post)
+    :param workers: number of rendering threads
+    :return: number of rendered articles
+    """
+    keys, jobs = [], []
+    try:
+        for post in posts:
+            for language in languages or post.get_available_languages():
+                with override(language):
+                    slug = post.safe_translation_getter("slug", language_code=language)
+                    key = post.get_cache_key(language, "feed")
+                    if slug and acquire_lock(key):
+                        keys.append(key)
+                        jobs.append((post.get_absolute_url(language), slug, language))
+        workers = get_setting("FEED_WARM_WORKERS") if workers is None else workers
+        if workers > 1 and len(jobs) > 1:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stories-feeds") as executor:
+                rendered = list(executor.map(_render_in_thread, jobs))
+        else:
+            rendered = [_render_job(job) for job in jobs]
+        entries, timeout = {}, None
+        for key, (content, delta) in zip(keys, rendered):
+            if content:
+                entries[key], timeout = make_entry(content, get_setting("FEED_CACHE_TIMEOUT"), delta)
+        cache.set_many(entries, timeout=timeout)
+    finally:
+        release_lock(*keys)
+    return len(entries)
+
+
+def _warm_in_background(job: tuple) -> None:
+    post_ids, languages = job
+    try:
+        posts = Post.objects.filter(pk__in=post_ids).select_related("app_config").with_contents(languages)
+        warm_instant_articles(posts, languages)
+    finally:
+        with _warm_lock:
+            _warm_pending.discard(job)
+        connections.close_all()
+
+
+def _submit_warm(job: tuple) -> None:
+    global _warm_executor
+
+    with _warm_lock:
+        if job in _warm_pending:
+            return
+        _warm_pending.add(job)
+        if _warm_executor is None:
+            _warm_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stories-feeds-warm")
+    _warm_executor.submit(_warm_in_background, job).add_done_callback(_log_warm_failure)
+
+
+def _log_warm_failure(future) -> None:
+    if future.exception() is not None:
+        logger.error("Rendering the Instant Articles failed", exc_info=future.exception())
+
+
+def schedule_instant_articles(post_ids, languages=None) -> None:
+    """
+    Warm the Instant Articles of the given posts in a background thread, once the
+    current transaction is committed. Jobs already waiting are not queued twice.
+    Background rendering is enabled by :ref:`FEED_WARM_ON_SAVE <FEED_WARM_ON_SAVE>`.
+
+    :param post_ids: primary keys of the posts
+    :param languages: languages to render (defaults to the languages of each post)
+    """
+    job = (tuple(sorted(post_ids)), tuple(languages or ()))
+    if job[0]:
+        transaction.on_commit(partial(_submit_warm, job))
+
 
 class LatestEntriesFeed(Feed):
     feed_type = Rss201rev2Feed
     feed_items_number = get_setting("FEED_LATEST_ITEMS")
+    #: Serve the feed pre-generated by ``stories_build_artifacts``, if any
+    serve_artifacts = True
 
     def __call__(self, request, *args, **kwargs):
         self.request = request
         self.namespace, self.config = get_app_instance(request)
-        return super().__call__(request, *args, **kwargs)
+        if self.serve_artifacts:
+            response = self.get_artifact_response(request)
+            if response is not None:
+                return response
+        validators = self.get_validators(self.get_object(request, *args, **kwargs))
+        response = get_not_modified_response(request, validators)
+        if response is None:
+            response = set_validators(super().__call__(request, *args, **kwargs), validators)
+        return response
+
+    def get_artifact_response(self, request):
+        from .artifacts import get_artifact, get_feed_name, serve_artifact
+
+        language = get_language_from_request(request, check_path=True)
+        artifact = get_artifact(get_feed_name(Site.objects.get_current().pk, self.namespace, language))
+        return artifact and serve_artifact(request, artifact)
+
+    def get_validators(self, obj=None):
+        """Returns the ETag and last modification date of the feed, from the feed items query"""
+        return get_queryset_validators(
+            self.items(obj),
+            "date_modified",
+            self.namespace,
+            Site.objects.get_current().pk,
+            get_language_from_request(self.request, check_path=True),
+            self.request.get_full_path(),
+        )
 
     def link(self):
         return reverse("%s:posts-latest" % self.namespace, current_app=self.namespace)
@@ -39,8 +211,9 @@ class LatestEntriesFeed(Feed):
 
     def items(self, obj=None):
         return (
-            Post.objects.prefetch_related("postcontent_set")
-            .filter(app_config__namespace=self.namespace, include_in_rss=True)
+            Post.objects.filter(app_config__namespace=self.namespace, include_in_rss=True)
+            .select_related("app_config", "author")
+            .with_contents()
             .order_by("-date_published")[: self.feed_items_number]
         )
 
@@ -71,12 +244,17 @@ class LatestEntriesFeed(Feed):
 
 class TagFeed(LatestEntriesFeed):
     feed_items_number = get_setting("FEED_TAGS_ITEMS")
+    serve_artifacts = False
 
     def get_object(self, request, tag):
         return tag  # pragma: no cover
 
     def items(self, obj=None):
-        return Post.objects.filter(tags__slug=obj)[: self.feed_items_number]
+        return (
+            Post.objects.filter(tags__slug=obj)
+            .select_related("app_config", "author")
+            .with_contents()[: self.feed_items_number]
+        )
 
 
 class FBInstantFeed(Rss201rev2Feed):
@@ -124,34 +302,80 @@ class FBInstantFeed(Rss201rev2Feed):
 class FBInstantArticles(LatestEntriesFeed):
     feed_type = FBInstantFeed
     feed_items_number = get_setting("FEED_INSTANT_ITEMS")
+    serve_artifacts = False
+
+    def __call__(self, request, *args, **kwargs):
+        try:
+            return super().__call__(request, *args, **kwargs)
+        finally:
+            request.__dict__.pop("_stories_instant_articles", None)
 
     def items(self, obj=None):
-        return Post.objects.filter(app_config__namespace=self.namespace).order_by("-date_modified")[
-            : self.feed_items_number
-        ]
+        """
+        Returns the posts whose article is rendered, with the article as ``instant_article``
+        attribute.
+
+        The feed never renders the articles: they are rendered by the ``stories_warm_feeds``
+        command (see :py:func:`warm_instant_articles`) or, with
+        :ref:`FEED_WARM_ON_SAVE <FEED_WARM_ON_SAVE>`, in the background, where missing and expired
+        articles are queued. Posts are listed once their article is rendered, expired articles
+        until they are rendered again.
+
+        The posts are computed once per call of the feed, for the validators and the feed itself.
+        """
+        items = getattr(self.request, "_stories_instant_articles", None)
+        if items is None:
+            items = self.request._stories_instant_articles = self._get_items()
+        return items
+
+    def _get_items(self):
+        posts = list(
+            Post.objects.filter(app_config__namespace=self.namespace)
+            .select_related("app_config", "author")
+            .prefetch_related("categories", "categories__translations")
+            .with_contents()
+            .order_by("-date_modified")[: self.feed_items_number]
+        )
+        language = get_language_from_request(self.request, check_path=True)
+        with override(language):
+            keys = {post.pk: post.get_cache_key(language, "feed") for post in posts}
+        cached = cache.get_many(keys.values())
+        items, refresh = [], []
+        for post in posts:
+            if not post.get_content(language):
+                continue
+            entry = cached.get(keys[post.pk])
+            if not isinstance(entry, CacheEntry) or needs_refresh(entry):
+                refresh.append(post.pk)
+            if isinstance(entry, CacheEntry):
+                post.instant_article = entry.value
+                items.append(post)
+        if get_setting("FEED_WARM_ON_SAVE"):
+            schedule_instant_articles(refresh, [language])
+        return items
+
+    def get_validators(self, obj=None):
+        """The feed changes when articles are rendered: validate their content"""
+        items = self.items(obj)
+        digest = hashlib.md5(usedforsecurity=False)
+        for item in items:
+            digest.update(item.instant_article)
+        return get_validators(
+            max((item.date_modified for item in items), default=None),
+            digest.hexdigest(),
+            self.namespace,
+            Site.objects.get_current().pk,
+            get_language_from_request(self.request, check_path=True),
+            self.request.get_full_path(),
+        )
 
     def _clean_html(self, content):
-        body = BytesIO(content)
-        document = etree.iterparse(body, html=True)
-        for _a, element in document:
-            if not (element.text and element.text.strip()) and len(element) == 0 and element.tag == "p":
-                element.getparent().remove(element)
-            if element.tag in ("h3", "h4", "h5", "h6") and "op-kicker" not in element.attrib.get("class", ""):
-                element.tag = "h2"
-        return etree.tostring(document.root)
+        return clean_instant_article(content)
 
     def item_extra_kwargs(self, item):
         if not item:
             return {}
-        language = get_language_from_request(self.request, check_path=True)
-        key = item.get_cache_key(language, "feed")
-        content = cache.get(key)
-        if not content:
-            view = PostDetailView.as_view(instant_article=True)
-            response = view(self.request, slug=item.safe_translation_getter("slug"))
-            response.render()
-            content = self._clean_html(response.content)
-            cache.set(key, content, timeout=get_setting("FEED_CACHE_TIMEOUT"))
+        content = item.instant_article
         if item.app_config.use_abstract:
             abstract = strip_tags(item.safe_translation_getter("abstract"))
         else:
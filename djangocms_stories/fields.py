@@ -1,7 +1,8 @@
 from django import forms
+from django.contrib.postgres.search import SearchVectorField as PostgresSearchVectorField
 from django.utils.text import slugify as django_slugify
 
-__all__ = ["slugify", "LanguageSelector"]
+__all__ = ["slugify", "LanguageSelector", "SearchVectorField"]
 
 
 def slugify(base):
@@ -18,3 +19,12 @@ class LanguageSelector(forms.Select):
     def __init__(self, *args, **kwargs):
         kwargs.update({"attrs": {**kwargs.get("attrs", {}), **{"class": "js-language-selector"}}})
         super().__init__(*args, **kwargs)
+
+
+class SearchVectorField(PostgresSearchVectorField):
+    """``tsvector`` column on PostgreSQL, unused text column on the other databases."""
+
+    def db_type(self, connection):
+        if connection.vendor == "postgresql":
+            return super().db_type(connection)
+        return "text"
@@ -45,7 +45,9 @@ class CategoryAdminForm(ConfigFormBase, TranslatableModelForm):
         if "parent" in self.fields:
             qs = self.fields["parent"].queryset
             if self.instance.pk:
-                qs = qs.exclude(pk__in=[self.instance.pk] + [child.pk for child in self.instance.descendants()])
+                qs = qs.exclude(
+                    pk__in=PostCategory.objects.descendants_of(self.instance, include_self=True).values("pk")
+                )
             config = None
             if getattr(self.instance, "app_config_id", None):
                 qs = qs.filter(app_config__namespace=self.instance.app_config.namespace)
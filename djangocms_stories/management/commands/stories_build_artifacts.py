@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from djangocms_stories.artifacts import build_artifacts
+
+
+class Command(BaseCommand):
+    help = "Write the gzip-compressed sitemap shards and feeds of the stories to the artifacts storage."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--namespace", action="append", default=[], help="Only build the artifacts of this config (repeatable)"
+        )
+        parser.add_argument(
+            "--language", action="append", default=[], help="Only build the artifacts in this language (repeatable)"
+        )
+
+    def handle(self, *args, **options):
+        written = build_artifacts(options["namespace"], options["language"])
+        self.stdout.write(f"Wrote {written} artifacts")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from djangocms_stories.related import rebuild_related_posts
+from djangocms_stories.settings import get_setting
+
+
+class Command(BaseCommand):
+    help = "Compute the automatic related posts of all the posts."
+
+    def handle(self, *args, **options):
+        if not get_setting("ENABLE_AUTO_RELATED"):
+            raise CommandError("Automatic related posts are disabled by STORIES_ENABLE_AUTO_RELATED")
+        count = rebuild_related_posts()
+        self.stdout.write(f"Computed the related posts of {count} posts")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from djangocms_stories.models import PostContent, PostSearchDocument
+from djangocms_stories.search import create_search_structures
+from djangocms_stories.settings import get_setting
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of the posts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--language", help="Only index the post contents in this language")
+
+    def handle(self, *args, **options):
+        if not get_setting("ENABLE_SEARCH"):
+            raise CommandError("Search is disabled by STORIES_ENABLE_SEARCH")
+        # Search enabled after the last migrate
+        create_search_structures()
+        contents = PostContent.admin_manager.all()
+        if options["language"]:
+            contents = contents.filter(language=options["language"])
+        indexed = PostSearchDocument.objects.rebuild(contents)
+        self.stdout.write(f"Indexed {indexed} post contents")
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from djangocms_stories.settings import get_setting
+from djangocms_stories.similarity import rebuild_similar_contents
+
+
+class Command(BaseCommand):
+    help = "Compute the text signatures and the similar contents of all the post contents."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=None,
+            help="Number of processes reading the texts and computing the signatures (defaults to the number of CPUs)",
+        )
+
+    def handle(self, *args, **options):
+        if not get_setting("ENABLE_SIMILAR_POSTS"):
+            raise CommandError("Similar posts are disabled by STORIES_ENABLE_SIMILAR_POSTS")
+        count = rebuild_similar_contents(options["processes"])
+        self.stdout.write(f"Computed the similar contents of {count} post contents")
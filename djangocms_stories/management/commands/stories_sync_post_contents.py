@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from djangocms_stories.models import Post, PostContent
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the dates, config and sites flag of the posts to their contents, e.g. after loading "
+        "them with loaddata or bulk_create, which do not copy them."
+    )
+
+    def handle(self, *args, **options):
+        post_ids = list(Post._base_manager.order_by("pk").values_list("pk", flat=True))
+        count = 0
+        for start in range(0, len(post_ids), BATCH_SIZE):
+            count += PostContent.admin_manager.sync_posts(post_ids[start : start + BATCH_SIZE])
+        self.stdout.write(f"Updated {count} post contents")
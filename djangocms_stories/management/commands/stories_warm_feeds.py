@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from djangocms_stories.feeds import warm_instant_articles
+from djangocms_stories.models import Post
+from djangocms_stories.settings import get_setting
+
+
+class Command(BaseCommand):
+    help = "Render the Instant Articles of the posts and store them in the feed cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--namespace", action="append", default=[], help="Only render the posts of this config (repeatable)"
+        )
+        parser.add_argument(
+            "--language", action="append", default=[], help="Only render the articles in this language (repeatable)"
+        )
+        parser.add_argument(
+            "--all", action="store_true", help="Render all the posts, not only the ones listed in the feeds"
+        )
+        parser.add_argument("--workers", type=int, help="Number of rendering threads")
+
+    def handle(self, *args, **options):
+        posts = Post.objects.select_related("app_config").order_by("-date_modified")
+        if options["namespace"]:
+            posts = posts.filter(app_config__namespace__in=options["namespace"])
+        if not options["all"]:
+            # Same posts as the Instant Articles feed of each config
+            limit = get_setting("FEED_INSTANT_ITEMS")
+            namespaces = set(posts.values_list("app_config__namespace", flat=True))
+            posts = [
+                post
+                for namespace in sorted(namespaces)
+                for post in posts.filter(app_config__namespace=namespace).with_contents()[:limit]
+            ]
+        else:
+            posts = posts.with_contents()
+        rendered = warm_instant_articles(posts, options["language"], options["workers"])
+        self.stdout.write(f"Rendered {rendered} instant articles")
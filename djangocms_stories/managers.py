@@ -1,11 +1,16 @@
 from __future__ import annotations
 
-from collections import Counter
+from datetime import date
 
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.sites.models import Site
-from django.db import models
-from django.utils.timezone import now
+from django.core.exceptions import EmptyResultSet
+from django.db import models, transaction
+from django.db.models.functions import Coalesce, TruncMonth
+from django.db.models.query import ModelIterable
+from django.utils.timezone import get_default_timezone, localtime, now
+from django.utils.translation import get_language
+from parler.managers import TranslatableManager, TranslatableQuerySet
 
 from cms.models.managers import WithUserMixin
 
@@ -28,10 +33,12 @@ class TaggedFilterItem:
 
         filters = None
         if queryset is not None:
-            filters = set()
-            for item in queryset.all():
-                filters.update(item.tags.all())
-            filters = {tag.id for tag in filters}
+            filters = set(
+                TaggedItem.objects.filter(
+                    content_type=ContentType.objects.get_for_model(queryset.model),
+                    object_id__in=queryset.values("pk"),
+                ).values_list("tag_id", flat=True)
+            )
         elif other_model is not None:
             filters = set(
                 TaggedItem.objects.filter(content_type__model=other_model.__name__.lower()).values_list(
@@ -58,34 +65,311 @@ class TaggedFilterItem:
         queryset = self.tag_list(other_model, queryset)
         return queryset.values("slug")
 
-    def tag_cloud(self, other_model=None, queryset=None, published: bool = True, site: Site | None = None):
-        from taggit.models import TaggedItem
+    def tag_cloud(
+        self,
+        other_model=None,
+        queryset=None,
+        published: bool = True,
+        site: Site | None = None,
+        limit: int | None = None,
+    ):
+        """
+        Returns the tags used by the posts in ``queryset`` (all posts by default), sorted by
+        decreasing usage count which is available as ``count`` attribute.
 
+        Tags are counted in a single aggregated query, results are cached until tags or
+        posts change (see ``STORIES_TAG_CLOUD_CACHE_TIMEOUT``).
+
+        :param other_model: only return the tags also used by this model
+        :param queryset: posts to count the tags of
+        :param published: only count posts with published content
+        :param site: only count posts visible on this site
+        :param limit: maximum number of tags to return
+        """
+        from .cache import get_cache_key, get_or_compute
+        from .settings import get_setting
+
+        if queryset is None:
+            queryset = self.get_queryset()
         if site:
             queryset = queryset.on_site(site)
-        tag_ids = self._taglist(other_model, queryset)
-        kwargs = {}
         if published:
-            kwargs = {
-                "object_id__in": self.model.objects.all(),
-                "content_type": ContentType.objects.get_for_model(self.model),
+            content_model = self.model._meta.get_field("postcontent").related_model
+            queryset = queryset.filter(pk__in=content_model.objects.values("post_id"))
+        through = self.model._meta.get_field("tags").remote_field.through
+        items = through._meta.get_field("tag").related_query_name()
+        tags = through.tag_model().objects.filter(
+            **{
+                f"{items}__content_type": ContentType.objects.get_for_model(self.model),
+                f"{items}__object_id__in": queryset.values("pk"),
             }
-        kwargs["tag_id__in"] = tag_ids
-        counted_tags = dict(
-            TaggedItem.objects.filter(**kwargs)
-            .values("tag")
-            .annotate(count=models.Count("tag"))
-            .values_list("tag", "count")
         )
-        tags = TaggedItem.tag_model().objects.filter(pk__in=counted_tags.keys())
-        for tag in tags:
-            tag.count = counted_tags[tag.pk]
-        return sorted(tags, key=lambda x: -x.count)
+        if other_model is not None:
+            tags = tags.filter(
+                pk__in=through.objects.filter(content_type=ContentType.objects.get_for_model(other_model)).values(
+                    "tag_id"
+                )
+            )
+        tags = tags.annotate(count=models.Count(items)).order_by("-count", "name")[:limit]
+        try:
+            key = get_cache_key("tag-cloud", tags.query)
+        except EmptyResultSet:
+            return []
+        return get_or_compute(key, lambda: list(tags), get_setting("TAG_CLOUD_CACHE_TIMEOUT"))
 
 
 class SiteQuerySet(models.QuerySet):
     def on_site(self, site: Site) -> SiteQuerySet:
-        return self.filter(models.Q(post__sites__isnull=True) | models.Q(post__sites=site.pk))
+        # Subquery on the sites of the posts: no join, hence no duplicated contents
+        through = self.model._meta.get_field("post").related_model._meta.get_field("sites").remote_field.through
+        return self.filter(
+            models.Q(all_sites=True) | models.Q(post__in=through.objects.filter(site=site.pk).values("post_id"))
+        )
+
+    def search(self, query: str, language: str | None = None) -> SiteQuerySet:
+        """Post contents matching the full-text query, best matches first (see :py:mod:`djangocms_stories.search`)."""
+        from .search import search
+
+        return search(self, query, language)
+
+
+def fill_content_cache(posts, languages=None, draft: bool = False) -> None:
+    """
+    Fill the content and language caches of the given posts in bulk.
+
+    After this call, :py:meth:`djangocms_stories.models.Post.get_content`,
+    :py:meth:`djangocms_stories.models.Post.get_available_languages` and
+    :py:meth:`djangocms_stories.models.Post.safe_translation_getter` do not hit the
+    database for the given languages anymore.
+
+    Published contents are loaded for all languages in one query, hence
+    ``languages`` only limits the draft contents.
+
+    :param posts: iterable of :py:class:`djangocms_stories.models.Post` instances
+    :param languages: list of language codes to load (defaults to the current language)
+    :param draft: load the current (draft) content instead of the published one
+    """
+    posts = [post for post in posts if post.pk]
+    if not posts:
+        return
+    languages = list(languages) if languages else [get_language()]
+    content_model = posts[0]._meta.get_field("postcontent").related_model
+    key_suffix = "latest" if draft else "public"
+    post_ids = {post.pk for post in posts}
+    available = {pk: [] for pk in post_ids}
+    contents = {}
+
+    public_contents = content_model.objects.filter(post__in=post_ids).order_by("pk")
+    if draft:
+        for content in content_model.admin_manager.current_content(post__in=post_ids, language__in=languages):
+            contents[content.post_id, content.language] = content
+        for post_id, language in public_contents.values_list("post_id", "language"):
+            available[post_id].append(language)
+    else:
+        # A single query for the published contents in all languages fills both caches
+        for content in public_contents:
+            available[content.post_id].append(content.language)
+            contents[content.post_id, content.language] = content
+
+    for post in posts:
+        post._language_cache = available[post.pk]
+        for language in set(languages).union(post._language_cache if not draft else ()):
+            content = contents.get((post.pk, language))
+            if content is not None:
+                content.post = post
+            post._content_cache[f"{language}_{key_suffix}"] = content
+
+
+class PostQuerySet(SiteQuerySet):
+    _content_languages = None
+    _content_draft = False
+
+    def on_site(self, site: Site) -> PostQuerySet:
+        return self.filter(models.Q(sites__isnull=True) | models.Q(sites=site.pk))
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._content_languages = self._content_languages
+        clone._content_draft = self._content_draft
+        return clone
+
+    def in_category(self, category, include_descendants: bool = True) -> PostQuerySet:
+        """
+        Filter the posts linked to the given category or, by default, to any of its sub-categories.
+
+        Posts are matched with a subquery, hence no duplicates are returned for posts linked
+        to more than one category of the subtree.
+
+        :param category: :py:class:`djangocms_stories.models.PostCategory` instance or primary key
+        :param include_descendants: include posts linked to sub-categories
+        """
+        category_model = self.model._meta.get_field("categories").related_model
+        category_id = getattr(category, "pk", category)
+        if include_descendants:
+            category_ids = category_model.objects.descendants_of(category_id, include_self=True).values("pk")
+        else:
+            category_ids = [category_id]
+        through = self.model._meta.get_field("categories").remote_field.through
+        return self.filter(pk__in=through.objects.filter(postcategory__in=category_ids).values("post_id"))
+
+    def with_contents(self, languages=None, draft: bool = False) -> PostQuerySet:
+        """
+        Load the post contents for all posts of the queryset at once when the queryset
+        is evaluated (see :py:func:`fill_content_cache`).
+
+        :param languages: list of language codes to load (defaults to the language active
+                          when the queryset is evaluated)
+        :param draft: load the current (draft) content instead of the published one
+        """
+        clone = self._chain()
+        clone._content_languages = list(languages) if languages else []
+        clone._content_draft = draft
+        return clone
+
+    def _fetch_all(self):
+        fill_cache = (
+            self._result_cache is None
+            and self._content_languages is not None
+            and issubclass(self._iterable_class, ModelIterable)
+        )
+        super()._fetch_all()
+        if fill_cache:
+            fill_content_cache(self._result_cache, self._content_languages, self._content_draft)
+
+
+class PostCategoryQuerySet(TranslatableQuerySet):
+    def descendants_of(self, category, include_self: bool = False) -> PostCategoryQuerySet:
+        """
+        Filter the descendants of the given category, using the hierarchy index.
+
+        The distance from ``category`` is available as ``relative_depth`` annotation.
+
+        :param category: :py:class:`djangocms_stories.models.PostCategory` instance or primary key
+        :param include_self: include the category itself
+        """
+        filters = {"ancestor_links__ancestor": getattr(category, "pk", category)}
+        if not include_self:
+            filters["ancestor_links__depth__gt"] = 0
+        # Single filter() call: both conditions must apply to the same path
+        return self.filter(**filters).annotate(relative_depth=models.F("ancestor_links__depth"))
+
+    def ancestors_of(self, category, include_self: bool = False) -> PostCategoryQuerySet:
+        """
+        Filter the ancestors of the given category, using the hierarchy index.
+
+        The distance from ``category`` is available as ``relative_depth`` annotation.
+
+        :param category: :py:class:`djangocms_stories.models.PostCategory` instance or primary key
+        :param include_self: include the category itself
+        """
+        filters = {"descendant_links__descendant": getattr(category, "pk", category)}
+        if not include_self:
+            filters["descendant_links__depth__gt"] = 0
+        return self.filter(**filters).annotate(relative_depth=models.F("descendant_links__depth"))
+
+    def with_depth(self) -> PostCategoryQuerySet:
+        """Annotate the depth of each category in the hierarchy (``0`` for root categories)."""
+        closure_model = self.model._meta.get_field("ancestor_links").related_model
+        return self.annotate(
+            depth=models.Subquery(
+                closure_model.objects.filter(descendant=models.OuterRef("pk")).order_by("-depth").values("depth")[:1]
+            )
+        )
+
+    def with_post_counts(
+        self, site: Site | None = None, namespace: str | None = None, language: str | None = None
+    ) -> PostCategoryQuerySet:
+        """
+        Annotate the number of linked posts of each category in a single grouped query.
+
+        Only posts in the same namespace as the category are counted. ``post_count`` honors
+        ``site`` (posts without sites are visible on all sites), ``post_count_all_sites`` does not.
+        Annotations are used by :py:attr:`djangocms_stories.models.PostCategory.count` and
+        :py:attr:`djangocms_stories.models.PostCategory.count_all_sites`.
+
+        :param site: count only posts visible on this site
+        :param namespace: filter categories by :py:class:`djangocms_stories.cms_appconfig.StoriesConfig` namespace
+        :param language: count only posts with published content in this language
+        """
+        post_filter = models.Q(posts__app_config=models.F("app_config"))
+        if language:
+            post_model = self.model._meta.get_field("posts").related_model
+            content_model = post_model._meta.get_field("postcontent").related_model
+            post_filter &= models.Q(posts__in=content_model.objects.filter(language=language).values("post_id"))
+        site_filter = models.Q()
+        if site:
+            site_filter = models.Q(posts__sites__isnull=True) | models.Q(posts__sites=site.pk)
+        qs = self
+        if namespace:
+            qs = qs.filter(app_config__namespace=namespace)
+        return qs.annotate(
+            post_count=models.Count("posts", filter=post_filter & site_filter, distinct=True),
+            post_count_all_sites=models.Count("posts", filter=post_filter, distinct=True),
+        )
+
+
+class PostCategoryManager(TranslatableManager):
+    _queryset_class = PostCategoryQuerySet
+
+    def descendants_of(self, category, include_self: bool = False):
+        return self.get_queryset().descendants_of(category, include_self)
+
+    def ancestors_of(self, category, include_self: bool = False):
+        return self.get_queryset().ancestors_of(category, include_self)
+
+    def with_depth(self):
+        return self.get_queryset().with_depth()
+
+    def with_post_counts(self, site: Site | None = None, namespace: str | None = None, language: str | None = None):
+        return self.get_queryset().with_post_counts(site, namespace, language)
+
+
+class PostCategoryClosureManager(models.Manager):
+    use_in_migrations = True
+
+    def insert_node(self, category_id: int, parent_id: int | None) -> None:
+        """Add the paths of a new leaf category."""
+        paths = [self.model(ancestor_id=category_id, descendant_id=category_id, depth=0)]
+        if parent_id:
+            paths.extend(
+                self.model(ancestor_id=ancestor_id, descendant_id=category_id, depth=depth + 1)
+                for ancestor_id, depth in self.filter(descendant_id=parent_id).values_list("ancestor_id", "depth")
+            )
+        self.bulk_create(paths)
+
+    def move_node(self, category_id: int, parent_id: int | None) -> None:
+        """Move the subtree of a category below a new parent."""
+        subtree = list(self.filter(ancestor_id=category_id).values_list("descendant_id", "depth"))
+        subtree_ids = [descendant_id for descendant_id, _depth in subtree]
+        self.filter(descendant_id__in=subtree_ids).exclude(ancestor_id__in=subtree_ids).delete()
+        if parent_id:
+            ancestors = list(self.filter(descendant_id=parent_id).values_list("ancestor_id", "depth"))
+            self.bulk_create(
+                self.model(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=ancestor_depth + depth + 1)
+                for ancestor_id, ancestor_depth in ancestors
+                for descendant_id, depth in subtree
+            )
+
+    def sync_node(self, category_id: int, parent_id: int | None) -> None:
+        """Update the paths of a category after it has been saved."""
+        ancestors = dict(self.filter(descendant_id=category_id, depth__lte=1).values_list("depth", "ancestor_id"))
+        if not ancestors:
+            self.insert_node(category_id, parent_id)
+        elif ancestors.get(1) != parent_id:
+            self.move_node(category_id, parent_id)
+
+    def rebuild(self) -> None:
+        """Rebuild the whole hierarchy index from the category parents."""
+        category_model = self.model._meta.get_field("ancestor").related_model
+        parents = dict(category_model._base_manager.values_list("pk", "parent_id"))
+        paths = []
+        for category_id in parents:
+            ancestor_id, depth = category_id, 0
+            while ancestor_id is not None and depth <= len(parents):
+                paths.append(self.model(ancestor_id=ancestor_id, descendant_id=category_id, depth=depth))
+                ancestor_id, depth = parents.get(ancestor_id), depth + 1
+        self.all().delete()
+        self.bulk_create(paths, batch_size=500)
 
 
 class AdminSiteQuerySet(SiteQuerySet):
@@ -105,10 +389,16 @@ class AdminSiteQuerySet(SiteQuerySet):
 class SiteManager(WithUserMixin, models.Manager):
     _queryset_class = SiteQuerySet
 
+    def search(self, query: str, language: str | None = None) -> SiteQuerySet:
+        return self.get_queryset().search(query, language)
+
 
 class AdminManager(models.Manager):
     _queryset_class = AdminSiteQuerySet
 
+    def search(self, query: str, language: str | None = None) -> AdminSiteQuerySet:
+        return self.get_queryset().search(query, language)
+
     def current_content(self, **kwargs):
         """Syntactic sugar: admin_manager.current_content()"""
         return self.get_queryset().current_content(**kwargs)
@@ -117,13 +407,29 @@ class AdminManager(models.Manager):
         """Syntactic sugar: admin_manager.latest_content()"""
         return self.get_queryset().latest_content(**kwargs)
 
+    def sync_posts(self, post_ids) -> int:
+        """
+        Copy the dates, config and sites flag of the given posts to all their contents, in a
+        single query.
+
+        :param post_ids: primary keys of the posts (or a queryset)
+        :return: number of updated contents
+        """
+        post_model = self.model._meta.get_field("post").related_model
+        posts = post_model._base_manager.filter(pk=models.OuterRef("post_id"))
+        through = post_model._meta.get_field("sites").remote_field.through
+        return self.filter(post__in=post_ids).update(
+            **{name: models.Subquery(posts.values(name)[:1]) for name in self.model.SYNCED_FIELDS},
+            all_sites=~models.Exists(through.objects.filter(post_id=models.OuterRef("post_id"))),
+        )
+
 
 class GenericDateTaggedManager(TaggedFilterItem, models.Manager):
     use_for_related_fields = True
     start_date_field = "date_featured"
     fallback_date_field = "date_modified"
 
-    queryset_class = SiteQuerySet
+    queryset_class = PostQuerySet
 
     def get_queryset(self, *args, **kwargs):
         return self.queryset_class(model=self.model, using=self._db, hints=self._hints)
@@ -131,32 +437,160 @@ class GenericDateTaggedManager(TaggedFilterItem, models.Manager):
     def on_site(self, site=None):
         return self.get_queryset().on_site(site)
 
-    def get_months(self, queryset=None, site: Site | None = None):
+    def with_contents(self, languages=None, draft: bool = False):
+        return self.get_queryset().with_contents(languages, draft)
+
+    def in_category(self, category, include_descendants: bool = True):
+        return self.get_queryset().in_category(category, include_descendants)
+
+    def month_expression(self) -> TruncMonth:
+        """Returns the expression of the archive month of the posts."""
+        return TruncMonth(
+            Coalesce(self.start_date_field, self.fallback_date_field),
+            output_field=models.DateField(),
+            tzinfo=get_default_timezone(),
+        )
+
+    def get_post_month(self, post) -> date:
+        """Returns the archive month of the given post (see :py:meth:`month_expression`)."""
+        value = getattr(post, self.start_date_field) or getattr(post, self.fallback_date_field)
+        return localtime(value, get_default_timezone()).date().replace(day=1)
+
+    def get_months(self, queryset=None, site: Site | None = None, months: int | None = None):
         """
         Get months with aggregate count (how many posts is in the month).
-        Results are ordered by date.
+        Results are ordered by date (newest first), counts are computed by the database.
+
+        :param queryset: posts to count (all posts by default)
+        :param site: count only the posts visible on this site
+        :param months: limit the results to the last ``months`` months
         """
         if queryset is None:
             queryset = self.get_queryset()
         if site:
             queryset = queryset.on_site(site)
-        dates_qs = queryset.values_list(self.start_date_field, self.fallback_date_field)
-        dates = []
-        for blog_dates in dates_qs:
-            if blog_dates[0]:
-                current_date = blog_dates[0]
-            else:
-                current_date = blog_dates[1]
-            dates.append(
-                (
-                    current_date.year,
-                    current_date.month,
-                )
-            )
-        date_counter = Counter(dates)
-        dates = set(dates)
-        dates = sorted(dates, reverse=True)
+        queryset = queryset.annotate(archive_month=self.month_expression())
+        if months:
+            queryset = queryset.filter(archive_month__gte=first_month(months))
+        dates = (
+            queryset.order_by()
+            .values("archive_month")
+            .annotate(count=models.Count("pk", distinct=True))
+            .order_by("-archive_month")
+            .values_list("archive_month", "count")
+        )
+        return [{"date": month, "count": count} for month, count in dates]
+
+
+def first_month(months: int) -> date:
+    """Returns the first day of the oldest month in the last ``months`` months (current month included)."""
+    today = localtime(now(), get_default_timezone()).date()
+    month_index = today.year * 12 + today.month - months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+class PostMonthCountManager(models.Manager):
+    use_in_migrations = True
+
+    def _get_post_model(self):
+        return self.model._meta.apps.get_model("djangocms_stories", "Post")
+
+    def _count_posts(self, posts):
+        """Returns the rows for the given posts, grouped by namespace, site and month"""
+        rows = (
+            posts.annotate(archive_month=GenericDateTaggedManager().month_expression())
+            .order_by()
+            .values("app_config", "sites", "archive_month")
+            .annotate(count=models.Count("pk", distinct=True))
+        )
         return [
-            {"date": now().replace(year=year, month=month, day=1), "count": date_counter[year, month]}
-            for year, month in dates
+            self.model(
+                app_config_id=row["app_config"], site_id=row["sites"], month=row["archive_month"], count=row["count"]
+            )
+            for row in rows
         ]
+
+    def get_post_buckets(self, post_ids) -> set:
+        """Returns the (namespace, month) pairs the given posts are currently counted in."""
+        posts = self._get_post_model()._base_manager.filter(pk__in=post_ids)
+        return set(
+            posts.annotate(archive_month=GenericDateTaggedManager().month_expression()).values_list(
+                "app_config", "archive_month"
+            )
+        )
+
+    def refresh(self, buckets) -> None:
+        """
+        Recompute the counts of the given (namespace, month) pairs.
+
+        :param buckets: iterable of (:py:class:`djangocms_stories.cms_appconfig.StoriesConfig` primary key, month)
+        """
+        post_manager = self._get_post_model()._base_manager
+        buckets = set(buckets)
+        with transaction.atomic(using=self.db):
+            self._lock_configs({app_config_id for app_config_id, _ in buckets})
+            for app_config_id, month in buckets:
+                posts = post_manager.annotate(archive_month=GenericDateTaggedManager().month_expression()).filter(
+                    app_config_id=app_config_id, archive_month=month
+                )
+                self.filter(app_config_id=app_config_id, month=month).delete()
+                self.bulk_create(self._count_posts(posts))
+
+    def rebuild(self) -> None:
+        """Recompute all the counts."""
+        with transaction.atomic(using=self.db):
+            self._lock_configs(None)
+            self.all().delete()
+            self.bulk_create(self._count_posts(self._get_post_model()._base_manager.all()), batch_size=500)
+
+    def _lock_configs(self, config_ids) -> None:
+        """
+        Lock the given configs (all if ``None``) until the end of the transaction: concurrent
+        updates of their counts wait instead of inserting the same rows.
+        """
+        configs = self.model._meta.get_field("app_config").related_model._base_manager.using(self.db)
+        if config_ids is not None:
+            configs = configs.filter(pk__in=config_ids)
+        list(configs.select_for_update().order_by("pk").values_list("pk", flat=True))
+
+    def get_months(self, app_config, site: Site, months: int | None = None) -> list[dict]:
+        """
+        Get months with the number of posts of the namespace visible on the site, newest first.
+
+        Same as :py:meth:`GenericDateTaggedManager.get_months`, but reads the precomputed counts.
+
+        :param app_config: :py:class:`djangocms_stories.cms_appconfig.StoriesConfig` instance
+        :param site: count only the posts visible on this site
+        :param months: limit the results to the last ``months`` months
+        """
+        queryset = self.filter(models.Q(site__isnull=True) | models.Q(site=site), app_config=app_config)
+        if months:
+            queryset = queryset.filter(month__gte=first_month(months))
+        dates = queryset.values("month").annotate(total=models.Sum("count")).order_by("-month")
+        return [{"date": row["month"], "count": row["total"]} for row in dates]
+
+
+class PostSearchDocumentManager(models.Manager):
+    def update_document(self, content) -> None:
+        """Index the given post content."""
+        from .cache import bump_generation
+        from .search import get_document, get_search_config, update_search_vectors
+
+        self.update_or_create(
+            post_content=content,
+            defaults={
+                "language": content.language,
+                "config": get_search_config(content.language),
+                "document": get_document(content),
+            },
+        )
+        update_search_vectors(self.filter(pk=content.pk))
+        bump_generation("search")
+
+    def rebuild(self, contents) -> int:
+        """Index the given post contents, returns the number of indexed contents."""
+        indexed = 0
+        for content in contents.select_related("post").iterator(chunk_size=500):
+            self.update_document(content)
+            indexed += 1
+        return indexed
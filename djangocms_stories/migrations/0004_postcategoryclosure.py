@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+import djangocms_stories.managers
+
+
+def build_category_hierarchy(apps, schema_editor):
+    PostCategoryClosure = apps.get_model("djangocms_stories", "PostCategoryClosure")
+    PostCategoryClosure.objects.rebuild()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djangocms_stories', '0003_alter_post_options_alter_postcontent_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostCategoryClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField(verbose_name='depth')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='djangocms_stories.postcategory', verbose_name='ancestor')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='djangocms_stories.postcategory', verbose_name='descendant')),
+            ],
+            options={
+                'verbose_name': 'post category path',
+                'verbose_name_plural': 'post category paths',
+                'unique_together': {('ancestor', 'descendant')},
+            },
+            managers=[
+                ('objects', djangocms_stories.managers.PostCategoryClosureManager()),
+            ],
+        ),
+        migrations.RunPython(build_category_hierarchy, migrations.RunPython.noop),
+    ]
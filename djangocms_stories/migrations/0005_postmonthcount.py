@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+import djangocms_stories.managers
+
+
+def count_post_months(apps, schema_editor):
+    PostMonthCount = apps.get_model("djangocms_stories", "PostMonthCount")
+    PostMonthCount.objects.rebuild()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djangocms_stories', '0004_postcategoryclosure'),
+        ('sites', '0002_alter_domain_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostMonthCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='month')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='count')),
+                ('app_config', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='djangocms_stories.storiesconfig', verbose_name='app. config')),
+                ('site', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='sites.site', verbose_name='site')),
+            ],
+            options={
+                'verbose_name': 'post month count',
+                'verbose_name_plural': 'post month counts',
+                'indexes': [models.Index(fields=['app_config', 'month'], name='djangocms_s_app_con_c342cb_idx')],
+                'unique_together': {('app_config', 'site', 'month')},
+            },
+            managers=[
+                ('objects', djangocms_stories.managers.PostMonthCountManager()),
+            ],
+        ),
+        migrations.RunPython(count_post_months, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djangocms_stories', '0005_postmonthcount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storiesconfig',
+            name='cursor_pagination',
+            field=models.BooleanField(default=False, help_text='Paginate list views with next / previous links only. Recommended for large archives as pages do not need to count the articles.', verbose_name='Cursor pagination'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+import djangocms_stories.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djangocms_stories', '0006_storiesconfig_cursor_pagination'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearchDocument',
+            fields=[
+                ('post_content', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='djangocms_stories.postcontent', verbose_name='post content')),
+                ('language', models.CharField(db_index=True, max_length=15, verbose_name='language')),
+                ('config', models.CharField(max_length=50, verbose_name='search configuration')),
+                ('document', models.TextField(blank=True, default='', verbose_name='document')),
+                ('search_vector', djangocms_stories.fields.SearchVectorField(editable=False, null=True)),
+            ],
+            options={
+                'verbose_name': 'post search document',
+                'verbose_name_plural': 'post search documents',
+            },
+        ),
+    ]
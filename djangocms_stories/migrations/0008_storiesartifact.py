@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djangocms_stories', '0007_postsearchdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoriesArtifact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='name')),
+                ('file', models.CharField(max_length=255, verbose_name='file')),
+                ('checksum', models.CharField(max_length=64, verbose_name='checksum')),
+                ('content_type', models.CharField(max_length=100, verbose_name='content type')),
+                ('date_modified', models.DateTimeField(auto_now=True, verbose_name='last modified')),
+            ],
+            options={
+                'verbose_name': 'stories artifact',
+                'verbose_name_plural': 'stories artifacts',
+            },
+        ),
+    ]
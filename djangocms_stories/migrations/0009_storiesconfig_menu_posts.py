@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djangocms_stories', '0008_storiesartifact'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storiesconfig',
+            name='menu_posts_current_branch',
+            field=models.BooleanField(default=False, help_text='Only show the posts of the category or month being viewed. Recommended for large archives as the cached menu stays small.', verbose_name='Menu posts of current branch only'),
+        ),
+        migrations.AddField(
+            model_name='storiesconfig',
+            name='menu_posts_grouping',
+            field=models.CharField(choices=[('category', 'By category'), ('date', 'By year and month')], default='category', help_text='Show the posts under their category, or under year and month nodes', max_length=20, verbose_name='Menu posts grouping'),
+        ),
+        migrations.AddField(
+            model_name='storiesconfig',
+            name='menu_posts_limit',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Number of latest posts shown in each category or month of the menu, 0 for all', verbose_name='Menu posts limit'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djangocms_stories', '0009_storiesconfig_menu_posts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedPost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='score')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='djangocms_stories.post', verbose_name='post')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='djangocms_stories.post', verbose_name='related post')),
+            ],
+            options={
+                'verbose_name': 'related post',
+                'verbose_name_plural': 'related posts',
+                'indexes': [models.Index(fields=['post', '-score'], name='djangocms_s_post_id_c84155_idx')],
+                'unique_together': {('post', 'related')},
+            },
+        ),
+    ]
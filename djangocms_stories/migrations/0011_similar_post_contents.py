@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djangocms_stories', '0010_relatedpost'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostContentSignature',
+            fields=[
+                ('post_content', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='similarity_signature', serialize=False, to='djangocms_stories.postcontent', verbose_name='post content')),
+                ('language', models.CharField(max_length=15, verbose_name='language')),
+                ('signature', models.BinaryField(verbose_name='signature')),
+            ],
+            options={
+                'verbose_name': 'post content signature',
+                'verbose_name_plural': 'post content signatures',
+            },
+        ),
+        migrations.CreateModel(
+            name='PostContentBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField(verbose_name='band')),
+                ('bucket', models.BigIntegerField(verbose_name='bucket')),
+                ('signature', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buckets', to='djangocms_stories.postcontentsignature', verbose_name='signature')),
+            ],
+            options={
+                'verbose_name': 'post content bucket',
+                'verbose_name_plural': 'post content buckets',
+                'indexes': [models.Index(fields=['band', 'bucket'], name='djangocms_s_band_eecbc7_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SimilarPostContent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('similarity', models.FloatField(verbose_name='similarity')),
+                ('post_content', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='djangocms_stories.postcontent', verbose_name='post content')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='djangocms_stories.postcontent', verbose_name='similar post content')),
+            ],
+            options={
+                'verbose_name': 'similar post content',
+                'verbose_name_plural': 'similar post contents',
+                'indexes': [models.Index(fields=['post_content', '-similarity'], name='djangocms_s_post_co_9c9451_idx')],
+                'unique_together': {('post_content', 'similar')},
+            },
+        ),
+    ]
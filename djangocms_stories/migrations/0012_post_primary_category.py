@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:05
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def set_primary_categories(apps, schema_editor):
+    Post = apps.get_model('djangocms_stories', 'Post')
+    PostCategoryTranslation = apps.get_model('djangocms_stories', 'PostCategoryTranslation')
+    primary = {}
+    for post_id, category_id in (
+        Post.categories.through.objects.order_by('post_id', F('postcategory__priority').asc(nulls_last=True), 'postcategory_id')
+        .values_list('post_id', 'postcategory_id')
+    ):
+        primary.setdefault(post_id, category_id)
+    slugs = defaultdict(dict)
+    for category_id, language_code, slug in PostCategoryTranslation.objects.order_by('pk').values_list('master_id', 'language_code', 'slug'):
+        slugs[category_id][language_code] = slug
+    posts = defaultdict(list)
+    for post_id, category_id in primary.items():
+        posts[category_id].append(post_id)
+    for category_id, post_ids in posts.items():
+        for start in range(0, len(post_ids), 500):
+            Post.objects.filter(pk__in=post_ids[start:start + 500]).update(
+                primary_category=category_id, primary_category_slugs=slugs[category_id]
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djangocms_stories', '0011_similar_post_contents'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='primary_category',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='djangocms_stories.postcategory', verbose_name='primary category'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='primary_category_slugs',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='primary category slugs'),
+        ),
+        migrations.RunPython(set_primary_categories, migrations.RunPython.noop),
+    ]
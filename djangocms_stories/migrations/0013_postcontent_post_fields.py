@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery
+
+
+def copy_post_fields(apps, schema_editor):
+    Post = apps.get_model('djangocms_stories', 'Post')
+    PostContent = apps.get_model('djangocms_stories', 'PostContent')
+    posts = Post.objects.filter(pk=OuterRef('post_id'))
+    sites = Post.sites.through.objects.filter(post_id=OuterRef('post_id'))
+    pks = list(PostContent.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(pks), 1000):
+        PostContent.objects.filter(pk__in=pks[start:start + 1000]).update(
+            date_published=Subquery(posts.values('date_published')[:1]),
+            date_published_end=Subquery(posts.values('date_published_end')[:1]),
+            date_featured=Subquery(posts.values('date_featured')[:1]),
+            app_config=Subquery(posts.values('app_config')[:1]),
+            all_sites=~Exists(sites),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djangocms_stories', '0012_post_primary_category'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='postcontent',
+            options={'get_latest_by': 'date_published', 'ordering': ('-date_published', '-pk'), 'verbose_name': 'post content', 'verbose_name_plural': 'post contents'},
+        ),
+        migrations.AddField(
+            model_name='postcontent',
+            name='all_sites',
+            field=models.BooleanField(default=True, editable=False, verbose_name='all sites'),
+        ),
+        migrations.AddField(
+            model_name='postcontent',
+            name='app_config',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='djangocms_stories.storiesconfig', verbose_name='app. config'),
+        ),
+        migrations.AddField(
+            model_name='postcontent',
+            name='date_featured',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='featured date'),
+        ),
+        migrations.AddField(
+            model_name='postcontent',
+            name='date_published',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='published since'),
+        ),
+        migrations.AddField(
+            model_name='postcontent',
+            name='date_published_end',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='published until'),
+        ),
+        migrations.RunPython(copy_post_fields, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='postcontent',
+            index=models.Index(fields=['language', 'app_config', '-date_published', '-id'], name='djangocms_s_languag_7fac36_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postcontent',
+            index=models.Index(fields=['language', 'slug'], name='djangocms_s_languag_8e0486_idx'),
+        ),
+    ]
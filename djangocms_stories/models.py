@@ -1,38 +1,57 @@
+from __future__ import annotations
+
 import hashlib
+from collections import defaultdict
 
-from cms.models import CMSPlugin, PlaceholderRelationField
+from cms.models import CMSPlugin, Placeholder, PlaceholderRelationField
+from cms.signals import post_placeholder_operation
 from cms.utils.placeholder import get_placeholder_from_slot
 from django.apps import apps
 from django.conf import settings as dj_settings
 from django.contrib import admin
 from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
 from django.contrib.sites.models import Site
 from django.contrib.sites.shortcuts import get_current_site
 from django.core.cache import cache
+from django.core.exceptions import ValidationError
 from django.db import models
-from django.db.models import F, Q
-from django.db.models.signals import post_save, pre_delete
+from django.db.models import DEFERRED, Count, F, Min, Q, Window
+from django.db.models.functions import RowNumber
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from django.urls import NoReverseMatch, reverse
+from django.urls import reverse
 from django.utils import translation
 from django.utils.encoding import force_bytes, force_str
 from django.utils.functional import cached_property
 from django.utils.html import strip_tags
 from django.utils.timezone import now
-from django.utils.translation import get_language, gettext, gettext_lazy as _
+from django.utils.translation import get_language, gettext
+from django.utils.translation import gettext_lazy as _
 from easy_thumbnails.files import get_thumbnailer
 from filer.fields.image import FilerImageField
 from filer.models import ThumbnailOption
-from menus.menu_pool import menu_pool
 from meta.models import ModelMeta
 from parler.models import TranslatableModel, TranslatedFields
 from sortedm2m.fields import SortedManyToManyField
+from taggit.models import Tag, TaggedItem
 from taggit_autosuggest.managers import TaggableManager
 
-from .cms_appconfig import StoriesConfig
-from .fields import slugify
-from .managers import AdminManager, GenericDateTaggedManager, SiteManager
-from .settings import STORIES_PLUGIN_TEMPLATE_FOLDERS as DEFAULT_TEMPLATE_FOLDERS, get_setting
+from .cache import bump_generation
+from .cms_appconfig import StoriesConfig, config_registry
+from .fields import SearchVectorField, slugify
+from .managers import (
+    AdminManager,
+    GenericDateTaggedManager,
+    PostCategoryClosureManager,
+    PostCategoryManager,
+    PostMonthCountManager,
+    PostSearchDocumentManager,
+    SiteManager,
+)
+from .permalinks import get_category_slug, get_permalink_builder, update_primary_categories
+from .settings import STORIES_PLUGIN_TEMPLATE_FOLDERS as DEFAULT_TEMPLATE_FOLDERS
+from .settings import get_setting
 
 STORIES_CURRENT_POST_IDENTIFIER = get_setting("CURRENT_POST_IDENTIFIER")
 STORIES_CURRENT_NAMESPACE = get_setting("CURRENT_NAMESPACE")
@@ -171,6 +190,8 @@ class PostCategory(PostMetaMixin, ModelMeta, TranslatableModel):
         "url": "get_absolute_url",
     }
 
+    objects = PostCategoryManager()
+
     class Meta:
         verbose_name = _("post category")
         verbose_name_plural = _("post categories")
@@ -187,13 +208,27 @@ class PostCategory(PostMetaMixin, ModelMeta, TranslatableModel):
         )
         return self.get_descendants()
 
-    def get_descendants(self):
-        children = []
-        if self.children.exists():
-            children.extend(self.children.all())
-            for child in self.children.all():
-                children.extend(child.get_descendants())
-        return children
+    def get_descendants(self, include_self=False):
+        """Returns the list of the sub-categories at any level, closest first."""
+        return list(
+            PostCategory.objects.descendants_of(self, include_self=include_self).order_by(
+                "relative_depth", *self._meta.ordering, "pk"
+            )
+        )
+
+    def get_ancestors(self, include_self=False):
+        """Returns the list of the parent categories at any level, starting from the root."""
+        return list(PostCategory.objects.ancestors_of(self, include_self=include_self).order_by("-relative_depth"))
+
+    @cached_property
+    def depth(self):
+        """Level of the category in the hierarchy (``0`` for root categories)."""
+        return PostCategoryClosure.objects.filter(descendant=self).count() - 1
+
+    @cached_property
+    def subtree_posts(self):
+        """returns all posts linked to the category or its sub-categories in the same appconfig namespace"""
+        return Post.objects.in_category(self).filter(app_config=self.app_config)
 
     @cached_property
     def linked_posts(self):
@@ -202,12 +237,29 @@ class PostCategory(PostMetaMixin, ModelMeta, TranslatableModel):
 
     @cached_property
     def count(self):
+        if hasattr(self, "post_count"):  # annotated by PostCategory.objects.with_post_counts()
+            return self.post_count
         return self.linked_posts.filter(Q(sites__isnull=True) | Q(sites=Site.objects.get_current())).count()
 
     @cached_property
     def count_all_sites(self):
+        if hasattr(self, "post_count_all_sites"):
+            return self.post_count_all_sites
         return self.linked_posts.count()
 
+    @cached_property
+    def subtree_count(self):
+        return self.subtree_posts.filter(Q(sites__isnull=True) | Q(sites=Site.objects.get_current())).count()
+
+    def clean(self):
+        super().clean()
+        if (
+            self.pk
+            and self.parent_id
+            and PostCategoryClosure.objects.filter(ancestor=self, descendant_id=self.parent_id).exists()
+        ):
+            raise ValidationError({"parent": _("A category cannot be moved below itself or its sub-categories.")})
+
     def get_absolute_url(self, lang=None):
         """
         Returns the absolute URL for the category overview in the specified language.
@@ -237,17 +289,13 @@ class PostCategory(PostMetaMixin, ModelMeta, TranslatableModel):
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
-        menu_pool.clear(all=True)
+        PostCategoryClosure.objects.sync_node(self.pk, self.parent_id)
         for lang in self.get_available_languages():
             self.set_current_language(lang)
             if not self.slug and self.name:
                 self.slug = slugify(force_str(self.name))
         self.save_translations()
 
-    def delete(self, *args, **kwargs):
-        menu_pool.clear(all=True)
-        return super().delete(*args, **kwargs)
-
     def get_title(self):
         title = self.safe_translation_getter("name", any_language=True)
         return title.strip()
@@ -257,6 +305,33 @@ class PostCategory(PostMetaMixin, ModelMeta, TranslatableModel):
         return strip_tags(description).strip()
 
 
+class PostCategoryClosure(models.Model):
+    """
+    Hierarchy index of :class:`PostCategory`: one row for each (ancestor, descendant) pair,
+    including the category itself at depth ``0``.
+
+    It is maintained by :meth:`PostCategory.save`, rows are deleted along with the categories.
+    """
+
+    ancestor = models.ForeignKey(
+        PostCategory, verbose_name=_("ancestor"), related_name="descendant_links", on_delete=models.CASCADE
+    )
+    descendant = models.ForeignKey(
+        PostCategory, verbose_name=_("descendant"), related_name="ancestor_links", on_delete=models.CASCADE
+    )
+    depth = models.PositiveIntegerField(_("depth"))
+
+    objects = PostCategoryClosureManager()
+
+    class Meta:
+        verbose_name = _("post category path")
+        verbose_name_plural = _("post category paths")
+        unique_together = (("ancestor", "descendant"),)
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+
+
 class Post(models.Model):
     """
     Represents a blog post or story entry with multilingual content, images, categories, tags, and publication metadata.
@@ -283,6 +358,18 @@ class Post(models.Model):
     categories = models.ManyToManyField(
         "djangocms_stories.PostCategory", verbose_name=_("category"), related_name="posts", blank=True
     )
+    #: Category used in permalinks and menus, see :py:meth:`get_primary_category`
+    primary_category = models.ForeignKey(
+        "djangocms_stories.PostCategory",
+        verbose_name=_("primary category"),
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+    #: Slugs of the primary category, by language
+    primary_category_slugs = models.JSONField(_("primary category slugs"), default=dict, blank=True, editable=False)
     main_image = FilerImageField(
         verbose_name=_("main image"),
         blank=True,
@@ -346,6 +433,34 @@ class Post(models.Model):
         self._content_cache = {}
         self._language_cache = None
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = {
+            field.attname: self.__dict__[field.attname]
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+
+    def has_changed(self, *fields) -> bool:
+        """
+        Whether the given fields changed since the post was loaded or saved, always ``True``
+        for posts which were not loaded from the database.
+        """
+        loaded = getattr(self, "_loaded_values", None)
+        if loaded is None:
+            return True
+        for name in fields:
+            attname = self._meta.get_field(name).attname
+            if attname in self.__dict__ and loaded.get(attname, DEFERRED) != self.__dict__[attname]:
+                return True
+        return False
+
     def __str__(self):
         default = gettext("Post (no translation)")
         return self.safe_translation_getter("title", any_language=True, default=default, show_draft_content=True)
@@ -365,6 +480,13 @@ class Post(models.Model):
         try:
             return self._content_cache[key]
         except KeyError:
+            prefetched = getattr(self, "_prefetched_objects_cache", {}).get("postcontent_set")
+            if prefetched is not None and not show_draft_content:
+                # Use the published contents loaded by prefetch_related("postcontent_set")
+                self._content_cache[key] = next(
+                    (content for content in prefetched if content.language == language), None
+                )
+                return self._content_cache[key]
             if show_draft_content:
                 qs = self.postcontent_set(manager="admin_manager").current_content()
             else:
@@ -410,37 +532,30 @@ class Post(models.Model):
         return self.date_published or self.date_created
 
     def get_available_languages(self):
-        if not (self._language_cache):
-            self._language_cache = list(self.postcontent_set.all().values_list("language", flat=True))
+        if self._language_cache is None:
+            prefetched = getattr(self, "_prefetched_objects_cache", {}).get("postcontent_set")
+            if prefetched is not None:
+                self._language_cache = [content.language for content in prefetched]
+            else:
+                self._language_cache = list(self.postcontent_set.all().values_list("language", flat=True))
         return self._language_cache
 
+    def get_primary_category(self):
+        """
+        Returns the category used in permalinks and menus: the first category by priority, then by
+        primary key. It is stored in :py:attr:`primary_category` when the categories change.
+        """
+        return self.primary_category
+
+    def get_primary_category_slug(self, language=None):
+        """
+        Returns the slug of the primary category in the given language, falling back to any
+        language like :py:meth:`~parler.models.TranslatableModel.safe_translation_getter`.
+        """
+        return get_category_slug(self.primary_category_slugs, language or translation.get_language())
+
     def get_absolute_url(self, language=None):
-        lang = language or translation.get_language()
-        with translation.override(lang):
-            kwargs = {}
-            current_date = self.date
-            urlconf = get_setting("PERMALINK_URLS")[self.app_config.url_patterns]
-            if "<int:year>" in urlconf:
-                kwargs["year"] = current_date.year
-            if "<int:month>" in urlconf:
-                kwargs["month"] = "%02d" % current_date.month
-            if "<int:day>" in urlconf:
-                kwargs["day"] = "%02d" % current_date.day
-            if "<str:slug>" in urlconf or "<slug:slug>" in urlconf:
-                kwargs["slug"] = self.safe_translation_getter("slug", language_code=lang, any_language=True)  # NOQA
-                if kwargs["slug"] is None:
-                    return ""
-            if "<slug:category>" in urlconf or "<str:category>" in urlconf:
-                category = self.categories.first()
-                kwargs["category"] = category.safe_translation_getter("slug", language_code=lang, any_language=True)  # NOQA
-                if kwargs["category"] is None:
-                    return ""
-            try:
-                return reverse(
-                    "%s:post-detail" % self.app_config.namespace, kwargs=kwargs, current_app=self.app_config.namespace
-                )
-            except NoReverseMatch:
-                return ""
+        return get_permalink_builder(self.app_config).get_url(self, language)
 
     def get_title(self, language=None):
         title = self.safe_translation_getter("meta_title", language_code=language, any_language=True)
@@ -531,12 +646,18 @@ class Post(models.Model):
 class PostContent(PostMetaMixin, ModelMeta, models.Model):
     structure_template = "post_detail.html"
     no_structure_template = "no_post_structure.html"
+    #: Post fields copied on its contents
+    SYNCED_FIELDS = ("date_published", "date_published_end", "date_featured", "app_config_id")
 
     class Meta:
         verbose_name = _("post content")
         verbose_name_plural = _("post contents")
-        ordering = ("-post__date_published", "-post__date_created")
+        ordering = ("-date_published", "-pk")
         get_latest_by = "date_published"
+        indexes = (
+            models.Index(fields=["language", "app_config", "-date_published", "-id"]),
+            models.Index(fields=["language", "slug"]),
+        )
 
     # Gruping fields
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
@@ -563,6 +684,22 @@ class PostContent(PostMetaMixin, ModelMeta, models.Model):
     )
     post_text = HTMLField(_("text"), default="", blank=True, configuration="STORIES_POST_TEXT_EDITOR_CONF")
     placeholders = PlaceholderRelationField()
+    # Copies of the post fields, to filter and sort the contents without joining the posts
+    # (see :py:meth:`~djangocms_stories.managers.AdminManager.sync_posts`)
+    date_published = models.DateTimeField(_("published since"), null=True, blank=True, editable=False)
+    date_published_end = models.DateTimeField(_("published until"), null=True, blank=True, editable=False)
+    date_featured = models.DateTimeField(_("featured date"), null=True, blank=True, editable=False)
+    app_config = models.ForeignKey(
+        StoriesConfig,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_("app. config"),
+        related_name="+",
+    )
+    #: Whether the post has no sites, hence is visible in all the sites
+    all_sites = models.BooleanField(_("all sites"), default=True, editable=False)
 
     objects = SiteManager()
     admin_manager = AdminManager()
@@ -605,22 +742,10 @@ class PostContent(PostMetaMixin, ModelMeta, models.Model):
     def author(self):
         return self.post.author
 
-    @property
-    def date_published(self):
-        return self.post.date_published
-
-    @property
-    def date_published_end(self):
-        return self.post.date_published_end
-
     @property
     def date_modified(self):
         return self.post.date_modified
 
-    @property
-    def app_config(self):
-        return self.post.app_config
-
     @property
     def categories(self):
         return self.post.categories
@@ -639,7 +764,18 @@ class PostContent(PostMetaMixin, ModelMeta, models.Model):
         """
         if not self.slug and self.title:
             self.slug = slugify(self.title)
+        self.copy_post_fields(self.post)
+        self.all_sites = not Post.sites.through.objects.filter(post_id=self.post_id).exists()
         super().save(*args, **kwargs)
+        if self._meta.get_field("post").is_cached(self):
+            # Invalidate the content caches of the attached post instance
+            self.post._content_cache = {}
+            self.post._language_cache = None
+
+    def copy_post_fields(self, post):
+        """Copy the dates and config of the given post, see :py:attr:`SYNCED_FIELDS`"""
+        for name in self.SYNCED_FIELDS:
+            setattr(self, name, getattr(post, name))
 
     def get_absolute_url(self, language=None):
         return self.post.get_absolute_url(language=language)
@@ -711,6 +847,171 @@ class PostContent(PostMetaMixin, ModelMeta, models.Model):
         return self.title or _("Untitled")
 
 
+class PostMonthCount(models.Model):
+    """
+    Number of posts per namespace, site and archive month, used by the archive plugin.
+
+    Rows with an empty site count the posts which are visible on all sites.
+    Counts are updated when posts are saved or deleted.
+    """
+
+    app_config = models.ForeignKey(
+        StoriesConfig, on_delete=models.CASCADE, null=True, verbose_name=_("app. config"), related_name="+"
+    )
+    site = models.ForeignKey(Site, on_delete=models.CASCADE, null=True, verbose_name=_("site"), related_name="+")
+    month = models.DateField(_("month"))
+    count = models.PositiveIntegerField(_("count"), default=0)
+
+    objects = PostMonthCountManager()
+
+    class Meta:
+        verbose_name = _("post month count")
+        verbose_name_plural = _("post month counts")
+        unique_together = (("app_config", "site", "month"),)
+        indexes = (models.Index(fields=["app_config", "month"]),)
+
+    def __str__(self):
+        return f"{self.month:%Y-%m}: {self.count}"
+
+
+class PostSearchDocument(models.Model):
+    """
+    Searchable text of a post content, see :py:mod:`djangocms_stories.search`.
+
+    Documents are updated when the post content or the plugins in its placeholders change.
+    """
+
+    post_content = models.OneToOneField(
+        PostContent,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name=_("post content"),
+        related_name="search_document",
+    )
+    language = models.CharField(_("language"), max_length=15, db_index=True)
+    config = models.CharField(_("search configuration"), max_length=50)
+    document = models.TextField(_("document"), blank=True, default="")
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = PostSearchDocumentManager()
+
+    class Meta:
+        verbose_name = _("post search document")
+        verbose_name_plural = _("post search documents")
+
+    def __str__(self):
+        return str(self.post_content)
+
+
+class StoriesArtifact(models.Model):
+    """
+    Pre-generated sitemap shard or feed, see :py:mod:`djangocms_stories.artifacts`.
+
+    The gzip-compressed content is stored in a file named after its checksum: files are never
+    overwritten, updating the row swaps the served content at once.
+    """
+
+    name = models.CharField(_("name"), max_length=255, unique=True)
+    file = models.CharField(_("file"), max_length=255)
+    checksum = models.CharField(_("checksum"), max_length=64)
+    content_type = models.CharField(_("content type"), max_length=100)
+    date_modified = models.DateTimeField(_("last modified"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("stories artifact")
+        verbose_name_plural = _("stories artifacts")
+
+    def __str__(self):
+        return self.name
+
+
+class RelatedPost(models.Model):
+    """
+    Automatic related post of a post, see :py:mod:`djangocms_stories.related`.
+
+    Rows are updated when the tags, categories, date or config of the posts change.
+    """
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, verbose_name=_("post"), related_name="+")
+    related = models.ForeignKey(Post, on_delete=models.CASCADE, verbose_name=_("related post"), related_name="+")
+    score = models.FloatField(_("score"))
+
+    class Meta:
+        verbose_name = _("related post")
+        verbose_name_plural = _("related posts")
+        unique_together = (("post", "related"),)
+        indexes = (models.Index(fields=["post", "-score"]),)
+
+    def __str__(self):
+        return f"{self.post_id} -> {self.related_id}: {self.score:.2f}"
+
+
+class PostContentSignature(models.Model):
+    """
+    MinHash signature of the text of a post content, see :py:mod:`djangocms_stories.similarity`.
+    """
+
+    post_content = models.OneToOneField(
+        PostContent,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name=_("post content"),
+        related_name="similarity_signature",
+    )
+    language = models.CharField(_("language"), max_length=15)
+    signature = models.BinaryField(_("signature"))
+
+    class Meta:
+        verbose_name = _("post content signature")
+        verbose_name_plural = _("post content signatures")
+
+    def __str__(self):
+        return str(self.post_content)
+
+
+class PostContentBucket(models.Model):
+    """Hash of a band of a :py:class:`PostContentSignature`, to find the similar contents."""
+
+    signature = models.ForeignKey(
+        PostContentSignature, on_delete=models.CASCADE, verbose_name=_("signature"), related_name="buckets"
+    )
+    band = models.PositiveSmallIntegerField(_("band"))
+    bucket = models.BigIntegerField(_("bucket"))
+
+    class Meta:
+        verbose_name = _("post content bucket")
+        verbose_name_plural = _("post content buckets")
+        indexes = (models.Index(fields=["band", "bucket"]),)
+
+    def __str__(self):
+        return f"{self.band}: {self.bucket}"
+
+
+class SimilarPostContent(models.Model):
+    """
+    Post content with a similar text, see :py:mod:`djangocms_stories.similarity`.
+
+    Rows are updated when the post contents or their plugins change.
+    """
+
+    post_content = models.ForeignKey(
+        PostContent, on_delete=models.CASCADE, verbose_name=_("post content"), related_name="+"
+    )
+    similar = models.ForeignKey(
+        PostContent, on_delete=models.CASCADE, verbose_name=_("similar post content"), related_name="+"
+    )
+    similarity = models.FloatField(_("similarity"))
+
+    class Meta:
+        verbose_name = _("similar post content")
+        verbose_name_plural = _("similar post contents")
+        unique_together = (("post_content", "similar"),)
+        indexes = (models.Index(fields=["post_content", "-similarity"]),)
+
+    def __str__(self):
+        return f"{self.post_content_id} -> {self.similar_id}: {self.similarity:.2f}"
+
+
 class BasePostPlugin(CMSPlugin):
     app_config = models.ForeignKey(
         StoriesConfig,
@@ -758,7 +1059,7 @@ class BasePostPlugin(CMSPlugin):
         else:
             post_contents = PostContent.objects.all()
         if self.app_config:
-            post_contents = post_contents.filter(post__app_config=self.app_config)
+            post_contents = post_contents.filter(app_config=self.app_config)
         if self.current_site:
             post_contents = post_contents.on_site(get_current_site(request))
         if selected_posts:
@@ -825,13 +1126,33 @@ class AuthorEntriesPlugin(BasePostPlugin):
         return self.post_content_queryset(request)
 
     def get_authors(self, request):
-        authors = self.authors.all()
+        """
+        Returns the selected authors with their number of posts (``count``) and their latest
+        ``latest_posts`` post contents (``post_contents``), loaded for all the authors at once.
+        """
+        authors = list(self.authors.all())
+        post_contents = self.get_post_contents(request).filter(post__author__in=[author.pk for author in authors])
+        # total nb of posts
+        counts = dict(
+            post_contents.order_by()
+            .values("post__author")
+            .annotate(count=Count("pk"))
+            .values_list("post__author", "count")
+        )
+        # "the number of author posts to be displayed"
+        latest = defaultdict(list)
+        if self.latest_posts > 0:
+            ordering = [
+                F(field[1:]).desc() if field.startswith("-") else F(field) for field in PostContent._meta.ordering
+            ]
+            post_contents = post_contents.annotate(
+                author_rank=Window(RowNumber(), partition_by=[F("post__author")], order_by=[*ordering, F("pk").desc()])
+            ).filter(author_rank__lte=self.latest_posts)
+            for post_content in post_contents:
+                latest[post_content.post.author_id].append(post_content)
         for author in authors:
-            qs = self.get_post_contents(request).filter(post__author=author)
-            # total nb of posts
-            author.count = qs.count()
-            # "the number of author posts to be displayed"
-            author.post_contents = qs[: self.latest_posts]
+            author.count = counts.get(author.pk, 0)
+            author.post_contents = latest[author.pk]
         return authors
 
 
@@ -864,15 +1185,402 @@ class GenericBlogPlugin(BasePostPlugin):
         return force_str(_("generic blog plugin"))
 
 
+def delete_instant_articles(post):
+    for language in post.get_available_languages():
+        with translation.override(language):
+            cache.delete(post.get_cache_key(language, "feed"))
+
+
 @receiver(pre_delete, sender=Post)
 def pre_delete_post(sender, instance, **kwargs):
-    for language in instance.get_available_languages():
-        key = instance.get_cache_key(language, "feed")
-        cache.delete(key)
+    delete_instant_articles(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_save_sync_contents(sender, instance, raw=False, **kwargs):
+    """Copy the post fields to its contents, before the other receivers query them"""
+    if raw:
+        return
+    PostContent.admin_manager.sync_posts([instance.pk])
+    for content in instance._content_cache.values():
+        if content is not None:
+            content.copy_post_fields(instance)
+
+
+@receiver(m2m_changed, sender=Post.sites.through)
+def post_sites_changed_sync_contents(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse and action in ("post_add", "post_remove", "post_clear"):
+        PostContent.admin_manager.sync_posts([instance.pk])
+    elif reverse and action in ("post_add", "post_remove"):
+        PostContent.admin_manager.sync_posts(pk_set)
+    elif reverse and action == "pre_clear":
+        instance._cleared_posts = list(instance.post_set.values_list("pk", flat=True))
+    elif reverse and action == "post_clear":
+        PostContent.admin_manager.sync_posts(getattr(instance, "_cleared_posts", ()))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=PostContent)
+def post_save_post(sender, instance, raw=False, **kwargs):
+    """
+    Render the Instant Articles of the changed post again, in the background; the feed serves
+    the previous ones meanwhile
+    """
+    if raw or not get_setting("FEED_WARM_ON_SAVE"):
+        return
+    from .feeds import schedule_instant_articles
+
+    post = instance.post if isinstance(instance, PostContent) else instance
+    schedule_instant_articles([post.pk])
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=PostContent)
+@receiver(pre_delete, sender=PostContent)
+def update_post_artifacts(sender, instance, raw=False, **kwargs):
+    """Rebuild the pre-generated sitemap shards and feeds listing the changed post"""
+    if raw or not get_setting("ARTIFACTS_ON_SAVE"):
+        return
+    from .artifacts import schedule_artifacts
+
+    if isinstance(instance, PostContent):
+        post, contents = instance.post, [(instance.language, instance.pk)]
+    else:
+        post = instance
+        contents = (
+            PostContent.admin_manager.filter(post=post)
+            .values("language")
+            .annotate(first_pk=Min("pk"))
+            .values_list("language", "first_pk")
+        )
+    config = config_registry.get_by_pk(post.app_config_id)
+    if config is not None:
+        for language, content_pk in contents:
+            schedule_artifacts(config.namespace, language, content_pk)
+
+
+@receiver(m2m_changed, sender=Post.categories.through)
+def post_categories_changed_primary_category(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse and action.startswith("post_"):
+        primary = update_primary_categories([instance.pk])
+        instance.primary_category_id, instance.primary_category_slugs = primary[instance.pk]
+    elif reverse and action in ("post_add", "post_remove"):
+        update_primary_categories(pk_set)
+    elif reverse and action == "pre_clear":
+        instance._cleared_posts = list(instance.posts.values_list("pk", flat=True))
+    elif reverse and action == "post_clear":
+        update_primary_categories(getattr(instance, "_cleared_posts", ()))
+
+
+@receiver(pre_save, sender=PostCategory)
+@receiver(pre_delete, sender=PostCategory)
+def pre_save_category_primary_category(sender, instance, **kwargs):
+    # Posts whose primary category may change with the category priority
+    instance._primary_posts = []
+    if instance.pk and kwargs.get("signal") is pre_delete:
+        instance._primary_posts = list(instance.posts.values_list("pk", flat=True))
+    elif instance.pk and not kwargs.get("raw"):
+        priority = PostCategory.objects.filter(pk=instance.pk).values_list("priority", flat=True).first()
+        if priority != instance.priority:
+            instance._primary_posts = list(instance.posts.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=PostCategory)
+@receiver(post_delete, sender=PostCategory)
+def update_category_primary_category(sender, instance, **kwargs):
+    update_primary_categories(getattr(instance, "_primary_posts", ()))
+    instance._primary_posts = []
+
+
+@receiver(post_save, sender=PostCategory._parler_meta.root_model)
+@receiver(post_delete, sender=PostCategory._parler_meta.root_model)
+def update_translation_primary_category(sender, instance, raw=False, **kwargs):
+    """Update the slugs of the posts of the category"""
+    if not raw:
+        update_primary_categories(
+            Post._base_manager.filter(primary_category=instance.master_id).values_list("pk", flat=True)
+        )
+
+
+@receiver(pre_save, sender=Post)
+def pre_save_post_month_counts(sender, instance, raw=False, **kwargs):
+    # Remember the month the post was counted in, to update it as well
+    instance._counted_months = set()
+    if instance.pk and not raw:
+        instance._counted_months = PostMonthCount.objects.get_post_buckets([instance.pk])
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def update_post_month_counts(sender, instance, **kwargs):
+    buckets = getattr(instance, "_counted_months", set())
+    buckets.add((instance.app_config_id, Post.objects.get_post_month(instance)))
+    PostMonthCount.objects.refresh(buckets)
+    instance._counted_months = set()
+
+
+@receiver(m2m_changed, sender=Post.sites.through)
+def post_sites_changed_month_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        PostMonthCount.objects.refresh({(instance.app_config_id, Post.objects.get_post_month(instance))})
+    elif pk_set:
+        PostMonthCount.objects.refresh(PostMonthCount.objects.get_post_buckets(pk_set))
+    else:
+        PostMonthCount.objects.rebuild()
+
+
+@receiver(post_save, sender=PostContent)
+def update_search_document(sender, instance, raw=False, **kwargs):
+    if get_setting("ENABLE_SEARCH") and not raw:
+        PostSearchDocument.objects.update_document(instance)
+
+
+@receiver(post_placeholder_operation)
+def update_placeholder_search_documents(sender, **kwargs):
+    """Reindex the post contents whose plugins have been changed"""
+    search, similarity = get_setting("ENABLE_SEARCH"), get_setting("ENABLE_SIMILAR_POSTS")
+    if not search and not similarity:
+        return
+    from .similarity import schedule_similar_contents
+
+    placeholders = {kwargs.get(name) for name in ("placeholder", "source_placeholder", "target_placeholder")}
+    placeholder_ids = {getattr(placeholder, "pk", placeholder) for placeholder in placeholders if placeholder}
+    for placeholder in Placeholder.objects.filter(pk__in=placeholder_ids):
+        if isinstance(placeholder.source, PostContent):
+            if search:
+                PostSearchDocument.objects.update_document(placeholder.source)
+            schedule_similar_contents(placeholder.source.pk)
+
+
+@receiver(post_save, sender=PostContent)
+def post_save_similar_contents(sender, instance, raw=False, **kwargs):
+    if not raw:
+        from .similarity import schedule_similar_contents
+
+        schedule_similar_contents(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def post_save_related_posts(sender, instance, raw=False, **kwargs):
+    # Tags and categories changes are handled by their own receivers
+    if not raw and instance.has_changed("app_config", "date_featured", "date_published"):
+        from .related import schedule_related_posts
+
+        schedule_related_posts([instance.pk])
+
+
+@receiver(pre_delete, sender=Post)
+@receiver(pre_delete, sender=PostCategory)
+def pre_delete_related_posts(sender, instance, **kwargs):
+    """Update the posts losing a related post or a category"""
+    if not get_setting("ENABLE_AUTO_RELATED"):
+        return
+    from .related import schedule_related_posts
+
+    if isinstance(instance, Post):
+        post_ids = RelatedPost.objects.filter(related=instance).values_list("post_id", flat=True)
+    else:
+        post_ids = Post.categories.through.objects.filter(postcategory=instance).values_list("post_id", flat=True)
+    schedule_related_posts(list(post_ids))
+
+
+@receiver(m2m_changed, sender=Post.categories.through)
+def post_categories_changed_related_posts(sender, instance, action, reverse, pk_set, **kwargs):
+    from .related import schedule_related_posts
+
+    if not reverse and action.startswith("post_"):
+        schedule_related_posts([instance.pk])
+    elif reverse and action in ("post_add", "post_remove"):
+        schedule_related_posts(pk_set)
+    elif reverse and action == "pre_clear" and get_setting("ENABLE_AUTO_RELATED"):
+        schedule_related_posts(list(instance.posts.values_list("pk", flat=True)))
+
+
+@receiver(post_save, sender=TaggedItem)
+@receiver(post_delete, sender=TaggedItem)
+def tagged_item_changed_related_posts(sender, instance, raw=False, **kwargs):
+    if not raw and instance.content_type_id == ContentType.objects.get_for_model(Post).pk:
+        from .related import schedule_related_posts
+
+        schedule_related_posts([instance.object_id])
+
+
+@receiver(post_save, sender=StoriesConfig)
+@receiver(post_delete, sender=StoriesConfig)
+@receiver(post_save, sender=StoriesConfig._parler_meta.root_model)
+@receiver(post_delete, sender=StoriesConfig._parler_meta.root_model)
+def invalidate_config_registry(sender, **kwargs):
+    config_registry.clear()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=PostContent)
+@receiver(post_delete, sender=PostContent)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=TaggedItem)
+@receiver(post_delete, sender=TaggedItem)
+@receiver(m2m_changed, sender=Post.sites.through)
+@receiver(m2m_changed, sender=TaggedItem)
+def invalidate_tag_cloud(sender, **kwargs):
+    bump_generation("tag-cloud")
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=PostContent)
+@receiver(post_delete, sender=PostContent)
+@receiver(post_save, sender=PostCategory)
+@receiver(post_delete, sender=PostCategory)
+@receiver(post_delete, sender=TaggedItem)
+@receiver(post_save, sender=TaggedItem)
+@receiver(m2m_changed, sender=Post.sites.through)
+@receiver(m2m_changed, sender=Post.categories.through)
+@receiver(m2m_changed, sender=TaggedItem)
+def invalidate_post_counts(sender, **kwargs):
+    bump_generation("post-count")
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=PostContent)
+@receiver(post_delete, sender=PostContent)
+@receiver(post_save, sender=PostCategory)
+@receiver(post_delete, sender=PostCategory)
+@receiver(post_save, sender=PostCategory._parler_meta.root_model)
+@receiver(post_delete, sender=TaggedItem)
+@receiver(post_save, sender=TaggedItem)
+@receiver(m2m_changed, sender=Post.sites.through)
+@receiver(m2m_changed, sender=Post.categories.through)
+@receiver(m2m_changed, sender=Post.related.through)
+@receiver(m2m_changed, sender=TaggedItem)
+def invalidate_post_validators(sender, **kwargs):
+    """Change the ETag of the stories views and feeds (see :py:mod:`djangocms_stories.conditional`)"""
+    bump_generation("posts")
+
+
+@receiver(post_placeholder_operation)
+def invalidate_placeholder_validators(sender, **kwargs):
+    """Plugins changes do not save the post contents"""
+    content_type_id = ContentType.objects.get_for_model(PostContent).pk
+    for name in ("placeholder", "source_placeholder", "target_placeholder"):
+        placeholder = kwargs.get(name)
+        # Placeholders given by primary key are assumed to belong to a post content
+        if placeholder and getattr(placeholder, "content_type_id", content_type_id) == content_type_id:
+            bump_generation("posts")
+            return
+
+
+def _get_namespace(instance) -> str | None:
+    """Returns the config namespace of the changed object, ``None`` if it is shown in all the configs"""
+    if isinstance(instance, StoriesConfig):
+        return instance.namespace
+    if isinstance(instance, PostCategory._parler_meta.root_model):
+        instance = instance._meta.get_field("master").get_cached_value(instance, None) or (
+            PostCategory.objects.filter(pk=instance.master_id).first()
+        )
+    elif isinstance(instance, PostContent) and not instance.app_config_id:
+        # Contents store the config of their post, unless they were saved raw
+        instance = PostContent._meta.get_field("post").get_cached_value(instance, None) or (
+            Post.objects.filter(pk=instance.post_id).first()
+        )
+    # Categories without config are shown in all the configs, so are sites and tags
+    config = config_registry.get_by_pk(getattr(instance, "app_config_id", None))
+    return config.namespace if config else None
+
+
+# Post fields shown in the menus, see djangocms_stories.cms_menus
+MENU_POST_FIELDS = ("app_config", "date_published", "date_published_end", "date_featured", "primary_category")
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=PostContent)
+@receiver(post_delete, sender=PostContent)
+@receiver(post_save, sender=PostCategory)
+@receiver(post_delete, sender=PostCategory)
+@receiver(post_save, sender=PostCategory._parler_meta.root_model)
+@receiver(post_save, sender=StoriesConfig)
+@receiver(post_delete, sender=StoriesConfig)
+@receiver(m2m_changed, sender=Post.sites.through)
+@receiver(m2m_changed, sender=Post.categories.through)
+def invalidate_menus(sender, instance, raw=False, action=None, **kwargs):
+    """Clear the cached menus of the apphook pages of the changed config, once per transaction"""
+    if raw or (action and not action.startswith("post_")):
+        return
+    if sender is Post and kwargs.get("signal") is post_save and not instance.has_changed(*MENU_POST_FIELDS):
+        return
+    from .cms_menus import schedule_menu_invalidation
+
+    schedule_menu_invalidation(_get_namespace(instance))
 
 
 @receiver(post_save, sender=Post)
-def post_save_post(sender, instance, **kwargs):
-    for language in instance.get_available_languages():
-        key = instance.get_cache_key(language, "feed")
-        cache.delete(key)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=PostContent)
+@receiver(post_delete, sender=PostContent)
+@receiver(post_save, sender=PostCategory)
+@receiver(post_delete, sender=PostCategory)
+@receiver(post_save, sender=PostCategory._parler_meta.root_model)
+@receiver(post_save, sender=StoriesConfig)
+@receiver(post_delete, sender=StoriesConfig)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=TaggedItem)
+@receiver(post_delete, sender=TaggedItem)
+@receiver(m2m_changed, sender=Post.sites.through)
+@receiver(m2m_changed, sender=Post.categories.through)
+@receiver(m2m_changed, sender=TaggedItem)
+def invalidate_plugins(sender, instance, action=None, **kwargs):
+    """Invalidate the cached plugins of the changed config (see :py:mod:`djangocms_stories.cms_plugins`)"""
+    if action and not action.startswith("post_"):
+        return
+    namespace = _get_namespace(instance)
+    if namespace is None:
+        bump_generation("plugins")
+    else:
+        bump_generation(f"plugins:{namespace}")
+        # Plugins without config list the posts of all the configs
+        bump_generation("plugins:")
+
+
+if apps.is_installed("djangocms_versioning"):
+    from djangocms_versioning.constants import OPERATION_DRAFT
+    from djangocms_versioning.signals import post_version_operation
+
+    # Publishing and unpublishing change the published scope of the tag clouds
+    post_version_operation.connect(invalidate_tag_cloud, sender=PostContent, dispatch_uid="stories_tag_cloud")
+    post_version_operation.connect(invalidate_post_counts, sender=PostContent, dispatch_uid="stories_post_count")
+    post_version_operation.connect(invalidate_post_validators, sender=PostContent, dispatch_uid="stories_posts")
+
+    @receiver(post_version_operation, sender=PostContent)
+    def update_version_instant_articles(sender, operation, obj, **kwargs):
+        # Publishing and unpublishing change the content shown in the Instant Articles feed
+        post_save_post(sender, obj.content)
+
+    @receiver(post_version_operation, sender=PostContent)
+    def update_version_artifacts(sender, operation, obj, **kwargs):
+        # Publishing and unpublishing add and remove the content from the sitemap and the feeds
+        update_post_artifacts(sender, obj.content)
+
+    @receiver(post_version_operation, sender=PostContent)
+    def update_version_menus(sender, operation, obj, **kwargs):
+        # Publishing and unpublishing add and remove the post from the menus and the plugins
+        invalidate_menus(sender, obj.content)
+        invalidate_plugins(sender, obj.content)
+
+    @receiver(post_version_operation, sender=PostContent)
+    def update_version_similar_contents(sender, operation, obj, **kwargs):
+        # Publishing and unpublishing change the compared version of the post
+        from .similarity import schedule_similar_contents
+
+        schedule_similar_contents(obj.content.pk)
+
+    @receiver(post_version_operation, sender=PostContent)
+    def update_version_search_document(sender, operation, obj, **kwargs):
+        # Plugins of new drafts are copied after the content is saved
+        if get_setting("ENABLE_SEARCH") and operation == OPERATION_DRAFT:
+            PostSearchDocument.objects.update_document(obj.content)
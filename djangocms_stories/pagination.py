@@ -0,0 +1,236 @@
+"""
+Paginators for the post list views.
+
+:py:class:`CursorPaginator` implements keyset pagination: instead of counting the posts and
+skipping the previous pages with an ``OFFSET``, each page is fetched by seeking past the last
+post of the previous page on the ``(date_published, pk)`` ordering. Pages are identified by
+opaque cursors, hence only next / previous navigation is available.
+
+:py:class:`EstimatedCountPaginator` keeps numbered pages, but avoids counting the whole list
+on each request: counts are cached until posts change, large lists are estimated by the
+PostgreSQL planner and ad-hoc filtered lists are only counted up to a cap.
+"""
+
+from __future__ import annotations
+
+import json
+
+from django.core import signing
+from django.core.paginator import EmptyPage, InvalidPage, Page, Paginator
+from django.db import connections
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+from .cache import get_cache_key, get_or_compute
+from .settings import get_setting
+
+CURSOR_SALT = "djangocms_stories.pagination.cursor"
+
+
+class CursorPaginator:
+    """
+    Keyset paginator ordering the objects by ``date_field`` (newest first, empty dates last)
+    and primary key.
+
+    :param object_list: queryset to paginate
+    :param per_page: number of objects per page
+    :param date_field: lookup of the date the objects are sorted by
+    """
+
+    def __init__(self, object_list, per_page: int, date_field: str = "date_published"):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.date_field = date_field
+
+    def encode_cursor(self, obj, previous: bool = False) -> str:
+        """Returns the cursor of the page after (or before if ``previous``) the given object."""
+        value = obj
+        for attribute in self.date_field.split("__"):
+            value = getattr(value, attribute)
+        return signing.dumps([value.isoformat() if value else None, obj.pk, previous], salt=CURSOR_SALT)
+
+    def decode_cursor(self, cursor: str) -> tuple:
+        try:
+            date, pk, previous = signing.loads(cursor, salt=CURSOR_SALT)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise InvalidPage(_("Invalid cursor"))
+        return (parse_datetime(date) if date else None), pk, bool(previous)
+
+    def _seek(self, date, pk, previous: bool) -> Q:
+        """Filter for the objects after (or before) the given position in the list ordering."""
+        if previous:
+            if date is None:
+                return Q(**{f"{self.date_field}__isnull": False}) | Q(**{self.date_field: None, "pk__gt": pk})
+            return Q(**{f"{self.date_field}__gt": date}) | Q(**{self.date_field: date, "pk__gt": pk})
+        if date is None:
+            return Q(**{self.date_field: None, "pk__lt": pk})
+        return (
+            Q(**{f"{self.date_field}__lt": date})
+            | Q(**{self.date_field: date, "pk__lt": pk})
+            | Q(**{f"{self.date_field}__isnull": True})
+        )
+
+    def page(self, cursor: str | None = None) -> CursorPage:
+        """Returns the page starting after the given cursor (the first page if empty)."""
+        queryset = self.object_list
+        previous = False
+        if cursor:
+            date, pk, previous = self.decode_cursor(cursor)
+            queryset = queryset.filter(self._seek(date, pk, previous))
+        if previous:
+            ordering = (F(self.date_field).asc(nulls_first=True), "pk")
+        else:
+            ordering = (F(self.date_field).desc(nulls_last=True), "-pk")
+        objects = list(queryset.order_by(*ordering)[: self.per_page + 1])
+        has_more = len(objects) > self.per_page
+        objects = objects[: self.per_page]
+        if previous:
+            objects.reverse()
+            return CursorPage(objects, self, has_next=True, has_previous=has_more)
+        return CursorPage(objects, self, has_next=has_more, has_previous=bool(cursor))
+
+
+class CursorPage:
+    """
+    A page of :py:class:`CursorPaginator`.
+
+    It mimics :py:class:`django.core.paginator.Page` where it makes sense, use
+    :py:attr:`next_cursor` and :py:attr:`previous_cursor` to build the navigation links.
+    """
+
+    is_cursor = True
+
+    def __init__(self, object_list: list, paginator: CursorPaginator, has_next: bool, has_previous: bool):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next and bool(object_list)
+        self._has_previous = has_previous and bool(object_list)
+
+    def __repr__(self):
+        return f"<Cursor page of {len(self.object_list)} objects>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self) -> bool:
+        return self._has_next
+
+    def has_previous(self) -> bool:
+        return self._has_previous
+
+    def has_other_pages(self) -> bool:
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self) -> str | None:
+        if self._has_next:
+            return self.paginator.encode_cursor(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self) -> str | None:
+        if self._has_previous:
+            return self.paginator.encode_cursor(self.object_list[0], previous=True)
+        return None
+
+
+def get_planner_estimate(queryset) -> int | None:
+    """Returns the number of rows estimated by the PostgreSQL planner, ``None`` on other databases."""
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator which does not count the objects on every request.
+
+    * lists identified by ``count_key`` have their count cached until posts change
+      (see :ref:`PAGINATION_COUNT_CACHE_TIMEOUT <PAGINATION_COUNT_CACHE_TIMEOUT>`);
+    * on PostgreSQL, lists estimated above
+      :ref:`PAGINATION_ESTIMATE_THRESHOLD <PAGINATION_ESTIMATE_THRESHOLD>` rows are not counted;
+    * ad-hoc lists (no ``count_key``) are counted up to
+      :ref:`PAGINATION_COUNT_CAP <PAGINATION_COUNT_CAP>`.
+
+    When the count is not exact (:py:attr:`is_exact`), pages after the last known one can still
+    be requested.
+
+    :param count_key: parts identifying the list in the count cache (eg: namespace, site, language
+                      and filter), ``None`` for ad-hoc lists
+    """
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True, count_key=None):
+        super().__init__(object_list, per_page, orphans, allow_empty_first_page)
+        self.count_key = count_key
+        self.is_exact = True
+
+    def _get_count(self) -> tuple[int, bool]:
+        threshold = get_setting("PAGINATION_ESTIMATE_THRESHOLD")
+        if threshold is not None:
+            estimate = get_planner_estimate(self.object_list)
+            if estimate is not None and estimate > threshold:
+                return estimate, False
+        if self.count_key is None and get_setting("PAGINATION_COUNT_CAP"):
+            cap = get_setting("PAGINATION_COUNT_CAP")
+            count = self.object_list.order_by()[: cap + 1].count()
+            return min(count, cap), count <= cap
+        return self.object_list.count(), True
+
+    @cached_property
+    def count(self) -> int:
+        timeout = get_setting("PAGINATION_COUNT_CACHE_TIMEOUT")
+        if self.count_key is not None and timeout:
+            key = get_cache_key("post-count", *self.count_key)
+            count, self.is_exact = get_or_compute(key, self._get_count, timeout)
+        else:
+            count, self.is_exact = self._get_count()
+        return count
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            # The count is a lower bound (or a guess): allow the following pages
+            if not self.is_exact and int(number) > 1:
+                return int(number)
+            raise
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if self.is_exact or number < self.num_pages:
+            return super().page(number)
+        # Fetch one more object to know whether there is a next page
+        bottom = (number - 1) * self.per_page
+        object_list = list(self.object_list[bottom : bottom + self.per_page + 1])
+        if not object_list and number > 1:
+            raise EmptyPage(self.error_messages["no_results"])
+        return EstimatedPage(object_list[: self.per_page], number, self, len(object_list) > self.per_page)
+
+
+class EstimatedPage(Page):
+    """Page past the known count of :py:class:`EstimatedCountPaginator`."""
+
+    def __init__(self, object_list, number, paginator, has_more: bool):
+        super().__init__(object_list, number, paginator)
+        self.has_more = has_more
+
+    def has_next(self) -> bool:
+        return self.has_more
+
+    def end_index(self) -> int:
+        return self.start_index() + len(self.object_list) - 1
@@ -0,0 +1,248 @@
+"""
+Precompiled permalinks for posts.
+
+Reversing the post detail url for every post is expensive: each call to :py:func:`django.urls.reverse`
+walks the resolver tree of the project. Since all posts of a :py:class:`StoriesConfig` share the same
+permalink structure, the url is reversed only once per language (and url configuration) with sentinel
+values. The result is turned into a format string which is filled with the post data.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import defaultdict
+from urllib.parse import quote
+
+from cms.signals import urls_need_reloading
+from django.db.models import F, QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.urls import NoReverseMatch, get_resolver, get_script_prefix, get_urlconf, reverse
+from django.urls.converters import get_converters
+from django.utils import translation
+from django.utils.http import RFC3986_SUBDELIMS
+from parler.utils.i18n import get_active_language_choices
+
+from .cms_appconfig import StoriesConfig
+from .settings import get_setting
+
+_PARAMETER_RE = re.compile(r"<(?:(?P<converter>[^>:]+):)?(?P<parameter>[^>]+)>")
+
+# Sentinels are valid for all built-in path converters but the uuid converter
+_SENTINELS = {
+    "year": "9990001",
+    "month": "9990002",
+    "day": "9990003",
+    "slug": "9990004",
+    "category": "9990005",
+}
+
+_builders = {}
+
+# Same as PostCategory.Meta.ordering, see update_primary_categories()
+_PRIMARY_CATEGORY_ORDERING = (F("postcategory__priority").asc(nulls_last=True), "postcategory_id")
+
+
+class PermalinkBuilder:
+    """
+    Builds the post detail urls of a stories config namespace.
+
+    Use :py:func:`get_permalink_builder` to get the (cached) instance for a config.
+    """
+
+    def __init__(self, namespace: str, permalink_url: str):
+        self.namespace = namespace
+        self.permalink_url = permalink_url
+        converters = get_converters()
+        self.parameters = {
+            parameter: converters[converter or "str"] for converter, parameter in _PARAMETER_RE.findall(permalink_url)
+        }
+        self._templates = {}
+        self._resolver = None
+
+    def get_template(self, language: str) -> str | None:
+        """
+        Returns the url template for the given language, or ``None`` if the url cannot be
+        precompiled and needs to be reversed for each post.
+        """
+        resolver = get_resolver(get_urlconf())
+        if resolver is not self._resolver:
+            # Url configuration has been reloaded (e.g., apphook changes)
+            self._templates = {}
+            self._resolver = resolver
+        key = (language, get_script_prefix())
+        if key not in self._templates:
+            self._templates[key] = self._compile(language)
+        return self._templates[key]
+
+    def _compile(self, language: str) -> str | None:
+        if not set(self.parameters).issubset(_SENTINELS):
+            return None
+        kwargs = {parameter: _SENTINELS[parameter] for parameter in self.parameters}
+        try:
+            with translation.override(language):
+                url = reverse(f"{self.namespace}:post-detail", kwargs=kwargs, current_app=self.namespace)
+        except NoReverseMatch:
+            return None
+        template = url.replace("{", "{{").replace("}", "}}")
+        for parameter, sentinel in kwargs.items():
+            if template.count(sentinel) != 1:  # pragma: no cover
+                return None
+            template = template.replace(sentinel, f"{{{parameter}}}")
+        return template
+
+    def get_kwargs(self, post, language: str) -> dict | None:
+        """
+        Returns the url parameters for the post, or ``None`` if one of them is not available.
+        """
+        slug = category = None
+        if "slug" in self.parameters:
+            slug = post.safe_translation_getter("slug", language_code=language, any_language=True)
+        if "category" in self.parameters:
+            category = post.get_primary_category_slug(language)
+        return self.make_kwargs(post.date, slug, category)
+
+    def make_kwargs(self, date, slug: str | None = None, category: str | None = None) -> dict | None:
+        """
+        Returns the url parameters from the post values, or ``None`` if one of them is not available.
+
+        :param date: date of the post (see :py:attr:`djangocms_stories.models.Post.date`)
+        :param slug: slug of the post content
+        :param category: slug of the primary category of the post
+        """
+        kwargs = {}
+        if "year" in self.parameters:
+            kwargs["year"] = date.year
+        if "month" in self.parameters:
+            kwargs["month"] = f"{date.month:02d}"
+        if "day" in self.parameters:
+            kwargs["day"] = f"{date.day:02d}"
+        if "slug" in self.parameters:
+            if not slug:
+                return None
+            kwargs["slug"] = slug
+        if "category" in self.parameters:
+            if not category:
+                return None
+            kwargs["category"] = category
+        return kwargs
+
+    def get_url(self, post, language: str | None = None) -> str:
+        """
+        Returns the detail url for the post or an empty string if the post has no url in the given language.
+        """
+        language = language or translation.get_language()
+        return self.format_url(self.get_kwargs(post, language), language)
+
+    def format_url(self, kwargs: dict | None, language: str) -> str:
+        """
+        Returns the detail url for the given url parameters (see :py:meth:`make_kwargs`), or an
+        empty string if there is no such url.
+        """
+        if kwargs is None:
+            return ""
+        template = self.get_template(language)
+        if template is None:
+            try:
+                with translation.override(language):
+                    return reverse(f"{self.namespace}:post-detail", kwargs=kwargs, current_app=self.namespace)
+            except NoReverseMatch:
+                return ""
+        values = {}
+        for parameter, value in kwargs.items():
+            converter = self.parameters[parameter]
+            text = str(converter.to_url(value))
+            if not re.fullmatch(converter.regex, text):
+                return ""
+            values[parameter] = quote(text, safe=RFC3986_SUBDELIMS + "/~:@")
+        return template.format(**values)
+
+
+def get_permalink_builder(app_config: StoriesConfig) -> PermalinkBuilder:
+    """Returns the permalink builder for the given stories config."""
+    permalink_url = get_setting("PERMALINK_URLS")[app_config.url_patterns]
+    key = (app_config.namespace, permalink_url)
+    if key not in _builders:
+        _builders[key] = PermalinkBuilder(app_config.namespace, permalink_url)
+    return _builders[key]
+
+
+def build_absolute_urls(posts, language: str | None = None) -> dict:
+    """
+    Returns a dictionary mapping post primary keys to their detail urls.
+
+    If ``posts`` is a queryset, contents and configs are loaded in bulk first.
+
+    :param posts: queryset or iterable of :py:class:`djangocms_stories.models.Post` instances
+    :param language: language of the urls (defaults to the current language)
+    """
+    language = language or translation.get_language()
+    if isinstance(posts, QuerySet):
+        posts = posts.select_related("app_config").with_contents([language])
+    return {post.pk: get_permalink_builder(post.app_config).get_url(post, language) for post in posts}
+
+
+def get_category_slug(slugs: dict, language: str) -> str | None:
+    """
+    Returns the slug in the given language or its fallbacks, or in any language.
+
+    :param slugs: slugs by language, see :py:attr:`djangocms_stories.models.Post.primary_category_slugs`
+    :param language: language of the slug
+    """
+    if not slugs:
+        return None
+    for code in get_active_language_choices(language):
+        if code in slugs:
+            return slugs[code]
+    return next(iter(slugs.values()))
+
+
+def update_primary_categories(post_ids) -> dict:
+    """
+    Store the primary category of the given posts, and its slugs, in
+    :py:attr:`~djangocms_stories.models.Post.primary_category` and
+    :py:attr:`~djangocms_stories.models.Post.primary_category_slugs`.
+
+    :param post_ids: primary keys of the posts
+    :return: the primary category primary key and slugs, by post primary key
+    """
+    from .models import Post, PostCategory
+
+    post_ids = set(post_ids)
+    primary = dict.fromkeys(post_ids)
+    for post_id, category_id in (
+        Post.categories.through.objects.filter(post_id__in=post_ids)
+        .order_by("post_id", *_PRIMARY_CATEGORY_ORDERING)
+        .values_list("post_id", "postcategory_id")
+    ):
+        if primary[post_id] is None:
+            primary[post_id] = category_id
+    slugs = defaultdict(dict)
+    translations = PostCategory._parler_meta.root_model.objects.filter(master_id__in=set(primary.values()))
+    for category_id, language_code, slug in translations.order_by("pk").values_list(
+        "master_id", "language_code", "slug"
+    ):
+        slugs[category_id][language_code] = slug
+    posts = defaultdict(list)
+    for post_id, category_id in primary.items():
+        posts[category_id].append(post_id)
+    for category_id, ids in posts.items():
+        for start in range(0, len(ids), 500):
+            Post._base_manager.filter(pk__in=ids[start : start + 500]).update(
+                primary_category=category_id, primary_category_slugs=slugs.get(category_id, {})
+            )
+    return {post_id: (category_id, slugs.get(category_id, {})) for post_id, category_id in primary.items()}
+
+
+def clear_permalink_builders(**kwargs):
+    """Drop all precompiled permalinks"""
+    _builders.clear()
+
+
+urls_need_reloading.connect(clear_permalink_builders, dispatch_uid="djangocms_stories_permalinks")
+
+
+@receiver(post_save, sender=StoriesConfig)
+@receiver(post_delete, sender=StoriesConfig)
+def stories_config_changed(sender, instance, **kwargs):
+    clear_permalink_builders()
@@ -0,0 +1,218 @@
+"""
+Automatic related posts.
+
+Posts are related to the posts which share tags or categories with them, scored with the
+:ref:`AUTO_RELATED_WEIGHTS <AUTO_RELATED_WEIGHTS>`:
+
+* ``tags``: weight of each shared tag;
+* ``categories``: weight of each shared category;
+* ``recency``: weight of the recency of the related post, which halves every
+  :ref:`AUTO_RELATED_HALF_LIFE <AUTO_RELATED_HALF_LIFE>` days the related post is older than the post.
+
+The :ref:`AUTO_RELATED_LIMIT <AUTO_RELATED_LIMIT>` best posts of each post are stored in the
+:py:class:`~djangocms_stories.models.RelatedPost` table, hence showing them is a single indexed
+lookup. Candidates are the posts of the same config, or of all the configs when its ``use_related``
+option is "from this site". Posts of configs without related posts have none.
+
+When the tags, categories, date or config of a post change, the related posts of the post, and of
+the posts listing it, are computed again once the transaction is committed. The post is then added
+to the related posts of the other posts sharing tags or categories, if it scores better than their
+last one.
+"""
+
+from __future__ import annotations
+
+import threading
+from datetime import datetime
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count, F, Min, Window
+from django.db.models.functions import RowNumber
+from taggit.models import TaggedItem
+
+from .cms_appconfig import config_registry
+from .models import Post, RelatedPost
+from .settings import get_setting
+
+_pending = threading.local()
+
+# Same ordering as the related posts lookups, see PostDetailView.get_related_contents()
+_ORDERING = (F("score").desc(), F("related_id").desc())
+
+
+def get_shared(post_id: int) -> dict:
+    """
+    Returns the number of tags and categories shared with the given post, by post primary key.
+
+    :return: dictionary of ``(shared tags, shared categories)`` tuples
+    """
+    shared = {}
+    tagged = TaggedItem.objects.filter(content_type=ContentType.objects.get_for_model(Post))
+    tag_ids = tagged.filter(object_id=post_id).values("tag_id")
+    for object_id, count in (
+        tagged.filter(tag_id__in=tag_ids)
+        .exclude(object_id=post_id)
+        .order_by()
+        .values("object_id")
+        .annotate(count=Count("pk"))
+        .values_list("object_id", "count")
+    ):
+        shared[object_id] = (count, 0)
+    through = Post.categories.through
+    category_ids = through.objects.filter(post_id=post_id).values("postcategory_id")
+    for other_id, count in (
+        through.objects.filter(postcategory_id__in=category_ids)
+        .exclude(post_id=post_id)
+        .order_by()
+        .values("post_id")
+        .annotate(count=Count("pk"))
+        .values_list("post_id", "count")
+    ):
+        shared[other_id] = (shared.get(other_id, (0, 0))[0], count)
+    return shared
+
+
+def get_posts(post_ids) -> dict:
+    """Returns the config primary key and date (see :py:attr:`Post.date`) of the given posts"""
+    return {
+        pk: (app_config_id, date_featured or date_published or date_created)
+        for pk, app_config_id, date_featured, date_published, date_created in Post._base_manager.filter(
+            pk__in=post_ids
+        ).values_list("pk", "app_config_id", "date_featured", "date_published", "date_created")
+    }
+
+
+def is_candidate(app_config_id: int, other_app_config_id: int) -> bool:
+    """Whether posts of the other config can be related to the posts of the config"""
+    config = config_registry.get_by_pk(app_config_id)
+    if config is None or not config.use_related:
+        return False
+    return app_config_id == other_app_config_id or config.use_related == 2
+
+
+def get_score(shared: tuple[int, int], date: datetime, other_date: datetime) -> float:
+    """
+    Returns the score of a post related to a post published at ``date``.
+
+    :param shared: number of shared tags and categories
+    :param date: date of the post
+    :param other_date: date of the related post
+    """
+    weights = get_setting("AUTO_RELATED_WEIGHTS")
+    age = max((date - other_date).total_seconds() / 86400, 0)
+    recency = 0.5 ** (age / get_setting("AUTO_RELATED_HALF_LIFE"))
+    return (
+        weights.get("tags", 0) * shared[0]
+        + weights.get("categories", 0) * shared[1]
+        + weights.get("recency", 0) * recency
+    )
+
+
+def refresh_related_posts(post_id: int) -> tuple[dict, dict]:
+    """
+    Compute the related posts of the given post again.
+
+    :return: the shared tags and categories (see :py:func:`get_shared`) and the posts (see
+             :py:func:`get_posts`), for the post and the posts sharing tags or categories with it
+    """
+    with transaction.atomic():
+        # Concurrent refreshes of the post wait for this one, instead of inserting the same rows
+        list(Post._base_manager.filter(pk=post_id).select_for_update().values_list("pk", flat=True))
+        shared = get_shared(post_id)
+        posts = get_posts({post_id, *shared})
+        rows = []
+        if post_id in posts:
+            app_config_id, date = posts[post_id]
+            for other_id, counts in shared.items():
+                if other_id in posts and is_candidate(app_config_id, posts[other_id][0]):
+                    rows.append(
+                        RelatedPost(
+                            post_id=post_id, related_id=other_id, score=get_score(counts, date, posts[other_id][1])
+                        )
+                    )
+            rows.sort(key=lambda row: (row.score, row.related_id), reverse=True)
+        RelatedPost.objects.filter(post_id=post_id).delete()
+        RelatedPost.objects.bulk_create(rows[: get_setting("AUTO_RELATED_LIMIT")])
+    return shared, posts
+
+
+def update_related_posts(post_ids) -> None:
+    """
+    Update the related posts after the tags, categories, date or config of the given posts changed.
+    """
+    limit = get_setting("AUTO_RELATED_LIMIT")
+    post_ids = set(post_ids)
+    # Posts listing the changed posts may not list them anymore
+    refreshed = post_ids.union(RelatedPost.objects.filter(related__in=post_ids).values_list("post_id", flat=True))
+    changed = {}
+    for post_id in refreshed:
+        result = refresh_related_posts(post_id)
+        if post_id in post_ids:
+            changed[post_id] = result
+
+    # Changed posts may enter the related posts of the others
+    for post_id, (shared, posts) in changed.items():
+        if post_id not in posts:
+            continue
+        app_config_id, date = posts[post_id]
+        scores = {
+            other_id: get_score(counts, posts[other_id][1], date)
+            for other_id, counts in shared.items()
+            if other_id not in refreshed and other_id in posts and is_candidate(posts[other_id][0], app_config_id)
+        }
+        if not scores:
+            continue
+        lowest = {
+            row["post_id"]: row
+            for row in RelatedPost.objects.filter(post_id__in=scores)
+            .order_by()
+            .values("post_id")
+            .annotate(count=Count("pk"), lowest_score=Min("score"))
+        }
+        rows = [
+            RelatedPost(post_id=other_id, related_id=post_id, score=score)
+            for other_id, score in scores.items()
+            if other_id not in lowest or lowest[other_id]["count"] < limit or score > lowest[other_id]["lowest_score"]
+        ]
+        with transaction.atomic():
+            # Rows inserted in the meantime by the refresh of the other posts are kept
+            RelatedPost.objects.bulk_create(rows, ignore_conflicts=True)
+            full = [row.post_id for row in rows if row.post_id in lowest and lowest[row.post_id]["count"] >= limit]
+            if full:
+                ranked = RelatedPost.objects.filter(post_id__in=full).annotate(
+                    related_rank=Window(RowNumber(), partition_by=[F("post_id")], order_by=_ORDERING)
+                )
+                RelatedPost.objects.filter(
+                    pk__in=list(ranked.filter(related_rank__gt=limit).values_list("pk", flat=True))
+                ).delete()
+
+
+def rebuild_related_posts() -> int:
+    """
+    Compute the related posts of all the posts.
+
+    :return: number of posts
+    """
+    RelatedPost.objects.all().delete()
+    post_ids = list(Post._base_manager.values_list("pk", flat=True))
+    for post_id in post_ids:
+        refresh_related_posts(post_id)
+    return len(post_ids)
+
+
+def _flush_related_posts() -> None:
+    post_ids = _pending.__dict__.pop("posts", set())
+    if post_ids:
+        update_related_posts(post_ids)
+
+
+def schedule_related_posts(post_ids) -> None:
+    """
+    Update the related posts of the given posts once the transaction is committed (see
+    :py:func:`update_related_posts`). Changes in the same transaction are coalesced.
+    """
+    if not get_setting("ENABLE_AUTO_RELATED"):
+        return
+    _pending.__dict__.setdefault("posts", set()).update(post_ids)
+    transaction.on_commit(_flush_related_posts)
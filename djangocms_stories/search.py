@@ -0,0 +1,163 @@
+"""
+Full-text search of the post contents.
+
+The searchable text of each :py:class:`~djangocms_stories.models.PostContent` (title, subtitle,
+abstract, text, meta fields, tags and the text of the plugins in its placeholders) is stored in a
+:py:class:`~djangocms_stories.models.PostSearchDocument`, which is updated whenever the content or
+its plugins change.
+
+How documents are matched depends on the database:
+
+* PostgreSQL: the ``search_vector`` column is computed with the text search configuration of the
+  content language (see :ref:`SEARCH_CONFIGS <SEARCH_CONFIGS>`) and has a GIN index;
+* SQLite: the documents are indexed by an FTS5 table kept in sync by triggers;
+* other databases: the documents are scanned with ``icontains``.
+"""
+
+from __future__ import annotations
+
+import html
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import OperationalError, connections
+from django.db.models import F, FloatField, Value
+from django.db.models.expressions import RawSQL
+from django.utils.html import strip_tags
+from django.utils.translation import get_language
+
+from .settings import get_setting
+
+GIN_INDEX = "djangocms_stories_search_vector_gin"
+FTS_TABLE = "djangocms_stories_postsearchdocument_fts"
+
+
+def get_search_config(language: str | None = None) -> str:
+    """Returns the PostgreSQL text search configuration of the given language."""
+    language = language or get_language() or ""
+    configs = get_setting("SEARCH_CONFIGS")
+    return configs.get(language) or configs.get(language.split("-")[0]) or "simple"
+
+
+def get_search_terms(query: str) -> list[str]:
+    """Returns the words of the query, stripped of any operator."""
+    return re.findall(r"\w+", query or "")
+
+
+def get_text(value: str) -> str:
+    return html.unescape(strip_tags(value or "")).strip()
+
+
+def get_placeholder_text(content) -> list[str]:
+    """Returns the text of the ``search_fields`` of the plugins in the content placeholders."""
+    from cms.models import CMSPlugin
+    from cms.utils.plugins import downcast_plugins
+
+    plugins = CMSPlugin.objects.filter(placeholder__in=content.placeholders.all(), language=content.language)
+    texts = []
+    for plugin in downcast_plugins(plugins.order_by("placeholder_id", "position")):
+        plugin_class = plugin.get_plugin_class()
+        search_fields = getattr(plugin, "search_fields", None) or getattr(plugin_class, "search_fields", ())
+        texts.extend(get_text(str(getattr(plugin, field, None) or "")) for field in search_fields)
+    return texts
+
+
+def get_document(content) -> str:
+    """Returns the searchable text of the given post content."""
+    parts = [
+        content.title,
+        content.subtitle,
+        content.meta_title,
+        get_text(content.abstract),
+        get_text(content.post_text),
+        content.meta_description,
+        content.meta_keywords,
+        " ".join(content.post.tags.names()),
+        *get_placeholder_text(content),
+    ]
+    return "\n".join(part for part in parts if part)
+
+
+def has_fts_table(connection) -> bool:
+    if not hasattr(connection, "_stories_fts_table"):
+        connection._stories_fts_table = FTS_TABLE in connection.introspection.table_names()
+    return connection._stories_fts_table
+
+
+def create_search_structures(using: str = "default") -> None:
+    """
+    Create the database specific search structures, if missing.
+
+    On SQLite without FTS5 support, the search falls back to ``icontains``.
+    """
+    from .models import PostSearchDocument
+
+    connection = connections[using]
+    table = PostSearchDocument._meta.db_table
+    if table not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {GIN_INDEX} ON {table} USING gin (search_vector)")
+        elif connection.vendor == "sqlite" and not has_fts_table(connection):
+            key = PostSearchDocument._meta.pk.column
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(document, content='{table}', "
+                    f"content_rowid='{key}', tokenize='unicode61 remove_diacritics 2')"
+                )
+            except OperationalError:  # pragma: no cover
+                return
+            delete = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES('delete', old.{key}, old.document)"
+            insert = f"INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.{key}, new.document)"
+            cursor.execute(f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {table} BEGIN {insert}; END")
+            cursor.execute(f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {table} BEGIN {delete}; END")
+            cursor.execute(f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {table} BEGIN {delete}; {insert}; END")
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('rebuild')")
+            connection._stories_fts_table = True
+
+
+def update_search_vectors(documents) -> None:
+    """Compute the PostgreSQL search vectors of the given documents queryset."""
+    if connections[documents.db].vendor == "postgresql":
+        documents.update(search_vector=SearchVector("document", config=F("config")))
+
+
+def search(queryset, query: str, language: str | None = None):
+    """
+    Filter the post contents matching the query, best matches first.
+
+    Matches are annotated with their ``search_rank``.
+
+    :param queryset: post contents to search
+    :param query: search query, words are matched in any order
+    :param language: only search the contents in this language
+    """
+    terms = get_search_terms(query)
+    if not terms:
+        return queryset.none()
+    if language:
+        queryset = queryset.filter(language=language)
+    connection = connections[queryset.db]
+    if connection.vendor == "postgresql":
+        search_query = SearchQuery(query, config=get_search_config(language), search_type="websearch")
+        queryset = queryset.filter(search_document__search_vector=search_query).annotate(
+            search_rank=SearchRank(F("search_document__search_vector"), search_query)
+        )
+    elif connection.vendor == "sqlite" and has_fts_table(connection):
+        match = " ".join(f'"{term}"' for term in terms)
+        column = f"{connection.ops.quote_name(queryset.model._meta.db_table)}.{queryset.model._meta.pk.column}"
+        queryset = queryset.filter(
+            pk__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+        ).annotate(
+            search_rank=RawSQL(
+                f"SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = {column}",
+                [match],
+                output_field=FloatField(),
+            )
+        )
+    else:
+        for term in terms:
+            queryset = queryset.filter(search_document__document__icontains=term)
+        queryset = queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+    return queryset.order_by("-search_rank", "-date_published", "-pk")
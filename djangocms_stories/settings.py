@@ -9,6 +9,8 @@ MENU_TYPE_COMPLETE = "complete"
 MENU_TYPE_CATEGORIES = "categories"
 MENU_TYPE_POSTS = "posts"
 MENU_TYPE_NONE = "none"
+MENU_POSTS_BY_CATEGORY = "category"
+MENU_POSTS_BY_DATE = "date"
 DATE_FORMAT = "%a %d %b %Y %H:%M"
 
 PERMALINK_TYPE_FULL_DATE = "full_date"
@@ -52,6 +54,11 @@ MENU_TYPES = (  # noqa
     (MENU_TYPE_NONE, _("None")),
 )
 
+MENU_POSTS_GROUPINGS = (
+    (MENU_POSTS_BY_CATEGORY, _("By category")),
+    (MENU_POSTS_BY_DATE, _("By year and month")),
+)
+
 SITEMAP_CHANGEFREQ_LIST = (  # noqa
     ("always", _("always")),
     ("hourly", _("hourly")),
@@ -101,6 +108,30 @@ STORIES_PAGINATION = 20
 Number of post per page.
 """
 
+STORIES_PAGINATION_COUNT_CACHE_TIMEOUT = 3600
+"""
+.. _PAGINATION_COUNT_CACHE_TIMEOUT:
+
+Cache timeout for the number of posts of the paginated list views (in seconds), ``0`` counts
+the posts on each request. Cached counts are invalidated whenever posts or their contents change.
+"""
+
+STORIES_PAGINATION_ESTIMATE_THRESHOLD = None
+"""
+.. _PAGINATION_ESTIMATE_THRESHOLD:
+
+On PostgreSQL, paginated lists estimated by the query planner above this number of posts are not
+counted, the estimate is used instead (eg: ``10000``). ``None`` (default) always counts the posts.
+"""
+
+STORIES_PAGINATION_COUNT_CAP = 1000
+"""
+.. _PAGINATION_COUNT_CAP:
+
+Paginated lists with ad-hoc filters are only counted up to this number of posts
+(eg: *1000+ articles*). ``None`` counts all the posts.
+"""
+
 STORIES_LATEST_POSTS = 5
 """
 .. _LATEST_POSTS:
@@ -136,6 +167,13 @@ STORIES_META_TITLE_LENGTH = 70
 Maximum length for the Meta title field.
 """
 
+STORIES_CATEGORY_INCLUDE_SUBCATEGORIES = False
+"""
+.. _CATEGORY_INCLUDE_SUBCATEGORIES:
+
+Flag to list the posts of the sub-categories in the category list view too.
+"""
+
 STORIES_MENU_TYPES = MENU_TYPES
 """
 .. _MENU_TYPES:
@@ -182,6 +220,16 @@ Choices of available blog types.
 Available values are defined in to ``META_FB_TYPES`` defined in `django-meta settings`_.
 """
 
+STORIES_SITE_PROTOCOL = meta_settings.get_setting("SITE_PROTOCOL") or "https"
+"""
+.. _SITE_PROTOCOL:
+
+Scheme (``http`` or ``https``) of the urls built outside of a request, eg: in the pre-rendered
+Instant Articles and feeds.
+
+Default from ``META_SITE_PROTOCOL`` defined in `django-meta settings`_, ``https`` if not set.
+"""
+
 STORIES_FB_APPID = meta_settings.get_setting("FB_APPID")
 """
 .. _FB_APPID:
@@ -313,6 +361,78 @@ STORIES_USE_RELATED = True
 Enable related posts to link one post to others.
 """
 
+STORIES_ENABLE_AUTO_RELATED = False
+"""
+.. _ENABLE_AUTO_RELATED:
+
+Show the posts sharing tags and categories with a post when no related post has been selected
+(see :py:mod:`djangocms_stories.related`).
+"""
+
+STORIES_AUTO_RELATED_LIMIT = 5
+"""
+.. _AUTO_RELATED_LIMIT:
+
+Number of automatic related posts stored for each post.
+"""
+
+STORIES_AUTO_RELATED_WEIGHTS = {"tags": 2.0, "categories": 1.0, "recency": 1.0}
+"""
+.. _AUTO_RELATED_WEIGHTS:
+
+Weights of the automatic related posts score: each shared tag, each shared category and the
+recency of the related post (from ``1`` to ``0``).
+"""
+
+STORIES_AUTO_RELATED_HALF_LIFE = 180
+"""
+.. _AUTO_RELATED_HALF_LIFE:
+
+Number of days after which the recency of an automatic related post halves, counted from the
+date of the post.
+"""
+
+STORIES_ENABLE_SIMILAR_POSTS = False
+"""
+.. _ENABLE_SIMILAR_POSTS:
+
+Show the posts with the most similar text when a post has neither selected nor automatic
+related posts (see :py:mod:`djangocms_stories.similarity`).
+"""
+
+STORIES_SIMILAR_POSTS_LIMIT = 5
+"""
+.. _SIMILAR_POSTS_LIMIT:
+
+Number of similar contents stored for each post content.
+"""
+
+STORIES_SIMILAR_POSTS_THRESHOLD = 0.1
+"""
+.. _SIMILAR_POSTS_THRESHOLD:
+
+Minimum estimated similarity (from ``0`` to ``1``) of the similar contents.
+"""
+
+STORIES_SIMILARITY_BANDS = (16, 4)
+"""
+.. _SIMILARITY_BANDS:
+
+Number of bands and of values per band of the MinHash signatures. Contents whose similarity is
+above ``(1 / bands) ** (1 / values)`` (about ``0.5`` by default) are likely to be compared, less
+similar ones are likely missed. Changing it requires to run the ``stories_rebuild_similar_posts``
+command.
+"""
+
+STORIES_SIMILARITY_MAX_BUCKET_SIZE = 100
+"""
+.. _SIMILARITY_MAX_BUCKET_SIZE:
+
+Maximum number of contents sharing the hash of a band for them to be compared. Larger buckets
+(e.g. a boilerplate text shared by many posts) are ignored, so that the number of comparisons
+grows linearly with the number of contents. ``0`` compares the contents of all the buckets.
+"""
+
 STORIES_MULTISITE = True
 """
 .. _MULTISITE:
@@ -435,11 +555,48 @@ Configuration for the CKEditor of the post content field.
 See https://github.com/divio/djangocms-text-ckeditor/#customizing-htmlfield-editor for details.
 """
 
-STORIES_ENABLE_SEARCH = True
+STORIES_ENABLE_SEARCH = False
 """
 .. _ENABLE_SEARCH:
 
-Enable ``aldryn-search`` (i.e.: ``django-haystack``) indexes.
+Enable the full-text search of the posts: search index, search view and admin search.
+
+When enabled, the post contents are indexed when they are saved, the admin matches the search
+terms as words in the index instead of ``icontains`` lookups on the content fields, and
+``migrate`` creates the database specific search structures. Run the
+``stories_rebuild_search_index`` command to index the existing posts.
+"""
+
+STORIES_SEARCH_CONFIGS = {
+    "ar": "arabic",
+    "da": "danish",
+    "de": "german",
+    "en": "english",
+    "es": "spanish",
+    "fi": "finnish",
+    "fr": "french",
+    "hu": "hungarian",
+    "it": "italian",
+    "nl": "dutch",
+    "no": "norwegian",
+    "pt": "portuguese",
+    "ro": "romanian",
+    "ru": "russian",
+    "sv": "swedish",
+    "tr": "turkish",
+}
+"""
+.. _SEARCH_CONFIGS:
+
+PostgreSQL text search configuration used for each language (``simple`` for the languages not listed).
+"""
+
+STORIES_SEARCH_CACHE_TIMEOUT = 600
+"""
+.. _SEARCH_CACHE_TIMEOUT:
+
+Cache timeout for the search results (in seconds), ``0`` disables the cache.
+Cached results are invalidated whenever the search index or the posts change.
 """
 
 STORIES_CURRENT_POST_IDENTIFIER = "djangocms_postcontent_current"
@@ -511,6 +668,54 @@ STORIES_TAGS_PLUGIN_NAME = _("Tags")
 Name of the plugin showing the tag blog cloud.
 """
 
+STORIES_TAG_CLOUD_SIZE = None
+"""
+.. _TAG_CLOUD_SIZE:
+
+Maximum number of tags shown by the tags plugin (``None`` shows all the tags).
+"""
+
+STORIES_TAG_CLOUD_CACHE_TIMEOUT = 3600
+"""
+.. _TAG_CLOUD_CACHE_TIMEOUT:
+
+Cache timeout for the tag clouds (in seconds), ``0`` disables the cache.
+Cached tag clouds are invalidated whenever tags, posts or their contents change.
+"""
+
+STORIES_PLUGIN_CACHE_TIMEOUT = 3600
+"""
+.. _PLUGIN_CACHE_TIMEOUT:
+
+Cache timeout for the rendered plugins (in seconds), ``0`` disables the cache.
+Cached plugins are invalidated whenever the posts, contents, categories or tags of their
+config change, and expire when one of these posts is scheduled to be published or unpublished.
+"""
+
+STORIES_CACHE_STALE_TIMEOUT = 300
+"""
+.. _CACHE_STALE_TIMEOUT:
+
+Seconds an expired cache entry (tag clouds, post counts, search results, Instant Articles, plugins)
+is still served while a single process computes the new value.
+"""
+
+STORIES_CACHE_LOCK_TIMEOUT = 10
+"""
+.. _CACHE_LOCK_TIMEOUT:
+
+Seconds a cache entry is locked while a process computes it: other processes missing the
+entry wait up to this time for the value before computing it themselves.
+"""
+
+STORIES_CACHE_EARLY_EXPIRY_BETA = 1.0
+"""
+.. _CACHE_EARLY_EXPIRY_BETA:
+
+How early cache entries are recomputed before they expire, relative to the time taken to
+compute them: ``0`` disables the early expiry, higher values recompute earlier.
+"""
+
 STORIES_CATEGORY_PLUGIN_NAME = _("Categories")
 """
 .. _CATEGORY_PLUGIN_NAME:
@@ -525,6 +730,13 @@ STORIES_ARCHIVE_PLUGIN_NAME = _("Archive")
 Name of the plugin showing the blog archive index.
 """
 
+STORIES_ARCHIVE_PLUGIN_MONTHS = None
+"""
+.. _ARCHIVE_PLUGIN_MONTHS:
+
+Number of months listed by the archive plugin (``None`` lists all the months).
+"""
+
 STORIES_FEATURED_POSTS_PLUGIN_NAME = _("Featured Posts")
 """
 .. _FEATURED_POSTS_PLUGIN_NAME:
@@ -546,6 +758,26 @@ STORIES_FEED_CACHE_TIMEOUT = 3600
 Cache timeout for RSS feeds.
 """
 
+STORIES_FEED_WARM_WORKERS = 4
+"""
+.. _FEED_WARM_WORKERS:
+
+Number of threads rendering the Instant Articles in the background and in the
+``stories_warm_feeds`` command.
+"""
+
+STORIES_FEED_WARM_ON_SAVE = False
+"""
+.. _FEED_WARM_ON_SAVE:
+
+Render the Instant Articles in a background thread of the web process: when a post is saved,
+and when the Instant Articles feed lists missing or expired articles.
+
+The feed itself never renders the articles: if disabled (default), render them with the
+``stories_warm_feeds`` command. Until then, the feed lists the previous articles of the changed
+posts and leaves out the posts without an article.
+"""
+
 STORIES_FEED_INSTANT_ITEMS = 50
 """
 .. _FEED_INSTANT_ITEMS:
@@ -567,6 +799,30 @@ STORIES_FEED_TAGS_ITEMS = 10
 Number of items in per tags feed.
 """
 
+STORIES_ARTIFACTS_STORAGE = "default"
+"""
+.. _ARTIFACTS_STORAGE:
+
+Alias (in the ``STORAGES`` setting) of the storage of the pre-generated sitemap shards and
+feeds, built by the ``stories_build_artifacts`` command.
+"""
+
+STORIES_ARTIFACTS_PATH = "djangocms_stories/artifacts"
+"""
+.. _ARTIFACTS_PATH:
+
+Directory of the pre-generated sitemap shards and feeds in the
+:ref:`ARTIFACTS_STORAGE <ARTIFACTS_STORAGE>` storage.
+"""
+
+STORIES_ARTIFACTS_ON_SAVE = False
+"""
+.. _ARTIFACTS_ON_SAVE:
+
+Rebuild the pre-generated sitemap shards and feeds affected by a post when it is saved or
+deleted, once the transaction is committed.
+"""
+
 STORIES_PLUGIN_TEMPLATE_FOLDERS = (("plugins", _("Default template")),)
 """
 .. _PLUGIN_TEMPLATE_FOLDERS:
@@ -0,0 +1,406 @@
+"""
+Similar posts, by text similarity of the post contents.
+
+One :py:class:`~djangocms_stories.models.PostContent` is compared per post and language: the
+published one or, if the post is not published in the language, its latest version (see
+:py:func:`get_indexed_contents`). Its text (title, abstract, text and the text of the plugins in
+its placeholders) is turned into a set of word shingles, summarized by a MinHash signature: the similarity of two contents (the Jaccard index of their shingles) is
+estimated by the ratio of equal signature values.
+
+To avoid comparing all the contents, signatures are split in bands (see
+:ref:`SIMILARITY_BANDS <SIMILARITY_BANDS>`) and only contents sharing the hash of a band, in the
+same language and config, are compared (locality-sensitive hashing). Hashes shared by too many
+contents are ignored (see :ref:`SIMILARITY_MAX_BUCKET_SIZE <SIMILARITY_MAX_BUCKET_SIZE>`). The
+:ref:`SIMILAR_POSTS_LIMIT <SIMILAR_POSTS_LIMIT>` most similar contents of each content are stored in
+the :py:class:`~djangocms_stories.models.SimilarPostContent` table.
+
+Signatures, band hashes and similar contents are updated once the transaction is committed when
+a content, its plugins or its versions change. The ``stories_rebuild_similar_posts`` command
+computes them for all the contents: the texts are read and the signatures are computed by chunks,
+in a process pool.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import random
+import re
+import struct
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.apps import apps
+from django.db import connections, transaction
+from django.db.models import Count, Exists, F, Min, OuterRef, Q, Window
+from django.db.models.functions import RowNumber
+
+from .search import get_placeholder_text, get_text
+from .settings import get_setting
+
+SHINGLE_SIZE = 3
+CHUNK_SIZE = 500
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_ORDERING = (F("similarity").desc(), F("similar_id").desc())
+_pending = threading.local()
+_permutations = {}
+
+
+def get_indexed_contents():
+    """
+    Returns the compared contents: the published content of each post and language or, if
+    none is published, its latest version.
+    """
+    from .models import PostContent
+
+    published = PostContent.objects.all()
+    unpublished = PostContent.admin_manager.latest_content().exclude(
+        Exists(published.filter(post_id=OuterRef("post_id"), language=OuterRef("language")))
+    )
+    return PostContent.admin_manager.filter(Q(pk__in=published.values("pk")) | Q(pk__in=unpublished.values("pk")))
+
+
+def get_similarity_text(content) -> str:
+    """Returns the text of the given post content compared with the other contents."""
+    parts = [content.title, get_text(content.abstract), get_text(content.post_text), *get_placeholder_text(content)]
+    return "\n".join(part for part in parts if part)
+
+
+def get_permutations(count: int) -> list[tuple[int, int]]:
+    """Returns the coefficients of the hash functions, the same in all processes."""
+    if count not in _permutations:
+        generator = random.Random(count)
+        _permutations[count] = [(generator.randrange(1, _PRIME), generator.randrange(0, _PRIME)) for _ in range(count)]
+    return _permutations[count]
+
+
+def get_shingles(text: str) -> set[int]:
+    """Returns the hashes of the word shingles of the text."""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {zlib.crc32(" ".join(words).encode())} if words else set()
+    return {zlib.crc32(" ".join(words[i : i + SHINGLE_SIZE]).encode()) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def get_signature(text: str, count: int) -> tuple[int, ...] | None:
+    """
+    Returns the MinHash signature of the text, ``None`` if the text has no word.
+
+    :param count: number of hash functions
+    """
+    shingles = get_shingles(text)
+    if not shingles:
+        return None
+    return tuple(min((a * x + b) % _PRIME for x in shingles) & _MAX_HASH for a, b in get_permutations(count))
+
+
+def get_similarity(signature: tuple[int, ...], other: tuple[int, ...]) -> float:
+    """Returns the estimated Jaccard index of the texts of the signatures."""
+    return sum(a == b for a, b in zip(signature, other)) / len(signature)
+
+
+def pack_signature(signature: tuple[int, ...]) -> bytes:
+    return struct.pack(f"<{len(signature)}I", *signature)
+
+
+def unpack_signature(data: bytes) -> tuple[int, ...]:
+    return struct.unpack(f"<{len(data) // 4}I", data)
+
+
+def get_buckets(signature: tuple[int, ...], language: str) -> list[tuple[int, int]]:
+    """Returns the (band, bucket) pairs of the signature: the signed 64 bits hash of each band."""
+    bands, rows = get_setting("SIMILARITY_BANDS")
+    buckets = []
+    for band in range(bands):
+        data = language.encode() + pack_signature(signature[band * rows : (band + 1) * rows])
+        buckets.append((band, int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big", signed=True)))
+    return buckets
+
+
+def get_signature_size() -> int:
+    bands, rows = get_setting("SIMILARITY_BANDS")
+    return bands * rows
+
+
+def save_signature(content, signature: tuple[int, ...] | None) -> None:
+    """Store the signature of the content and its band hashes."""
+    from .models import PostContentBucket, PostContentSignature
+
+    with transaction.atomic():
+        if signature is None:
+            PostContentSignature.objects.filter(pk=content.pk).delete()
+            return
+        # The signature row is locked until the buckets are replaced
+        PostContentSignature.objects.update_or_create(
+            post_content=content, defaults={"language": content.language, "signature": pack_signature(signature)}
+        )
+        PostContentBucket.objects.filter(signature_id=content.pk).delete()
+        PostContentBucket.objects.bulk_create(
+            PostContentBucket(signature_id=content.pk, band=band, bucket=bucket)
+            for band, bucket in get_buckets(signature, content.language)
+        )
+
+
+def find_similar_contents(content, signature: tuple[int, ...] | None) -> dict:
+    """
+    Returns the similarity of the contents sharing a band hash with the signature, by content
+    primary key, above :ref:`SIMILAR_POSTS_THRESHOLD <SIMILAR_POSTS_THRESHOLD>`. Hashes shared by
+    more than :ref:`SIMILARITY_MAX_BUCKET_SIZE <SIMILARITY_MAX_BUCKET_SIZE>` contents are ignored.
+    """
+    from .models import PostContentBucket, PostContentSignature
+
+    if signature is None:
+        return {}
+    buckets = get_buckets(signature, content.language)
+    matches = Q()
+    for band, bucket in buckets:
+        matches |= Q(band=band, bucket=bucket)
+    shared = PostContentBucket.objects.filter(
+        matches, signature__post_content__post__app_config=content.post.app_config_id
+    )
+    max_size = get_setting("SIMILARITY_MAX_BUCKET_SIZE")
+    if max_size:
+        crowded = set(
+            shared.order_by()
+            .values("band", "bucket")
+            .annotate(count=Count("pk"))
+            .filter(count__gt=max_size)
+            .values_list("band", "bucket")
+        )
+        matches = Q()
+        for band, bucket in buckets:
+            if (band, bucket) not in crowded:
+                matches |= Q(band=band, bucket=bucket)
+        if not matches:
+            return {}
+        shared = shared.filter(matches)
+    candidates = shared.exclude(signature__post_content__post_id=content.post_id).values("signature_id")
+    threshold = get_setting("SIMILAR_POSTS_THRESHOLD")
+    similar = {}
+    for pk, data in PostContentSignature.objects.filter(pk__in=candidates).values_list("pk", "signature"):
+        similarity = get_similarity(signature, unpack_signature(data))
+        if similarity >= threshold:
+            similar[pk] = similarity
+    return similar
+
+
+def get_top(similar: dict) -> list[tuple[int, float]]:
+    """Returns the most similar contents, see :py:data:`_ORDERING`"""
+    top = sorted(similar.items(), key=lambda item: (item[1], item[0]), reverse=True)
+    return top[: get_setting("SIMILAR_POSTS_LIMIT")]
+
+
+def set_similar_contents(content_pk: int, similar: dict) -> None:
+    from .models import PostContentSignature, SimilarPostContent
+
+    with transaction.atomic():
+        # Concurrent updates of the content wait for this one, instead of inserting the same rows
+        list(PostContentSignature.objects.filter(pk=content_pk).select_for_update().values_list("pk", flat=True))
+        SimilarPostContent.objects.filter(post_content_id=content_pk).delete()
+        SimilarPostContent.objects.bulk_create(
+            SimilarPostContent(post_content_id=content_pk, similar_id=pk, similarity=similarity)
+            for pk, similarity in get_top(similar)
+        )
+
+
+def refresh_similar_contents(content_pk: int) -> None:
+    """Compute the similar contents of the given content again, from its stored signature."""
+    from .models import PostContent, PostContentSignature
+
+    content = PostContent.admin_manager.filter(pk=content_pk).select_related("post").first()
+    data = PostContentSignature.objects.filter(pk=content_pk).values_list("signature", flat=True).first()
+    if content is not None:
+        signature = unpack_signature(data) if data else None
+        set_similar_contents(content_pk, find_similar_contents(content, signature))
+
+
+def update_similar_contents(content) -> None:
+    """
+    Update the signature and the similar contents of the given content, and add it to the similar
+    contents of the others.
+    """
+    from .models import SimilarPostContent
+
+    limit = get_setting("SIMILAR_POSTS_LIMIT")
+    signature = get_signature(get_similarity_text(content), get_signature_size())
+    save_signature(content, signature)
+    similar = find_similar_contents(content, signature)
+    set_similar_contents(content.pk, similar)
+
+    # Contents listing the content may not list it anymore
+    listing = set(SimilarPostContent.objects.filter(similar=content).values_list("post_content_id", flat=True))
+    SimilarPostContent.objects.filter(similar=content).delete()
+    for pk in listing.difference(similar):
+        refresh_similar_contents(pk)
+    if not similar:
+        return
+    lowest = {
+        row["post_content_id"]: row
+        for row in SimilarPostContent.objects.filter(post_content_id__in=similar)
+        .order_by()
+        .values("post_content_id")
+        .annotate(count=Count("pk"), lowest_similarity=Min("similarity"))
+    }
+    rows = [
+        SimilarPostContent(post_content_id=pk, similar_id=content.pk, similarity=similarity)
+        for pk, similarity in similar.items()
+        if pk not in lowest or lowest[pk]["count"] < limit or similarity > lowest[pk]["lowest_similarity"]
+    ]
+    with transaction.atomic():
+        # Rows inserted in the meantime by the update of the other contents are kept
+        SimilarPostContent.objects.bulk_create(rows, ignore_conflicts=True)
+        full = [
+            row.post_content_id
+            for row in rows
+            if row.post_content_id in lowest and lowest[row.post_content_id]["count"] >= limit
+        ]
+        if full:
+            ranked = SimilarPostContent.objects.filter(post_content_id__in=full).annotate(
+                similar_rank=Window(RowNumber(), partition_by=[F("post_content_id")], order_by=_ORDERING)
+            )
+            SimilarPostContent.objects.filter(
+                pk__in=list(ranked.filter(similar_rank__gt=limit).values_list("pk", flat=True))
+            ).delete()
+
+
+def remove_similar_contents(content_pks) -> None:
+    """
+    Remove the signatures and the similar contents of the given contents, which are not compared
+    anymore, and compute the similar contents of the contents listing them again.
+    """
+    from .models import PostContentSignature, SimilarPostContent
+
+    content_pks = set(content_pks)
+    listing = set(SimilarPostContent.objects.filter(similar__in=content_pks).values_list("post_content_id", flat=True))
+    PostContentSignature.objects.filter(pk__in=content_pks).delete()
+    SimilarPostContent.objects.filter(Q(post_content__in=content_pks) | Q(similar__in=content_pks)).delete()
+    for pk in listing.difference(content_pks):
+        refresh_similar_contents(pk)
+
+
+def get_signatures(content_pks) -> list[tuple]:
+    """
+    Returns the primary key, language, config primary key, post primary key and signature of the
+    given contents having a text.
+    """
+    from .models import PostContent
+
+    count = get_signature_size()
+    rows = []
+    for content in PostContent.admin_manager.filter(pk__in=content_pks).select_related("post"):
+        signature = get_signature(get_similarity_text(content), count)
+        if signature is not None:
+            rows.append((content.pk, content.language, content.post.app_config_id, content.post_id, signature))
+    return rows
+
+
+def _init_worker() -> None:
+    if not apps.ready:
+        django.setup()
+
+
+def rebuild_similar_contents(processes: int | None = None) -> int:
+    """
+    Compute the signatures and similar contents of all the contents.
+
+    :param processes: number of processes reading the texts and computing the signatures
+                      (defaults to the number of CPUs), ``1`` computes them in the current process,
+                      as well as in a transaction, whose changes other processes cannot read
+    :return: number of contents
+    """
+    from .models import PostContentBucket, PostContentSignature, SimilarPostContent
+
+    content_pks = list(get_indexed_contents().order_by("pk").values_list("pk", flat=True))
+    chunks = [content_pks[start : start + CHUNK_SIZE] for start in range(0, len(content_pks), CHUNK_SIZE)]
+    executor = None
+    if processes == 1 or transaction.get_connection().in_atomic_block:
+        results = map(get_signatures, chunks)
+    else:
+        # Forked workers must not share the connections of this process
+        connections.close_all()
+        executor = ProcessPoolExecutor(max_workers=processes, initializer=_init_worker)
+        results = executor.map(get_signatures, chunks)
+
+    PostContentSignature.objects.all().delete()
+    SimilarPostContent.objects.all().delete()
+    indexed = {}
+    buckets = {}
+    try:
+        for rows in results:
+            chunk_buckets = []
+            for pk, language, app_config_id, post_id, signature in rows:
+                indexed[pk] = (post_id, signature)
+                for band, bucket in get_buckets(signature, language):
+                    buckets.setdefault((app_config_id, band, bucket), []).append(pk)
+                    chunk_buckets.append(PostContentBucket(signature_id=pk, band=band, bucket=bucket))
+            PostContentSignature.objects.bulk_create(
+                PostContentSignature(post_content_id=pk, language=language, signature=pack_signature(signature))
+                for pk, language, _, _, signature in rows
+            )
+            PostContentBucket.objects.bulk_create(chunk_buckets, batch_size=1000)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    threshold = get_setting("SIMILAR_POSTS_THRESHOLD")
+    max_size = get_setting("SIMILARITY_MAX_BUCKET_SIZE")
+    candidates = {pk: set() for pk in indexed}
+    for members in buckets.values():
+        if max_size and len(members) > max_size:
+            continue
+        for pk in members:
+            candidates[pk].update(members)
+    similar_rows = []
+    for pk, (post_id, signature) in indexed.items():
+        similar = {}
+        for other in candidates[pk]:
+            other_post_id, other_signature = indexed[other]
+            if other_post_id != post_id:
+                similarity = get_similarity(signature, other_signature)
+                if similarity >= threshold:
+                    similar[other] = similarity
+        similar_rows.extend(
+            SimilarPostContent(post_content_id=pk, similar_id=other, similarity=similarity)
+            for other, similarity in get_top(similar)
+        )
+    SimilarPostContent.objects.bulk_create(similar_rows, batch_size=1000)
+    return len(content_pks)
+
+
+def update_post_similar_contents(post_id: int, language: str) -> None:
+    """
+    Update the similar contents of the compared content of the post in the language (see
+    :py:func:`get_indexed_contents`), and remove its other versions.
+    """
+    from .models import PostContent
+
+    content = get_indexed_contents().filter(post_id=post_id, language=language).select_related("post").first()
+    versions = PostContent.admin_manager.filter(post_id=post_id, language=language)
+    if content is not None:
+        versions = versions.exclude(pk=content.pk)
+    remove_similar_contents(versions.values_list("pk", flat=True))
+    if content is not None:
+        update_similar_contents(content)
+
+
+def _flush_similar_contents() -> None:
+    from .models import PostContent
+
+    pks = _pending.__dict__.pop("contents", set())
+    for post_id, language in (
+        PostContent.admin_manager.filter(pk__in=pks).values_list("post_id", "language").distinct().order_by()
+    ):
+        update_post_similar_contents(post_id, language)
+
+
+def schedule_similar_contents(content_pk: int) -> None:
+    """
+    Update the similar contents of the given content once the transaction is committed (see
+    :py:func:`update_similar_contents`). Changes in the same transaction are coalesced.
+    """
+    if not get_setting("ENABLE_SIMILAR_POSTS"):
+        return
+    _pending.__dict__.setdefault("contents", set()).add(content_pk)
+    transaction.on_commit(_flush_similar_contents)
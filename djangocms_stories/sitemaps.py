@@ -1,48 +1,177 @@
+from __future__ import annotations
+
+from collections.abc import Iterator, Mapping
+
 from cms.utils import get_language_list
-from django.contrib.sitemaps import Sitemap
-from django.urls.exceptions import NoReverseMatch
+from django.contrib.sitemaps import Sitemap, views
+from django.contrib.sites.shortcuts import get_current_site
 
+from djangocms_stories.cms_appconfig import config_registry
 from djangocms_stories.models import PostContent
+from djangocms_stories.permalinks import get_category_slug, get_permalink_builder
 from djangocms_stories.settings import get_setting
 
 
+class SitemapItems:
+    """
+    Lazy list of the sitemap items, for :py:class:`django.core.paginator.Paginator`.
+
+    Slices are streamed from the database with :py:meth:`~django.db.models.query.QuerySet.iterator`
+    and turned into items by chunks, instead of being loaded in memory.
+    """
+
+    ordered = True
+
+    def __init__(self, queryset, build):
+        self.queryset = queryset
+        self.build = build
+
+    def count(self) -> int:
+        return self.queryset.count()
+
+    def __getitem__(self, key: slice) -> Iterator[dict]:
+        return self.build(self.queryset[key])
+
+    def __iter__(self) -> Iterator[dict]:
+        return self.build(self.queryset)
+
+
 class StoriesSitemap(Sitemap):
-    def __init__(self, *args, **kwargs):
+    """
+    Sitemap of the published post contents.
+
+    Items are dictionaries of the post content columns, with their ``location``. Posts whose
+    url cannot be built (e.g. the apphook page of their config is not published) are left out.
+
+    :param namespace: only list the posts of this config (defaults to all the configs)
+    :param language: only list the contents in this language (defaults to all the site languages)
+    """
+
+    chunk_size = 2000
+    fields = (
+        "pk",
+        "slug",
+        "language",
+        "post_id",
+        "post__date_created",
+        "post__date_published",
+        "post__date_featured",
+        "post__date_modified",
+        "post__app_config__namespace",
+        "post__primary_category_slugs",
+    )
+
+    def __init__(self, namespace: str | None = None, language: str | None = None, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.url_cache = {}
+        self.namespace = namespace
+        self.language = language
 
-    def priority(self, obj: PostContent):
-        if obj and obj.app_config:
-            return obj.app_config.sitemap_priority
+    def get_config(self, item: dict):
+        return config_registry.get(item["post__app_config__namespace"])
+
+    def priority(self, item: dict):
+        config = self.get_config(item)
+        if config:
+            return config.sitemap_priority
         return get_setting("SITEMAP_PRIORITY_DEFAULT")
 
-    def changefreq(self, obj: PostContent):
-        if obj and obj.app_config:
-            return obj.app_config.sitemap_changefreq
+    def changefreq(self, item: dict):
+        config = self.get_config(item)
+        if config:
+            return config.sitemap_changefreq
         return get_setting("SITEMAP_CHANGEFREQ_DEFAULT")
 
-    def location(self, obj: PostContent) -> str:
-        return self.url_cache[obj]
-
-    def items(self) -> list[PostContent]:
-        items = []
-        self.url_cache.clear()
-        for lang in get_language_list():
-            postcontents = PostContent.objects.filter(language=lang)
-            for postcontent in postcontents:
-                # check if the post actually has a url before appending
-                # if a post is published but the associated app config is not
-                # then this post will not have a url
-                try:
-                    self.url_cache[postcontent] = postcontent.get_absolute_url()
-                except NoReverseMatch:
-                    # couldn't determine the url of the post so pass on it
-                    continue
-                items.append(postcontent)
-        return items
-
-    def lastmod(self, obj: PostContent):
-        return obj.post.date_modified
+    def location(self, item: dict) -> str:
+        return item["location"]
+
+    def lastmod(self, item: dict):
+        return item["post__date_modified"]
+
+    def get_queryset(self):
+        queryset = PostContent.objects.filter(language__in=[self.language] if self.language else get_language_list())
+        if self.namespace:
+            queryset = queryset.filter(post__app_config__namespace=self.namespace)
+        return queryset.order_by("pk").values(*self.fields)
+
+    def items(self) -> SitemapItems:
+        return SitemapItems(self.get_queryset(), self.build_items)
+
+    def build_items(self, queryset) -> Iterator[dict]:
+        """Add the location of the contents, streaming them by chunks"""
+        builders = {}
+        for row in queryset.iterator(chunk_size=self.chunk_size):
+            namespace = row["post__app_config__namespace"]
+            if namespace not in builders:
+                config = config_registry.get(namespace)
+                builders[namespace] = config and get_permalink_builder(config)
+            builder = builders[namespace]
+            if builder is None:
+                continue
+            category = get_category_slug(row["post__primary_category_slugs"], row["language"])
+            date = row["post__date_featured"] or row["post__date_published"] or row["post__date_created"]
+            kwargs = builder.make_kwargs(date, row["slug"], category)
+            row["location"] = builder.format_url(kwargs, row["language"])
+            if row["location"]:
+                yield row
+
+
+class StoriesSitemaps(Mapping):
+    """
+    Sitemap sections for :py:func:`django.contrib.sitemaps.views.index`, with one
+    :py:class:`StoriesSitemap` for each config and language. Each section is paginated by
+    :py:attr:`~django.contrib.sitemaps.Sitemap.limit` (50,000) urls.
+
+    Sections are listed when the view is called, hence new configs are picked up.
+
+    :param sitemaps: other sections of the sitemap index (e.g. django CMS pages)
+    """
+
+    sitemap_class = StoriesSitemap
+
+    def __init__(self, sitemaps: dict | None = None):
+        self.sitemaps = sitemaps or {}
+        self._sitemaps = {}
+
+    def get_sections(self) -> dict:
+        sections = dict(self.sitemaps)
+        for config in config_registry.all():
+            for language in get_language_list():
+                key = (config.namespace, language)
+                # Same instances on each call: the mapping must compare equal to itself when reversing urls
+                if key not in self._sitemaps:
+                    self._sitemaps[key] = self.sitemap_class(config.namespace, language)
+                sections[self.get_section_name(config.namespace, language)] = self._sitemaps[key]
+        return sections
+
+    @staticmethod
+    def get_section_name(namespace: str, language: str) -> str:
+        return f"stories-{namespace}-{language}"
+
+    def __getitem__(self, section: str):
+        return self.get_sections()[section]
+
+    def __iter__(self):
+        return iter(self.get_sections())
+
+    def __len__(self) -> int:
+        return len(self.get_sections())
+
+
+def sitemap(request, sitemaps, section=None, **kwargs):
+    """
+    :py:func:`django.contrib.sitemaps.views.sitemap` view serving the pre-generated shard of the
+    section page, if any (see :py:mod:`djangocms_stories.artifacts`).
+    """
+    from djangocms_stories.artifacts import get_artifact, get_sitemap_name, serve_artifact
+
+    page = request.GET.get("p", "1")
+    if section is not None and page.isdigit():
+        artifact = get_artifact(get_sitemap_name(get_current_site(request).pk, section, int(page)))
+        response = artifact and serve_artifact(request, artifact)
+        if response is not None:
+            response.headers["X-Robots-Tag"] = "noindex, noodp, noarchive"
+            return response
+    return views.sitemap(request, sitemaps, section, **kwargs)
 
 
 class BlogSitemap(StoriesSitemap):  # pragma: no cover
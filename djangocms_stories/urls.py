@@ -9,6 +9,7 @@ from .views import (
     PostArchiveView,
     PostDetailView,
     PostListView,
+    PostSearchView,
     TaggedListView,
 )
 
@@ -24,6 +25,7 @@ urlpatterns = [
     path("author/<str:username>/", AuthorEntriesView.as_view(), name="posts-author"),
     path("tag/<slug:tag>/", TaggedListView.as_view(), name="posts-tagged"),
     path("tag/<slug:tag>/feed/", TagFeed(), name="posts-tagged-feed"),
+    path("search/", PostSearchView.as_view(), name="posts-search"),
 ]
 permalink_urls = get_setting("PERMALINK_URLS")
 for urlconf in permalink_urls.values():
@@ -1,6 +1,11 @@
+from io import BytesIO
+
 from django.apps import apps
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.wsgi import WSGIRequest
+
+from .settings import get_setting
 
 
 _versioning_enabled = None if "djangocms_versioning" in settings.INSTALLED_APPS else False
@@ -33,3 +38,41 @@ def site_compatibility_decorator(func):
     except ImproperlyConfigured:
         return func
     return func
+
+
+class SiteRequest(WSGIRequest):
+    """Request built from the current site: its host is not checked against ``ALLOWED_HOSTS``"""
+
+    def get_host(self):
+        return self.META["HTTP_HOST"]
+
+
+def get_site_request(path, language):
+    """
+    Returns an anonymous GET request of the given path on the current site, with the
+    :ref:`SITE_PROTOCOL <SITE_PROTOCOL>` scheme: used to render pages outside of a request
+    (eg: in a background thread or in a management command).
+    """
+    from django.contrib.auth.models import AnonymousUser
+    from django.contrib.sites.models import Site
+
+    scheme = get_setting("SITE_PROTOCOL")
+    domain = Site.objects.get_current().domain
+    host, _, port = domain.partition(":")
+    request = SiteRequest(
+        {
+            "REQUEST_METHOD": "GET",
+            "SCRIPT_NAME": "",
+            "PATH_INFO": path,
+            "QUERY_STRING": "",
+            "HTTP_HOST": domain,
+            "SERVER_NAME": host,
+            "SERVER_PORT": port or ("443" if scheme == "https" else "80"),
+            "wsgi.url_scheme": scheme,
+            "wsgi.input": BytesIO(),
+        }
+    )
+    request.user = AnonymousUser()
+    request.session = {}
+    request.LANGUAGE_CODE = language
+    return request
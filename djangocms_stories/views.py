@@ -1,7 +1,9 @@
 import os.path
+from operator import attrgetter
 
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ImproperlyConfigured
+from django.core.paginator import InvalidPage, Paginator
 from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
@@ -12,8 +14,12 @@ from parler.views import TranslatableSlugMixin, ViewUrlMixin
 
 from cms.utils import get_current_site
 
+from .cache import get_cache_key, get_generation, get_or_compute
 from .cms_appconfig import get_app_instance
-from .models import PostCategory, PostContent
+from .conditional import ConditionalGetMixin, get_queryset_validators, get_validators
+from .managers import fill_content_cache
+from .models import Post, PostCategory, PostContent, RelatedPost, SimilarPostContent
+from .pagination import CursorPaginator, EstimatedCountPaginator
 from .settings import get_setting
 from .utils import site_compatibility_decorator
 
@@ -39,7 +45,7 @@ class StoriesConfigMixin:
         return super().render_to_response(context, **response_kwargs)
 
 
-class PostDetailView(StoriesConfigMixin, DetailView):
+class PostDetailView(StoriesConfigMixin, ConditionalGetMixin, DetailView):
     model = PostContent
     context_object_name = "post_content"
     base_template_name = "post_detail.html"
@@ -57,6 +63,26 @@ class PostDetailView(StoriesConfigMixin, DetailView):
                 self.config = None
         return super().get(request, *args, **kwargs)
 
+    def get_validators(self):
+        """Validate the post content version (the content primary key) and its modification date"""
+        content = (
+            self.get_queryset()
+            .filter(**{self.slug_field: self.kwargs.get(self.slug_url_kwarg)})
+            .values_list("pk", "post__date_modified")
+            .first()
+        )
+        if content is None:
+            return None
+        pk, date_modified = content
+        return get_validators(
+            date_modified,
+            pk,
+            get_current_site(self.request).pk,
+            get_language(),
+            self.instant_article,
+            self.request.get_full_path(),
+        )
+
     def get_template_names(self):
         if self.instant_article:
             template_path = (self.config and self.config.template_prefix) or "djangocms_stories"
@@ -82,8 +108,58 @@ class PostDetailView(StoriesConfigMixin, DetailView):
         context["meta"] = self.get_object().as_meta()
         context["instant_article"] = self.instant_article
         context["use_placeholder"] = get_setting("USE_PLACEHOLDER")
+        context["related_contents"] = self.get_related_contents(context["post_content"])
         return context
 
+    def get_related_contents(self, post_content):
+        """
+        Returns the contents of the related posts in the current language, in their sorted order.
+
+        Without selected related posts, the automatic related posts are shown, best first (see
+        :ref:`ENABLE_AUTO_RELATED <ENABLE_AUTO_RELATED>`), then the posts with the most similar text
+        (see :ref:`ENABLE_SIMILAR_POSTS <ENABLE_SIMILAR_POSTS>`).
+
+        Posts, with their images and configs, are loaded in one query over the related posts table,
+        their categories, tags and contents in bulk: current contents in edit mode, published ones
+        otherwise. Posts without a content in the language are left out.
+        """
+        language = get_language()
+        draft = hasattr(self.request, "toolbar") and self.request.toolbar.edit_mode_active
+        posts = self.get_related_posts(
+            Post.related.through.objects.filter(from_post=post_content.post_id).order_by("sort_value"), "to_post"
+        )
+        if not posts and get_setting("ENABLE_AUTO_RELATED"):
+            posts = self.get_related_posts(
+                RelatedPost.objects.filter(post=post_content.post_id).order_by("-score", "-related_id"), "related"
+            )
+        if not posts and get_setting("ENABLE_SIMILAR_POSTS"):
+            posts = self.get_related_posts(
+                # Similar contents are stored for one version of the post in the language
+                SimilarPostContent.objects.filter(
+                    post_content__post=post_content.post_id, post_content__language=post_content.language
+                ).order_by("-similarity", "-similar_id"),
+                "similar__post",
+            )
+        fill_content_cache(posts, [language], draft)
+        return [content for post in posts if (content := post.get_content(language, draft)) is not None]
+
+    @staticmethod
+    def get_related_posts(rows, field: str) -> list:
+        """Returns the posts referenced by ``field`` in the rows of a related posts table, once each"""
+        rows = rows.select_related(
+            f"{field}__app_config",
+            f"{field}__main_image",
+            f"{field}__main_image_thumbnail",
+            f"{field}__main_image_full",
+        ).prefetch_related(
+            f"{field}__categories",
+            f"{field}__categories__translations",
+            f"{field}__categories__app_config",
+            f"{field}__tags",
+        )
+        posts = map(attrgetter(field.replace("__", ".")), rows)
+        return list({post.pk: post for post in posts}.values())
+
 
 class ToolbarDetailView(PostDetailView):
     """Mimics DetailView but takes content object from render function"""
@@ -95,7 +171,10 @@ class ToolbarDetailView(PostDetailView):
         return content_object
 
 
-class BaseConfigListViewMixin(StoriesConfigMixin):
+class BaseConfigListViewMixin(StoriesConfigMixin, ConditionalGetMixin):
+    cursor_kwarg = "cursor"
+    paginator_class = EstimatedCountPaginator
+
     def optimize(self, qs):
         """
         Apply select_related / prefetch_related to optimize the view queries
@@ -115,17 +194,31 @@ class BaseConfigListViewMixin(StoriesConfigMixin):
 
     def get_queryset(self):
         language = get_language()
-        if hasattr(self.request, "toolbar") and (
-            self.request.toolbar.edit_mode_active or self.request.toolbar.preview_mode_active
-        ):
+        if self.is_preview():
             queryset = self.model.admin_manager.latest_content()
         else:
             queryset = self.model.objects.all()
-        queryset = queryset.filter(language=language, post__app_config__namespace=self.namespace)
+        # Contents carry the config of their post: the list is a range of the (language, app_config, date) index
+        if self.config:
+            queryset = queryset.filter(language=language, app_config=self.config.pk)
+        else:
+            queryset = queryset.filter(language=language, app_config__namespace=self.namespace)
         setattr(self.request, get_setting("CURRENT_NAMESPACE"), self.config)
         site = get_current_site(self.request)
         return self.optimize(queryset.on_site(site))
 
+    def get_validators(self):
+        # Posts are not counted on each request: added and removed posts change the posts generation
+        return get_queryset_validators(
+            self.get_queryset(),
+            "post__date_modified",
+            self.namespace,
+            get_current_site(self.request).pk,
+            get_language(),
+            self.request.get_full_path(),
+            count=False,
+        )
+
     def get_template_names(self):
         template_path = (self.config and self.config.template_prefix) or "djangocms_stories"
         return os.path.join(template_path, self.base_template_name)
@@ -138,6 +231,43 @@ class BaseConfigListViewMixin(StoriesConfigMixin):
     def get_paginate_by(self, queryset):
         return (self.config and self.config.paginate_by) or get_setting("PAGINATION")
 
+    def is_preview(self):
+        return hasattr(self.request, "toolbar") and (
+            self.request.toolbar.edit_mode_active or self.request.toolbar.preview_mode_active
+        )
+
+    def get_count_key(self):
+        """
+        Return the parts identifying the current list in the post count cache.
+
+        Views filtering the posts on arbitrary user input should return ``None``: their
+        lists are not cached and only counted up to ``STORIES_PAGINATION_COUNT_CAP``.
+        """
+        return (
+            self.view_url_name,
+            self.namespace,
+            get_current_site(self.request).pk,
+            get_language(),
+            self.is_preview(),
+            *sorted(self.kwargs.items()),
+        )
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        return super().get_paginator(
+            queryset, per_page, orphans, allow_empty_first_page, count_key=self.get_count_key(), **kwargs
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        """Use keyset pagination if enabled in the current config"""
+        if not (self.config and self.config.cursor_pagination):
+            return super().paginate_queryset(queryset, page_size)
+        paginator = CursorPaginator(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidPage as e:
+            raise Http404(str(e))
+        return paginator, page, page.object_list, page.has_other_pages()
+
 
 class PostListView(BaseConfigListViewMixin, ListView):
     model = PostContent
@@ -145,7 +275,7 @@ class PostListView(BaseConfigListViewMixin, ListView):
     view_url_name = "djangocms_stories:posts-latest"
 
 
-class CategoryListView(StoriesConfigMixin, ViewUrlMixin, TranslatableSlugMixin, ListView):
+class CategoryListView(StoriesConfigMixin, ConditionalGetMixin, ViewUrlMixin, TranslatableSlugMixin, ListView):
     model = PostCategory
     context_object_name = "category_list"
     base_template_name = "category_list.html"
@@ -153,13 +283,23 @@ class CategoryListView(StoriesConfigMixin, ViewUrlMixin, TranslatableSlugMixin,
 
     def get_queryset(self):
         language = get_language()
-        queryset = self.model._default_manager.filter(app_config__namespace=self.namespace).active_translations(
-            language_code=language
+        queryset = self.model._default_manager.active_translations(language_code=language).with_post_counts(
+            site=get_current_site(self.request), namespace=self.namespace, language=language
         )
         queryset = queryset.filter(parent__isnull=True, priority__isnull=False)  # Only top-level categories
         setattr(self.request, get_setting("CURRENT_NAMESPACE"), self.config)
         return queryset
 
+    def get_validators(self):
+        # Post counts are covered by the posts generation
+        return get_queryset_validators(
+            self.model._default_manager.filter(app_config__namespace=self.namespace),
+            "date_modified",
+            get_current_site(self.request).pk,
+            get_language(),
+            self.request.get_full_path(),
+        )
+
     def get_template_names(self):
         template_path = (self.config and self.config.template_prefix) or "djangocms_stories"
         return os.path.join(template_path, self.base_template_name)
@@ -177,9 +317,9 @@ class PostArchiveView(BaseConfigListViewMixin, ListView):
     def get_queryset(self):
         qs = super().get_queryset()
         if "month" in self.kwargs:
-            qs = qs.filter(**{"post__%s__month" % self.date_field: self.kwargs["month"]})
+            qs = qs.filter(**{"%s__month" % self.date_field: self.kwargs["month"]})
         if "year" in self.kwargs:
-            qs = qs.filter(**{"post__%s__year" % self.date_field: self.kwargs["year"]})
+            qs = qs.filter(**{"%s__year" % self.date_field: self.kwargs["year"]})
         return self.optimize(qs)
 
     def get_context_data(self, **kwargs):
@@ -246,7 +386,10 @@ class CategoryEntriesView(BaseConfigListViewMixin, ListView):
     def get_queryset(self):
         qs = super().get_queryset()
         if "category" in self.kwargs:
-            qs = qs.filter(post__categories=self.category.pk)
+            if get_setting("CATEGORY_INCLUDE_SUBCATEGORIES"):
+                qs = qs.filter(post__in=Post.objects.in_category(self.category).values("pk"))
+            else:
+                qs = qs.filter(post__categories=self.category.pk)
         return self.optimize(qs)
 
     def get_context_data(self, **kwargs):
@@ -254,3 +397,69 @@ class CategoryEntriesView(BaseConfigListViewMixin, ListView):
         context = super().get_context_data(**kwargs)
         context["meta"] = self.category.as_meta()
         return context
+
+
+class PostSearchView(BaseConfigListViewMixin, ListView):
+    model = PostContent
+    context_object_name = "postcontent_list"
+    base_template_name = "post_list.html"
+    view_url_name = "djangocms_stories:posts-search"
+    search_kwarg = "q"
+
+    def dispatch(self, request, *args, **kwargs):
+        # Routed in any case: enabling the search does not depend on when the urls are loaded
+        if not get_setting("ENABLE_SEARCH"):
+            raise Http404("Search is disabled")
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_search_query(self):
+        return self.request.GET.get(self.search_kwarg, "").strip()
+
+    def get_validators(self):
+        # Search results only change with the posts generation: no need to query them
+        return get_validators(
+            None, self.namespace, get_current_site(self.request).pk, get_language(), self.request.get_full_path()
+        )
+
+    def get_queryset(self):
+        return super().get_queryset().search(self.get_search_query(), get_language())
+
+    def get_search_results(self, queryset):
+        """
+        Return the primary keys of the matching posts, best matches first.
+
+        Results are cached until posts or the search index change, and limited to
+        ``STORIES_PAGINATION_COUNT_CAP`` posts.
+        """
+        key = get_cache_key(
+            "search",
+            get_generation("post-count"),
+            self.namespace,
+            get_current_site(self.request).pk,
+            get_language(),
+            self.is_preview(),
+            self.get_search_query(),
+        )
+
+        def get_results():
+            results = queryset.values_list("pk", flat=True)
+            if get_setting("PAGINATION_COUNT_CAP"):
+                results = results[: get_setting("PAGINATION_COUNT_CAP")]
+            return list(dict.fromkeys(results))
+
+        return get_or_compute(key, get_results, get_setting("SEARCH_CACHE_TIMEOUT"))
+
+    def paginate_queryset(self, queryset, page_size):
+        """Paginate the cached search results, loading only the posts of the current page"""
+        paginator = Paginator(self.get_search_results(queryset), page_size)
+        try:
+            page = paginator.page(self.request.GET.get(self.page_kwarg) or 1)
+        except InvalidPage as e:
+            raise Http404(str(e))
+        objects = queryset.in_bulk(page.object_list)
+        page.object_list = [objects[pk] for pk in page.object_list if pk in objects]
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        kwargs["search_query"] = self.get_search_query()
+        return super().get_context_data(**kwargs)
@@ -125,3 +125,4 @@ STATIC_URL = "/static/"
 TESTS_RUNNING = True
 
 STORIES_SCHEMAORG_TYPES = ()
+STORIES_ENABLE_SEARCH = True
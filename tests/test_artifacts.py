@@ -0,0 +1,133 @@
+import gzip
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.translation import override
+
+from djangocms_stories.artifacts import build_artifacts, get_sitemap_name, write_artifact
+from djangocms_stories.models import StoriesArtifact
+from djangocms_stories.sitemaps import StoriesSitemap
+
+
+@pytest.fixture
+def artifacts_storage(settings, tmp_path):
+    settings.STORAGES = {
+        **settings.STORAGES,
+        "stories": {"BACKEND": "django.core.files.storage.FileSystemStorage", "OPTIONS": {"location": tmp_path}},
+    }
+    settings.STORIES_ARTIFACTS_STORAGE = "stories"
+    return tmp_path
+
+
+def get_shards(namespace):
+    return dict(
+        StoriesArtifact.objects.filter(name__startswith=f"sitemap/1/stories-{namespace}-en-").values_list(
+            "name", "checksum"
+        )
+    )
+
+
+@pytest.mark.django_db
+def test_build_artifacts_command(artifacts_storage, page_with_menu, many_posts, default_config):
+    out = StringIO()
+    call_command("stories_build_artifacts", namespace=[default_config.namespace], language=["en"], stdout=out)
+
+    assert out.getvalue() == "Wrote 2 artifacts\n"
+    shard = StoriesArtifact.objects.get(name=get_sitemap_name(1, f"stories-{default_config.namespace}-en", 1))
+    assert shard.file.endswith(f"-1.{shard.checksum[:16]}.xml.gz")
+    content = gzip.decompress((artifacts_storage / shard.file).read_bytes()).decode("utf-8")
+    for item in StoriesSitemap(default_config.namespace, "en").items():
+        assert item["location"] in content
+
+    # Unchanged artifacts are not written again
+    assert build_artifacts() == 2  # Italian sitemap and feed
+
+
+@pytest.mark.django_db
+def test_sitemap_serves_artifact(client, settings, artifacts_storage, page_with_menu, many_posts, default_config):
+    settings.STORIES_SITE_PROTOCOL = "https"
+    url = f"/sitemap-stories-{default_config.namespace}-en.xml"
+    dynamic = client.get(url, secure=True).content
+    build_artifacts([default_config.namespace], ["en"])
+
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(url, secure=True, HTTP_ACCEPT_ENCODING="gzip, deflate")
+    assert response.status_code == 200
+    assert response["Content-Encoding"] == "gzip"
+    assert response["X-Robots-Tag"] == "noindex, noodp, noarchive"
+    assert gzip.decompress(response.content) == dynamic
+    assert not [query for query in ctx.captured_queries if "djangocms_stories_postcontent" in query["sql"]]
+
+    response = client.get(url, secure=True)
+    assert "Content-Encoding" not in response
+    assert response.content == dynamic
+    assert client.get(url, secure=True, HTTP_IF_NONE_MATCH=response["ETag"]).status_code == 304
+
+
+@pytest.mark.django_db
+def test_feed_serves_artifact(client, artifacts_storage, page_with_menu, many_posts, default_config):
+    with override("en"):
+        url = reverse(f"{default_config.namespace}:posts-latest-feed")
+    build_artifacts([default_config.namespace], ["en"])
+    artifact = StoriesArtifact.objects.get(name=f"feed/1/{default_config.namespace}-en.xml")
+    write_artifact(artifact.name, b"<rss>stored</rss>", artifact.content_type)
+
+    response = client.get(url)
+
+    assert response.content == b"<rss>stored</rss>"
+    assert response["Content-Type"].startswith("application/rss+xml")
+
+
+@pytest.mark.django_db
+def test_artifacts_site_urls(settings, artifacts_storage, page_with_menu, many_posts, default_config):
+    """Artifacts link to the domain of the current site, with the configured scheme"""
+    settings.STORIES_SITE_PROTOCOL = "https"
+    build_artifacts([default_config.namespace], ["en"])
+    for artifact in StoriesArtifact.objects.filter(name__contains=f"{default_config.namespace}-en"):
+        content = gzip.decompress((artifacts_storage / artifact.file).read_bytes()).decode("utf-8")
+        assert "https://example.com/" in content
+        assert "http://example.com/" not in content
+
+    settings.STORIES_SITE_PROTOCOL = "http"
+    build_artifacts([default_config.namespace], ["en"])
+    shard = StoriesArtifact.objects.get(name=get_sitemap_name(1, f"stories-{default_config.namespace}-en", 1))
+    assert "<loc>http://example.com/" in gzip.decompress((artifacts_storage / shard.file).read_bytes()).decode()
+
+
+@pytest.mark.django_db
+def test_artifacts_updated_on_save(
+    artifacts_storage, page_with_menu, many_posts, default_config, settings, django_capture_on_commit_callbacks
+):
+    settings.STORIES_ARTIFACTS_ON_SAVE = True
+    contents = sorted(
+        (content for content in many_posts if content.post.get_content("en")), key=lambda content: content.pk
+    )
+    with patch.object(StoriesSitemap, "limit", 2):
+        build_artifacts([default_config.namespace], ["en"])
+        shards = get_shards(default_config.namespace)
+        assert len(shards) == -(-len(contents) // 2)
+
+        # Only the shard of the post and the following ones are rebuilt
+        contents[-1].title = "Changed title"
+        spy = patch("djangocms_stories.artifacts.write_artifact", wraps=write_artifact)
+        with spy as write, django_capture_on_commit_callbacks(execute=True):
+            contents[-1].save()
+            contents[-1].post.save()
+        written = {call.args[0] for call in write.call_args_list}
+        assert written == {
+            get_sitemap_name(1, f"stories-{default_config.namespace}-en", len(shards)),
+            f"feed/1/{default_config.namespace}-en.xml",
+        }
+
+        # Removed posts shift the following shards
+        with django_capture_on_commit_callbacks(execute=True):
+            contents[0].post.delete()
+        remaining = get_shards(default_config.namespace)
+        assert len(remaining) == -(-(len(contents) - 1) // 2)
+        first = get_sitemap_name(1, f"stories-{default_config.namespace}-en", 1)
+        assert remaining[first] != shards[first]
@@ -0,0 +1,95 @@
+import threading
+import uuid
+from unittest.mock import Mock, patch
+
+from django.core.cache import cache
+
+from djangocms_stories.cache import (
+    CacheEntry,
+    acquire_lock,
+    get_or_compute,
+    needs_refresh,
+    release_lock,
+    set_entry,
+)
+
+
+def make_key():
+    return f"djangocms-stories:test:{uuid.uuid4().hex}"
+
+
+def test_get_or_compute_caches_value():
+    key = make_key()
+    compute = Mock(return_value=[1, 2, 3])
+
+    assert get_or_compute(key, compute, 60) == [1, 2, 3]
+    assert get_or_compute(key, compute, 60) == [1, 2, 3]
+
+    compute.assert_called_once()
+    assert acquire_lock(key)  # released after computing
+
+
+def test_get_or_compute_disabled():
+    key = make_key()
+    compute = Mock(return_value=1)
+
+    get_or_compute(key, compute, 0)
+    get_or_compute(key, compute, 0)
+
+    assert compute.call_count == 2
+    assert cache.get(key) is None
+
+
+def test_get_or_compute_stale_while_revalidate():
+    """Expired values are served while another process computes them"""
+    key = make_key()
+    set_entry(key, "old", -1)
+    compute = Mock(return_value="new")
+
+    assert acquire_lock(key)
+    assert get_or_compute(key, compute, 60) == "old"
+    compute.assert_not_called()
+
+    release_lock(key)
+    assert get_or_compute(key, compute, 60) == "new"
+    assert get_or_compute(key, compute, 60) == "new"
+    compute.assert_called_once()
+
+
+def test_get_or_compute_waits_for_lock():
+    """Readers missing a locked value wait for it instead of computing it"""
+    key = make_key()
+    compute = Mock(return_value="computed twice")
+    acquire_lock(key)
+    timer = threading.Timer(0.1, set_entry, (key, "computed", 60))
+    timer.start()
+
+    assert get_or_compute(key, compute, 60) == "computed"
+    timer.join()
+    compute.assert_not_called()
+
+
+def test_get_or_compute_lock_timeout(settings):
+    """The value is computed anyway when the lock is not released in time"""
+    settings.STORIES_CACHE_LOCK_TIMEOUT = 0.1
+    key = make_key()
+    acquire_lock(key)
+
+    assert get_or_compute(key, Mock(return_value="computed"), 60) == "computed"
+
+
+def test_needs_refresh_early_expiry(settings):
+    """Entries are recomputed before they expire, more likely when they are slow to compute"""
+    entry = CacheEntry("value", expires=1000.0, delta=10.0)
+    now = patch("djangocms_stories.cache.time.time", return_value=990.0)
+    random = patch("djangocms_stories.cache.random.random")
+
+    with now, random as random_mock:
+        random_mock.return_value = 0.5
+        assert not needs_refresh(entry)  # 990 + 10 * ln(2) < 1000
+        random_mock.return_value = 0.99
+        assert needs_refresh(entry)  # 990 + 10 * ln(100) > 1000
+        settings.STORIES_CACHE_EARLY_EXPIRY_BETA = 0
+        assert not needs_refresh(entry)
+
+    assert needs_refresh(CacheEntry("value", expires=0.0))
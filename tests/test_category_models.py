@@ -58,6 +58,114 @@ def test_post_category_hierarchy():
     assert parent.get_descendants() == expected_descendants
 
 
+@pytest.mark.django_db
+def test_post_category_hierarchy_queries(django_assert_num_queries):
+    from .factories import PostCategoryFactory
+
+    root = PostCategoryFactory(priority=1)
+    child = PostCategoryFactory(parent=root, app_config=root.app_config, priority=1)
+    grandchild = PostCategoryFactory(parent=child, app_config=root.app_config, priority=1)
+    leaf = PostCategoryFactory(parent=grandchild, app_config=root.app_config, priority=1)
+
+    with django_assert_num_queries(1):
+        assert root.get_descendants() == [child, grandchild, leaf]
+    with django_assert_num_queries(1):
+        assert leaf.get_ancestors() == [root, child, grandchild]
+    with django_assert_num_queries(1):
+        assert leaf.depth == 3
+    with django_assert_num_queries(1):
+        depths = {category.pk: category.depth for category in PostCategory.objects.with_depth()}
+    assert depths == {root.pk: 0, child.pk: 1, grandchild.pk: 2, leaf.pk: 3}
+    assert child.get_descendants(include_self=True) == [child, grandchild, leaf]
+    assert child.get_ancestors(include_self=True) == [root, child]
+
+
+@pytest.mark.django_db
+def test_post_category_hierarchy_move():
+    from .factories import PostCategoryFactory
+
+    root_1 = PostCategoryFactory()
+    root_2 = PostCategoryFactory()
+    child = PostCategoryFactory(parent=root_1)
+    grandchild = PostCategoryFactory(parent=child)
+
+    child.parent = root_2
+    child.save()
+
+    assert root_1.get_descendants() == []
+    assert root_2.get_descendants() == [child, grandchild]
+    assert grandchild.get_ancestors() == [root_2, child]
+
+    child.parent = None
+    child.save()
+
+    assert root_2.get_descendants() == []
+    assert grandchild.get_ancestors() == [child]
+
+    child.delete()
+    assert PostCategory.objects.descendants_of(root_2).count() == 0
+    assert not PostCategory.objects.filter(pk=grandchild.pk).exists()
+
+
+@pytest.mark.django_db
+def test_post_category_hierarchy_rebuild():
+    from djangocms_stories.models import PostCategoryClosure
+
+    from .factories import PostCategoryFactory
+
+    root = PostCategoryFactory()
+    child = PostCategoryFactory(parent=root)
+    grandchild = PostCategoryFactory(parent=child)
+    expected = set(PostCategoryClosure.objects.values_list("ancestor", "descendant", "depth"))
+    assert len(expected) == 6
+
+    PostCategoryClosure.objects.all().delete()
+    PostCategoryClosure.objects.rebuild()
+
+    assert set(PostCategoryClosure.objects.values_list("ancestor", "descendant", "depth")) == expected
+    assert grandchild.get_ancestors() == [root, child]
+
+
+@pytest.mark.django_db
+def test_post_category_parent_cycle():
+    from .factories import PostCategoryFactory
+
+    root = PostCategoryFactory()
+    child = PostCategoryFactory(parent=root, app_config=root.app_config)
+
+    root.parent = child
+    with pytest.raises(ValidationError):
+        root.clean()
+    root.parent = root
+    with pytest.raises(ValidationError):
+        root.clean()
+
+
+@pytest.mark.django_db
+def test_post_category_subtree_posts(default_config, django_assert_num_queries):
+    from djangocms_stories.models import Post
+
+    from .factories import PostCategoryFactory, PostFactory
+
+    root = PostCategoryFactory(app_config=default_config)
+    child = PostCategoryFactory(parent=root, app_config=default_config)
+    grandchild = PostCategoryFactory(parent=child, app_config=default_config)
+    other = PostCategoryFactory(app_config=default_config)
+    posts = PostFactory.create_batch(4, app_config=default_config)
+    posts[0].categories.set([root])
+    posts[1].categories.set([child, grandchild])
+    posts[2].categories.set([grandchild])
+    posts[3].categories.set([other])
+
+    assert set(Post.objects.in_category(root)) == set(posts[:3])
+    assert set(Post.objects.in_category(child)) == set(posts[1:3])
+    assert list(Post.objects.in_category(root, include_descendants=False)) == [posts[0]]
+    assert root.count == 1
+    with django_assert_num_queries(1):
+        assert root.subtree_count == 3
+    assert child.subtree_count == 2
+
+
 @pytest.mark.django_db
 def test_category_description():
     from .factories import PostCategoryFactory
@@ -74,3 +182,47 @@ def test_category_description():
     assert category.abstract == "<p>This is a <b>test</b> abstract.</p>"
     assert category.name == "Test Category"
     assert category.get_title() == "Test Category"
+
+
+@pytest.mark.django_db
+def test_post_category_with_post_counts(default_config, admin_user, django_assert_num_queries):
+    from django.contrib.sites.models import Site
+
+    from .factories import PostCategoryFactory, PostContentFactory, StoriesConfigFactory
+    from .utils import publish_if_necessary
+
+    site = Site.objects.get_current()
+    other_site = Site.objects.create(domain="other.example.com", name="other")
+    other_config = StoriesConfigFactory(namespace="other")
+    categories = PostCategoryFactory.create_batch(3, app_config=default_config)
+    other_category = PostCategoryFactory(app_config=other_config)
+    post_contents = PostContentFactory.create_batch(4, post__app_config=default_config)
+    french = PostContentFactory(post=post_contents[0].post, language="fr")
+    publish_if_necessary([french], admin_user)
+    for post_content in post_contents:
+        post_content.post.categories.set([categories[0], other_category])
+    post_contents[1].post.categories.add(categories[1])
+    post_contents[2].post.sites.add(other_site)
+    post_contents[3].post.sites.add(site)
+
+    with django_assert_num_queries(1):
+        counts = {
+            category.pk: (category.count, category.count_all_sites)
+            for category in PostCategory.objects.with_post_counts(site=site)
+        }
+    assert counts[categories[0].pk] == (3, 4)
+    assert counts[categories[1].pk] == (1, 1)
+    assert counts[categories[2].pk] == (0, 0)
+    assert counts[other_category.pk] == (0, 0)
+    for category in PostCategory.objects.filter(app_config=default_config):
+        assert counts[category.pk] == (category.count, category.count_all_sites)
+
+    qs = PostCategory.objects.with_post_counts(site=other_site, namespace=default_config.namespace)
+    assert {category.pk: category.count for category in qs if category in categories} == {
+        categories[0].pk: 3,
+        categories[1].pk: 1,
+        categories[2].pk: 0,
+    }
+    assert other_category not in qs
+    qs = PostCategory.objects.with_post_counts(site=site, language=french.language)
+    assert qs.get(pk=categories[0].pk).count == 1
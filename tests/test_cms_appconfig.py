@@ -3,10 +3,14 @@ from unittest.mock import Mock, patch
 import pytest
 from django.test import RequestFactory
 from django.urls import Resolver404
+from django.utils.translation import override
+
+from djangocms_stories.cache import bump_generation
 from djangocms_stories.models import StoriesConfig
 
 from djangocms_stories.cms_appconfig import (
     config_defaults,
+    config_registry,
     get_app_instance,
     get_namespace_from_request,
 )
@@ -47,18 +51,18 @@ def test_stories_config_schemaorg_type_property():
 @pytest.mark.django_db
 def test_stories_config_save_clears_menu_cache():
     config = StoriesConfig(**config_defaults, namespace="test")
-    with patch("menus.menu_pool.menu_pool.clear") as mock_clear:
+    with patch("djangocms_stories.cms_menus.schedule_menu_invalidation") as mock_schedule:
         config.save()
-        mock_clear.assert_called_once_with(all=True)
+        mock_schedule.assert_called_with("test")
 
 
 @pytest.mark.django_db
 def test_stories_config_delete_clears_menu_cache():
     config = StoriesConfig(**config_defaults, namespace="hero")
     config.save()
-    with patch("menus.menu_pool.menu_pool.clear") as mock_clear:
+    with patch("djangocms_stories.cms_menus.schedule_menu_invalidation") as mock_schedule:
         config.delete()
-        mock_clear.assert_called_once_with(all=True)
+        mock_schedule.assert_called_with("hero")
 
 
 # Tests for get_namespace_from_request function
@@ -174,7 +178,7 @@ def test_get_app_instance_without_current_page(simple_wo_placeholder):
     request = RequestFactory().get("/en/stories/")
 
     with patch("djangocms_stories.cms_appconfig.get_namespace_from_request") as mock_get_namespace:
-        with patch("djangocms_stories.cms_appconfig.StoriesConfig.objects.get") as mock_get_config:
+        with patch("djangocms_stories.cms_appconfig.config_registry.get") as mock_get_config:
             mock_get_namespace.return_value = "test-namespace"
             mock_get_config.return_value = simple_wo_placeholder
 
@@ -182,7 +186,7 @@ def test_get_app_instance_without_current_page(simple_wo_placeholder):
 
             assert namespace == "test-namespace"
             assert config == simple_wo_placeholder
-            mock_get_config.assert_called_once_with(namespace="test-namespace")
+            mock_get_config.assert_called_once_with("test-namespace")
 
 
 @pytest.mark.django_db
@@ -201,20 +205,21 @@ def test_get_app_instance_config_does_not_exist():
 
 
 @pytest.mark.django_db
-def test_get_app_instance_multiple_configs_returned(simple_wo_placeholder):
-    """Test get_app_instance when multiple configs match (should return None)"""
+def test_get_app_instance_reads_from_registry(simple_wo_placeholder, django_assert_num_queries):
+    """Test get_app_instance does not query the database once the registry is loaded"""
 
     request = RequestFactory().get("/en/stories/")
+    config_registry.get(simple_wo_placeholder.namespace)
 
     with patch("djangocms_stories.cms_appconfig.get_namespace_from_request") as mock_get_namespace:
-        with patch("djangocms_stories.cms_appconfig.StoriesConfig.objects.get") as mock_get_config:
-            mock_get_namespace.return_value = "duplicate-namespace"
-            mock_get_config.side_effect = StoriesConfig.MultipleObjectsReturned()
+        mock_get_namespace.return_value = simple_wo_placeholder.namespace
 
+        with django_assert_num_queries(0):
             namespace, config = get_app_instance(request)
+            assert config.app_title == simple_wo_placeholder.app_title
 
-            assert namespace == "duplicate-namespace"
-            assert config is None
+        assert namespace == simple_wo_placeholder.namespace
+        assert config == simple_wo_placeholder
 
 
 @pytest.mark.django_db
@@ -280,3 +285,64 @@ def test_get_app_instance_resolver404_during_namespace_retrieval():
         # Should handle the 404 gracefully
         assert namespace is None
         assert config is None
+
+
+@pytest.mark.django_db
+def test_config_registry_lookups(simple_wo_placeholder, simple_w_placeholder, django_assert_num_queries):
+    """Configurations are loaded once, with their translations"""
+    simple_wo_placeholder.set_current_language("it")
+    simple_wo_placeholder.app_title = "Storie"
+    simple_wo_placeholder.save()
+    config_registry.clear()
+
+    with django_assert_num_queries(2):
+        assert config_registry.get(simple_wo_placeholder.namespace) == simple_wo_placeholder
+    with django_assert_num_queries(0):
+        assert config_registry.get_by_pk(simple_w_placeholder.pk) == simple_w_placeholder
+        assert config_registry.all() == sorted(
+            [simple_w_placeholder, simple_wo_placeholder], key=lambda config: config.namespace
+        )
+        assert config_registry.get("unknown") is None
+        assert config_registry.get_by_pk(0) is None
+        with override("it"):
+            assert config_registry.get(simple_wo_placeholder.namespace).app_title == "Storie"
+        with override("en"):
+            assert config_registry.get(simple_wo_placeholder.namespace).app_title == "Test Stories Without Placeholder"
+
+
+@pytest.mark.django_db
+def test_config_registry_returns_copies(simple_wo_placeholder):
+    config = config_registry.get(simple_wo_placeholder.namespace)
+    config.paginate_by = 1000
+    config.app_title = "Changed"
+    config.translations.all()[0].object_name = "Changed"
+
+    registered = config_registry.get(simple_wo_placeholder.namespace)
+    assert registered.paginate_by == simple_wo_placeholder.paginate_by
+    assert registered.app_title == simple_wo_placeholder.app_title
+    assert "Changed" not in [translation.object_name for translation in registered.translations.all()]
+
+
+@pytest.mark.django_db
+def test_config_registry_invalidation(simple_wo_placeholder):
+    """Saving or deleting a configuration is seen by all the processes sharing the cache"""
+    config_registry.get(simple_wo_placeholder.namespace)
+
+    simple_wo_placeholder.paginate_by = 3
+    simple_wo_placeholder.save()
+    assert config_registry.get(simple_wo_placeholder.namespace).paginate_by == 3
+
+    simple_wo_placeholder.set_current_language("en")
+    simple_wo_placeholder.app_title = "New title"
+    simple_wo_placeholder.save_translations()
+    with override("en"):
+        assert config_registry.get(simple_wo_placeholder.namespace).app_title == "New title"
+
+    # Changes made by another process
+    StoriesConfig.objects.filter(pk=simple_wo_placeholder.pk).update(paginate_by=4)
+    assert config_registry.get(simple_wo_placeholder.namespace).paginate_by == 3
+    bump_generation(config_registry.generation_name)
+    assert config_registry.get(simple_wo_placeholder.namespace).paginate_by == 4
+
+    simple_wo_placeholder.delete()
+    assert config_registry.get(simple_wo_placeholder.namespace) is None
@@ -10,17 +10,31 @@ Tests cover:
 
 import xml.etree.ElementTree as ET
 from datetime import timedelta
+from io import StringIO
 from unittest.mock import Mock, patch
 
 import pytest
 from django.apps import apps
 from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import RequestFactory
 from django.urls import reverse
 from django.utils import timezone
-
-from djangocms_stories.feeds import FBInstantArticles, FBInstantFeed, LatestEntriesFeed, TagFeed
+from django.utils.translation import override
+
+from djangocms_stories import feeds
+from djangocms_stories.cache import acquire_lock
+from djangocms_stories.feeds import (
+    FBInstantArticles,
+    FBInstantFeed,
+    LatestEntriesFeed,
+    TagFeed,
+    _submit_warm,
+    warm_instant_articles,
+)
 from djangocms_stories.models import Post, StoriesConfig
+from djangocms_stories.utils import get_site_request
 
 
 # Tests for LatestEntriesFeed
@@ -372,6 +386,7 @@ def test_fb_instant_articles_items(page_with_menu):
         post_content1.versions.first().publish(user=post_content1.versions.first().created_by)
         post_content2.versions.first().publish(user=post_content2.versions.first().created_by)
         post_content3.versions.first().publish(user=post_content3.versions.first().created_by)
+    warm_instant_articles([post1, post2, post3], ["en"], workers=1)
 
     with patch("djangocms_stories.feeds.get_app_instance") as mock_get_app:
         mock_get_app.return_value = (app_config.namespace, app_config)
@@ -696,3 +711,184 @@ def test_feed_with_no_posts(client, page_with_menu):
 
     items = channel.findall("item")
     assert len(items) == 0
+
+
+# Instant Articles pre-rendering
+
+
+@pytest.fixture
+def instant_posts(page_with_menu):
+    app_config = StoriesConfig.objects.get(namespace=page_with_menu.application_namespace)
+    posts = Post.objects.filter(app_config=app_config).with_contents().order_by("-date_modified")
+    return app_config, [post for post in posts if post.get_content("en")]
+
+
+def get_instant_feed(app_config):
+    request = RequestFactory().get(f"/{app_config.namespace}/feed/fb/")
+    request.user = Mock(is_authenticated=False)
+    with patch("djangocms_stories.feeds.get_app_instance", return_value=(app_config.namespace, app_config)):
+        feed = FBInstantArticles()
+        feed(request)
+    return feed
+
+
+@pytest.mark.django_db
+def test_warm_instant_articles(instant_posts):
+    _, posts = instant_posts
+    post = posts[0]
+
+    assert warm_instant_articles([post], ["en"], workers=1) == 1
+
+    content = cache.get(post.get_cache_key("en", "feed")).value
+    assert b"op:markup_version" in content
+    assert post.safe_translation_getter("title", language_code="en").encode() in content
+
+
+@pytest.mark.django_db
+def test_fb_instant_articles_never_render(instant_posts, settings):
+    """Posts without a rendered article are left out of the feed and rendered in the background"""
+    app_config, posts = instant_posts
+    settings.STORIES_FEED_WARM_ON_SAVE = True
+    warm_instant_articles(posts[:1], ["en"], workers=1)
+
+    schedule_patch = patch("djangocms_stories.feeds.schedule_instant_articles")
+    view_patch = patch("djangocms_stories.feeds.PostDetailView.as_view")
+    with schedule_patch as schedule, view_patch as view:
+        feed = get_instant_feed(app_config)
+        items = feed.items()
+    view.assert_not_called()
+    assert items == posts[:1]
+    schedule.assert_called_with([post.pk for post in posts[1:]], ["en"])
+    assert b"op:markup_version" in feed.item_extra_kwargs(items[0])["content"]
+
+
+@pytest.mark.django_db
+def test_fb_instant_articles_stale(instant_posts, settings):
+    """Expired articles are listed while they are rendered again, articles being rendered are skipped"""
+    app_config, posts = instant_posts
+    settings.STORIES_FEED_WARM_ON_SAVE = True
+    settings.STORIES_FEED_CACHE_TIMEOUT = -1
+    warm_instant_articles(posts[:1], ["en"], workers=1)
+
+    with patch("djangocms_stories.feeds.schedule_instant_articles") as schedule:
+        items = get_instant_feed(app_config).items()
+    assert items == posts[:1]
+    assert posts[0].pk in schedule.call_args[0][0]
+
+    with override("en"):
+        acquire_lock(posts[0].get_cache_key("en", "feed"))
+    assert warm_instant_articles(posts[:2], ["en"], workers=1) == 1
+
+
+@pytest.mark.django_db
+def test_fb_instant_articles_not_rendered_by_feed(instant_posts, settings):
+    """Without background rendering, the feed lists the cached articles, the stale ones included"""
+    app_config, posts = instant_posts
+    settings.STORIES_FEED_CACHE_TIMEOUT = -1
+    warm_instant_articles(posts[:1], ["en"], workers=1)
+
+    render_patch = patch("djangocms_stories.feeds.render_instant_article")
+    warm_patch = patch("djangocms_stories.feeds.warm_instant_articles")
+    schedule_patch = patch("djangocms_stories.feeds.schedule_instant_articles")
+    with render_patch as render, warm_patch as warm, schedule_patch as schedule:
+        items = get_instant_feed(app_config).items()
+    render.assert_not_called()
+    warm.assert_not_called()
+    schedule.assert_not_called()
+    assert items == posts[:1]
+    assert b"op:markup_version" in items[0].instant_article
+
+
+@pytest.mark.django_db
+def test_render_instant_article_site_url(instant_posts, settings):
+    """Articles are rendered for the domain and scheme of the current site"""
+    _, posts = instant_posts
+    settings.STORIES_SITE_PROTOCOL = "https"
+    site = Site.objects.get_current()
+
+    with override("en"):
+        request = get_site_request(posts[0].get_absolute_url("en"), "en")
+    assert request.build_absolute_uri("/") == f"https://{site.domain}/"
+    assert request.is_secure()
+
+
+def _fail_warm(job):
+    raise ValueError("failed")
+
+
+def test_instant_articles_warm_failure_logged(caplog):
+    with patch("djangocms_stories.feeds._warm_in_background", _fail_warm):
+        _submit_warm(((0,), ("en",)))
+        feeds._warm_executor.shutdown(wait=True)
+        feeds._warm_executor = None
+    feeds._warm_pending.clear()
+    assert "Rendering the Instant Articles failed" in caplog.text
+
+
+@pytest.mark.django_db
+def test_instant_articles_warmed_on_save(instant_posts, django_capture_on_commit_callbacks, settings):
+    _, posts = instant_posts
+    settings.STORIES_FEED_WARM_ON_SAVE = True
+
+    with patch("djangocms_stories.feeds._submit_warm") as submit, django_capture_on_commit_callbacks(execute=True):
+        posts[0].save()
+    submit.assert_called_once_with(((posts[0].pk,), ()))
+
+    # The previous article is served until it is rendered again
+    settings.STORIES_FEED_WARM_ON_SAVE = False
+    warm_instant_articles(posts[:1], ["en"], workers=1)
+    with django_capture_on_commit_callbacks() as callbacks:
+        posts[0].save()
+    assert not callbacks
+    with override("en"):
+        assert cache.get(posts[0].get_cache_key("en", "feed")) is not None
+
+
+@pytest.mark.django_db
+def test_warm_feeds_command(instant_posts):
+    app_config, posts = instant_posts
+    out = StringIO()
+
+    with patch("djangocms_stories.feeds.render_instant_article", return_value=b"<html></html>") as render:
+        call_command("stories_warm_feeds", namespace=[app_config.namespace], language=["en"], workers=1, stdout=out)
+
+    assert out.getvalue() == f"Rendered {len(posts)} instant articles\n"
+    assert render.call_count == len(posts)
+    assert len(get_instant_feed(app_config).items()) == len(posts)
+
+
+@pytest.mark.django_db
+def test_feed_conditional_get(client, instant_posts, settings):
+    """Feed readers polling an unchanged feed get a 304, without the feed being built"""
+    app_config, posts = instant_posts
+    url = reverse(f"{app_config.namespace}:posts-latest-feed")
+
+    response = client.get(url)
+    etag = response["ETag"]
+
+    with patch.object(LatestEntriesFeed, "get_feed") as get_feed:
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    get_feed.assert_not_called()
+
+    posts[0].save()
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    # Articles rendered in the background change the feed
+    settings.STORIES_FEED_WARM_ON_SAVE = True
+    fb_url = reverse(f"{app_config.namespace}:posts-latest-feed-fb")
+    etag = client.get(fb_url)["ETag"]
+    assert client.get(fb_url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    warm_instant_articles(posts[:1], ["en"], workers=1)
+    assert client.get(fb_url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+@pytest.mark.django_db
+def test_fb_instant_articles_items_once(instant_posts):
+    """The feed items are computed once for the validators and the feed"""
+    app_config, _ = instant_posts
+
+    with patch.object(FBInstantArticles, "_get_items", autospec=True, return_value=[]) as get_items:
+        feed = get_instant_feed(app_config)
+    assert get_items.call_count == 1
+    assert not hasattr(feed.request, "_stories_instant_articles")
@@ -11,12 +11,16 @@ Tests cover:
 All tests use actual database queries with fixtures for realistic scenarios.
 """
 
+from datetime import timedelta
+from io import StringIO
+
 import pytest
 from django.contrib.sites.models import Site
+from django.core.management import call_command
 from django.db import models
 from taggit.models import Tag
 
-from djangocms_stories.models import Post, PostContent
+from djangocms_stories.models import Post, PostContent, PostMonthCount
 
 
 @pytest.mark.django_db
@@ -128,6 +132,60 @@ class TestTaggedFilterItem:
         # Should not raise an error
         assert isinstance(cloud, list)
 
+    def test_tag_cloud_single_query(self, page_with_menu, many_posts, django_assert_num_queries):
+        """Test tag_cloud counts tags in one query and caches the result"""
+        for i, post_content in enumerate(many_posts[:5]):
+            post_content.post.tags.add("all-posts", *[f"tag-{j}" for j in range(i)])
+        Post.objects.tag_cloud()  # Warm up the content type cache
+
+        many_posts[0].post.tags.add("one-post")
+        with django_assert_num_queries(1):
+            cloud = Post.objects.tag_cloud()
+        with django_assert_num_queries(0):
+            assert Post.objects.tag_cloud() == cloud
+
+        assert [(tag.name, tag.count) for tag in cloud[:4]] == [
+            ("all-posts", 5),
+            ("tag-0", 4),
+            ("tag-1", 3),
+            ("tag-2", 2),
+        ]
+        assert [tag.name for tag in Post.objects.tag_cloud(limit=2)] == ["all-posts", "tag-0"]
+
+    def test_tag_cloud_scope(self, page_with_menu, many_posts, default_config):
+        """Test tag_cloud only counts posts of the given queryset and site"""
+        from .factories import PostContentFactory, StoriesConfigFactory
+
+        other_site = Site.objects.create(domain="other.example.com", name="other")
+        other_post = PostContentFactory(post__app_config=StoriesConfigFactory(namespace="other")).post
+        other_post.tags.add("shared", "other")
+        for post_content in many_posts[:3]:
+            post_content.post.tags.add("shared")
+        many_posts[0].post.sites.add(other_site)
+
+        queryset = Post.objects.filter(app_config=default_config)
+        cloud = Post.objects.tag_cloud(queryset=queryset, published=False)
+        assert [(tag.name, tag.count) for tag in cloud] == [("shared", 3)]
+        cloud = Post.objects.tag_cloud(queryset=queryset, site=Site.objects.get_current(), published=False)
+        assert [(tag.name, tag.count) for tag in cloud] == [("shared", 2)]
+        assert Post.objects.tag_cloud(queryset=queryset.none()) == []
+
+    def test_tag_cloud_invalidation(self, page_with_menu, many_posts):
+        """Test cached tag clouds are invalidated when tags change"""
+        post = many_posts[0].post
+        post.tags.add("first")
+        assert [tag.name for tag in Post.objects.tag_cloud()] == ["first"]
+
+        post.tags.add("second")
+        assert {tag.name for tag in Post.objects.tag_cloud()} == {"first", "second"}
+
+        post.tags.remove("first")
+        assert [tag.name for tag in Post.objects.tag_cloud()] == ["second"]
+
+        Tag.objects.filter(name="second").update(name="renamed")
+        Tag.objects.get(name="renamed").save()
+        assert [tag.name for tag in Post.objects.tag_cloud()] == ["renamed"]
+
 
 @pytest.mark.django_db
 class TestSiteQuerySet:
@@ -278,6 +336,147 @@ class TestGenericDateTaggedManager:
         assert len(months) >= 1
 
 
+@pytest.mark.django_db
+class TestPostMonthCount:
+    """Test the persisted monthly post counts used by the archive plugin"""
+
+    def test_get_months_limit(self):
+        """Test get_months only returns the last months when requested"""
+        from datetime import timedelta
+
+        from django.utils.timezone import now
+
+        from tests.factories import PostFactory, StoriesConfigFactory
+
+        config = StoriesConfigFactory()
+        for days in (0, 70, 400):
+            PostFactory(app_config=config, date_featured=now() - timedelta(days=days))
+        site = Site.objects.get_current()
+
+        assert len(Post.objects.get_months()) == 3
+        assert len(Post.objects.get_months(months=4)) == 2
+        assert len(PostMonthCount.objects.get_months(config, site)) == 3
+        assert len(PostMonthCount.objects.get_months(config, site, months=4)) == 2
+
+    def test_counts_match_get_months(self, page_with_menu, many_posts, default_config, django_assert_num_queries):
+        """Test the persisted counts are the same as the computed ones"""
+        site = Site.objects.get_current()
+        other_site = Site.objects.create(domain="other.example.com", name="other")
+        many_posts[0].post.sites.add(other_site)
+        many_posts[1].post.sites.add(site, other_site)
+        many_posts[2].post.date_featured = many_posts[3].post.date_featured
+        many_posts[2].post.save()
+
+        for current_site in (site, other_site):
+            queryset = Post.objects.filter(app_config=default_config)
+            expected = Post.objects.get_months(queryset=queryset, site=current_site)
+            with django_assert_num_queries(1):
+                assert PostMonthCount.objects.get_months(default_config, current_site) == expected
+
+    def test_counts_updated(self):
+        """Test the counts follow post changes"""
+        from datetime import datetime, timezone
+
+        from tests.factories import PostFactory, StoriesConfigFactory
+
+        default_config = StoriesConfigFactory()
+        site = Site.objects.get_current()
+        other_site = Site.objects.create(domain="other.example.com", name="other")
+        january = datetime(2024, 1, 10, tzinfo=timezone.utc)
+        post = PostFactory(app_config=default_config, date_featured=january)
+        PostFactory(app_config=default_config, date_featured=january)
+
+        def months(current_site=site):
+            return [
+                (month["date"].isoformat(), month["count"])
+                for month in PostMonthCount.objects.get_months(default_config, current_site)
+            ]
+
+        assert months() == [("2024-01-01", 2)]
+
+        post.date_featured = datetime(2024, 3, 10, tzinfo=timezone.utc)
+        post.save()
+        assert months() == [("2024-03-01", 1), ("2024-01-01", 1)]
+
+        post.sites.add(other_site)
+        assert months() == [("2024-01-01", 1)]
+        assert months(other_site) == [("2024-03-01", 1), ("2024-01-01", 1)]
+
+        other_site.post_set.clear()
+        assert months() == [("2024-03-01", 1), ("2024-01-01", 1)]
+
+        post.delete()
+        assert months() == [("2024-01-01", 1)]
+
+    def test_rebuild(self, page_with_menu, many_posts):
+        """Test the counts can be rebuilt from scratch"""
+        expected = set(PostMonthCount.objects.values_list("app_config", "site", "month", "count"))
+        assert expected
+
+        PostMonthCount.objects.all().delete()
+        PostMonthCount.objects.rebuild()
+
+        assert set(PostMonthCount.objects.values_list("app_config", "site", "month", "count")) == expected
+
+
+@pytest.mark.django_db
+class TestPostQuerySetWithContents:
+    """Test bulk loading of post contents with PostQuerySet.with_contents"""
+
+    def test_with_contents_fills_caches(self, page_with_menu, many_posts, admin_user):
+        """Test contents and languages are available without further queries"""
+        from tests.utils import assert_num_queries, publish_if_necessary
+
+        publish_if_necessary(many_posts[5:], admin_user)
+        with assert_num_queries(2):
+            posts = list(Post.objects.filter(pk__in=[pc.post.pk for pc in many_posts]).with_contents(["en", "fr"]))
+
+        with assert_num_queries(0):
+            for post in posts:
+                assert post.get_available_languages() == ["en"]
+                assert post.get_content("en").post is post
+                assert post.safe_translation_getter("title", language_code="en") == post.get_content("en").title
+                assert post.get_content("fr") is None
+
+    def test_with_contents_constant_queries(self, page_with_menu, many_posts, admin_user):
+        """Test the number of queries does not depend on the number of posts"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        def count_queries(queryset):
+            with CaptureQueriesContext(connection) as ctx:
+                for post in queryset.with_contents(["en"], draft=True):
+                    post.safe_translation_getter("title", language_code="en", show_draft_content=True)
+                    post.safe_translation_getter("slug", any_language=True, show_draft_content=True)
+            return len(ctx)
+
+        assert count_queries(Post.objects.filter(pk=many_posts[0].post.pk)) == count_queries(Post.objects.all())
+
+    def test_with_contents_draft(self, page_with_menu, many_posts):
+        """Test draft contents are loaded for unpublished posts"""
+        post_content = many_posts[-1]
+        post = Post.objects.with_contents(draft=True).get(pk=post_content.post.pk)
+
+        assert post.get_content(show_draft_content=True) == post_content
+
+    def test_with_contents_survives_chaining(self, page_with_menu, many_posts):
+        """Test the setting is kept when filtering and slicing the queryset"""
+        queryset = Post.objects.with_contents(["en", "fr"]).filter(app_config__isnull=False).order_by("pk")[:3]
+
+        assert queryset._content_languages == ["en", "fr"]
+        assert all("en_public" in post._content_cache for post in queryset)
+
+    def test_prefetched_postcontent_set(self, page_with_menu, many_posts):
+        """Test get_content uses a prefetch_related("postcontent_set")"""
+        from tests.utils import assert_num_queries
+
+        posts = list(Post.objects.prefetch_related("postcontent_set"))
+        with assert_num_queries(0):
+            for post in posts:
+                post.get_available_languages()
+                post.get_content("en")
+
+
 @pytest.mark.django_db
 class TestAdminDateTaggedManager:
     """Test AdminDateTaggedManager admin-specific methods"""
@@ -302,6 +501,58 @@ class TestAdminDateTaggedManager:
         assert hasattr(PostContent.admin_manager, "filter")
 
 
+@pytest.mark.django_db
+class TestSyncPosts:
+    """Test the post fields copied on the post contents"""
+
+    def test_contents_follow_post(self, page_with_menu, many_posts):
+        content = many_posts[0]
+        post = content.post
+        assert (content.date_published, content.app_config_id, content.all_sites) == (
+            post.date_published,
+            post.app_config_id,
+            True,
+        )
+
+        post.date_published = post.date_published - timedelta(days=30)
+        post.date_featured = post.date_published
+        post.save()
+        content.refresh_from_db()
+        assert content.date_published == post.date_published
+        assert content.date_featured == post.date_published
+
+        site = Site.objects.get_current()
+        other = Site.objects.create(domain="other.example.com", name="Other")
+        post.sites.add(other)
+        content.refresh_from_db()
+        assert not content.all_sites
+        assert not PostContent.objects.all().on_site(site).filter(pk=content.pk).exists()
+        assert PostContent.objects.all().on_site(other).filter(pk=content.pk).count() == 1
+
+        other.post_set.clear()
+        content.refresh_from_db()
+        assert content.all_sites
+
+    def test_sync_posts(self, page_with_menu, many_posts):
+        post = many_posts[0].post
+        Post.objects.filter(pk=post.pk).update(date_published=None)
+
+        assert PostContent.admin_manager.sync_posts([post.pk]) == post.postcontent_set(manager="admin_manager").count()
+        assert not PostContent.admin_manager.filter(post=post, date_published__isnull=False).exists()
+
+    def test_sync_post_contents_command(self, page_with_menu, many_posts):
+        """Contents loaded without their copies are synced by the command"""
+        PostContent.admin_manager.update(app_config=None, date_published=None)
+        out = StringIO()
+
+        call_command("stories_sync_post_contents", stdout=out)
+
+        assert out.getvalue() == f"Updated {PostContent.admin_manager.count()} post contents\n"
+        assert not PostContent.admin_manager.filter(app_config=None).exists()
+        for content in PostContent.admin_manager.select_related("post"):
+            assert content.date_published == content.post.date_published
+
+
 @pytest.mark.django_db
 class TestManagerIntegration:
     """Integration tests for manager interactions"""
@@ -4,7 +4,7 @@ from django.contrib.auth.models import AnonymousUser
 from django.test import RequestFactory
 
 from djangocms_blog.settings import MENU_TYPE_CATEGORIES, MENU_TYPE_NONE
-from djangocms_stories.cms_menus import PostCategoryMenu, PostCategoryNavModifier
+from djangocms_stories.cms_menus import PostCategoryNavModifier
 
 
 @pytest.mark.django_db
@@ -57,9 +57,8 @@ def test_menu_configs(page_with_menu, default_config):
     request.user = AnonymousUser()
 
     # Set the menu type category
-    for menu in menu_pool.menus.values():
-        if issubclass(menu, PostCategoryMenu):
-            menu._config[default_config.namespace].menu_structure = MENU_TYPE_CATEGORIES
+    default_config.menu_structure = MENU_TYPE_CATEGORIES
+    default_config.save()
 
     # Clear all caches
     menu_pool.clear(all=True)
@@ -69,9 +68,8 @@ def test_menu_configs(page_with_menu, default_config):
     assert len(nodes) == 2  # Only the category and the page should be present
 
     # Set the menu type category
-    for menu in menu_pool.menus.values():
-        if issubclass(menu, PostCategoryMenu):
-            menu._config[default_config.namespace].menu_structure = MENU_TYPE_NONE
+    default_config.menu_structure = MENU_TYPE_NONE
+    default_config.save()
 
     # Clear all caches
     menu_pool.clear(all=True)
@@ -79,3 +77,188 @@ def test_menu_configs(page_with_menu, default_config):
     renderer = menu_pool.get_renderer(request)
     nodes = renderer.get_nodes(request)
     assert len(nodes) == 1  # Only the page should be present
+
+
+@pytest.mark.django_db
+def test_menu_nodes_urls(page_with_menu, many_posts, default_config):
+    """Nodes are built in bulk, with the same urls as the models"""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from django.utils.translation import override
+    from menus.menu_pool import menu_pool
+
+    from djangocms_stories.cms_appconfig import config_registry
+    from djangocms_stories.cms_menus import PostCategoryMenu
+    from djangocms_stories.models import PostCategory
+
+    request = RequestFactory().get(page_with_menu.get_absolute_url())
+    request.user = AnonymousUser()
+    category = PostCategory.objects.get(translations__slug="test-category")
+    child = PostCategory.objects.create(
+        name="Child", slug="child-category", parent=category, app_config=default_config
+    )
+    many_posts[0].post.categories.add(child)
+
+    menu = PostCategoryMenu(menu_pool.get_renderer(request))
+    menu.instance = page_with_menu
+    config_registry.get(default_config.namespace)
+    with override("en"), CaptureQueriesContext(connection) as ctx:
+        nodes = menu.get_nodes(request)
+    stories_queries = [query for query in ctx.captured_queries if "djangocms_stories" in query["sql"]]
+    # Posts, post categories, categories and their translations
+    assert len(stories_queries) <= 4
+
+    by_id = {node.id: node for node in nodes}
+    with override("en"):
+        assert by_id[f"PostCategory-{category.pk}"].get_absolute_url() == category.get_absolute_url()
+        assert by_id[f"PostCategory-{child.pk}"].parent_id == f"PostCategory-{category.pk}"
+        for content in many_posts:
+            node = by_id.get(f"PostContent-{content.pk}")
+            if node:
+                assert node.get_absolute_url() == content.get_absolute_url("en")
+                assert node.parent_id == f"PostCategory-{category.pk}"
+    assert len([node for node in nodes if node.id.startswith("PostContent-")]) == len(
+        [content for content in many_posts if content.post.get_content("en")]
+    )
+
+
+def _published_contents(contents):
+    return [content for content in contents if content.post.get_content("en")]
+
+
+@pytest.mark.django_db
+def test_menu_posts_limit(page_with_menu, many_posts, default_config):
+    """Only the latest posts of each category or month are listed"""
+    from django.urls import reverse
+    from django.utils.timezone import localtime
+    from django.utils.translation import override
+    from menus.menu_pool import menu_pool
+
+    from djangocms_stories.cms_menus import PostCategoryMenu
+    from djangocms_stories.settings import MENU_POSTS_BY_DATE
+
+    request = RequestFactory().get(page_with_menu.get_absolute_url())
+    request.user = AnonymousUser()
+    published = sorted(_published_contents(many_posts), key=lambda content: content.post.date_published)
+    default_config.menu_posts_limit = 3
+    default_config.save()
+
+    menu = PostCategoryMenu(menu_pool.get_renderer(request))
+    menu.instance = page_with_menu
+    with override("en"):
+        nodes = menu.get_nodes(request)
+    post_nodes = [node.id for node in nodes if node.id.startswith("PostContent-")]
+    assert sorted(post_nodes) == sorted(f"PostContent-{content.pk}" for content in published[-3:])
+
+    default_config.menu_posts_grouping = MENU_POSTS_BY_DATE
+    default_config.menu_posts_limit = 1
+    default_config.save()
+    with override("en"):
+        nodes = menu.get_nodes(request)
+    by_id = {node.id: node for node in nodes}
+    months = {}
+    for content in published:
+        months[f"{localtime(content.post.date_published):%Y-%m}"] = content
+    for month, content in months.items():
+        assert by_id[f"PostArchive-{month}"].parent_id == f"PostArchive-{month[:4]}"
+        assert by_id[f"PostContent-{content.pk}"].parent_id == f"PostArchive-{month}"
+        kwargs = {"year": int(month[:4]), "month": int(month[5:])}
+        with override("en"):
+            url = reverse(f"{default_config.namespace}:posts-archive", kwargs=kwargs)
+        assert by_id[f"PostArchive-{month}"].get_absolute_url() == url
+    assert len([node for node in nodes if node.id.startswith("PostContent-")]) == len(months)
+
+
+@pytest.mark.django_db
+def test_menu_posts_current_branch(page_with_menu, many_posts, default_config):
+    """Post nodes are only added to the category being viewed, and are not cached"""
+    from django.utils.translation import override
+    from menus.menu_pool import menu_pool
+
+    from djangocms_stories.models import PostCategory
+    from djangocms_stories.settings import get_setting
+
+    category = PostCategory.objects.get(translations__slug="test-category")
+    published = _published_contents(many_posts)
+    default_config.menu_posts_current_branch = True
+    default_config.menu_posts_limit = 2
+    default_config.save()
+    menu_pool.clear(all=True)
+
+    def get_nodes(path, current=None):
+        request = RequestFactory().get(path)
+        request.user = AnonymousUser()
+        if current:
+            setattr(request, get_setting("CURRENT_POST_IDENTIFIER"), current)
+        with override("en"):
+            return {node.id: node for node in menu_pool.get_renderer(request).get_nodes(request)}
+
+    nodes = get_nodes(page_with_menu.get_absolute_url())
+    assert f"PostCategory-{category.pk}" in nodes
+    assert not [node_id for node_id in nodes if str(node_id).startswith("PostContent-")]
+
+    with override("en"):
+        category_url = category.get_absolute_url()
+    nodes = get_nodes(category_url)
+    category_node = nodes[f"PostCategory-{category.pk}"]
+    assert category_node.selected
+    post_nodes = [node for node_id, node in nodes.items() if str(node_id).startswith("PostContent-")]
+    assert len(post_nodes) == 2
+    assert category_node.children[-2:] == post_nodes
+    assert all(node.parent is category_node and node.descendant for node in post_nodes)
+
+    latest = max(published, key=lambda content: content.post.date_published)
+    with override("en"):
+        nodes = get_nodes(latest.get_absolute_url(), current=latest)
+    node = nodes[f"PostContent-{latest.pk}"]
+    assert node.selected
+    assert nodes[f"PostCategory-{category.pk}"].ancestor
+
+    nodes = get_nodes(page_with_menu.get_absolute_url())
+    assert not [node_id for node_id in nodes if str(node_id).startswith("PostContent-")]
+
+
+@pytest.mark.django_db
+def test_menu_cache_invalidation(page_with_menu, many_posts, default_config, django_capture_on_commit_callbacks):
+    """Changes clear the menus of the apphook pages of the config only, once per transaction"""
+    import contextlib
+    from unittest.mock import call, patch
+
+    from cms.models import PageContent
+    from django.db import DatabaseError, transaction
+
+    from djangocms_stories.cms_menus import _flush_menu_caches
+    from djangocms_stories.models import PostCategory
+
+    # The fixtures changes are pending until the test transaction is committed, which never happens
+    _flush_menu_caches()
+    category = PostCategory.objects.get(translations__slug="test-category")
+    languages = set(PageContent.admin_manager.filter(page=page_with_menu).values_list("language", flat=True))
+    expected = [call(site_id=page_with_menu.site_id, language=language) for language in sorted(languages)]
+
+    clear = patch("menus.menu_pool.menu_pool.clear")
+    with (
+        clear as mock_clear,
+        django_capture_on_commit_callbacks(execute=True) as callbacks,
+        transaction.atomic(),
+    ):
+        many_posts[0].save()
+        many_posts[1].post.save()
+        many_posts[2].post.categories.remove(category)
+        category.save()
+        default_config.save()
+    assert sorted(mock_clear.call_args_list, key=lambda item: item.kwargs["language"]) == expected
+    assert len(callbacks) == 1
+
+    # Rolled back changes do not prevent the flush of the next ones
+    with clear as mock_clear, django_capture_on_commit_callbacks(execute=True):
+        with contextlib.suppress(DatabaseError), transaction.atomic():
+            category.save()
+            raise DatabaseError
+        category.save()
+    assert sorted(mock_clear.call_args_list, key=lambda item: item.kwargs["language"]) == expected
+
+    with clear as mock_clear, django_capture_on_commit_callbacks(execute=True):
+        PostCategory.objects.create(name="Other", slug="other")
+    # Categories without config are shown in all the stories menus
+    assert sorted(mock_clear.call_args_list, key=lambda item: item.kwargs["language"]) == expected
@@ -0,0 +1,193 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from django.core.paginator import EmptyPage, InvalidPage
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from djangocms_stories.models import PostContent
+from djangocms_stories.pagination import CursorPaginator, EstimatedCountPaginator, get_planner_estimate
+
+from .utils import publish_if_necessary
+
+
+@pytest.fixture
+def dated_posts(default_config, admin_user):
+    from .factories import PostContentFactory
+
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    dates = [start + timedelta(days=i // 2) for i in range(9)] + [None, None]  # pairs of posts share a date
+    post_contents = [PostContentFactory(post__app_config=default_config, post__date_published=date) for date in dates]
+    publish_if_necessary(post_contents, admin_user)
+    return post_contents
+
+
+def walk(paginator):
+    """Returns the pages walking forward, then the pages walking backward from the last one"""
+    forward = [paginator.page()]
+    while forward[-1].has_next():
+        forward.append(paginator.page(forward[-1].next_cursor))
+    backward = [forward[-1]]
+    while backward[-1].has_previous():
+        backward.append(paginator.page(backward[-1].previous_cursor))
+    return forward, backward[::-1]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("per_page", [1, 2, 3, 4, 11, 20])
+def test_cursor_paginator_walk(dated_posts, per_page):
+    """Pages follow the (date_published, pk) ordering, forward and backward"""
+    queryset = PostContent.admin_manager.filter(pk__in=[post_content.pk for post_content in dated_posts])
+    expected = sorted(
+        dated_posts,
+        key=lambda post_content: (
+            post_content.post.date_published is not None,
+            post_content.post.date_published or datetime.min.replace(tzinfo=timezone.utc),
+            post_content.pk,
+        ),
+        reverse=True,
+    )
+
+    forward, backward = walk(CursorPaginator(queryset.select_related("post"), per_page))
+
+    assert [obj for page in forward for obj in page] == expected
+    assert [[obj.pk for obj in page] for page in backward] == [[obj.pk for obj in page] for page in forward]
+    assert all(len(page) == per_page for page in forward[:-1])
+    assert not forward[0].has_previous()
+    assert forward[0].has_other_pages() == (len(forward) > 1)
+
+
+@pytest.mark.django_db
+def test_cursor_paginator_invalid_cursor(dated_posts):
+    paginator = CursorPaginator(PostContent.admin_manager.all(), 2)
+
+    with pytest.raises(InvalidPage):
+        paginator.page("not-a-cursor")
+    with pytest.raises(InvalidPage):
+        paginator.page(paginator.page().next_cursor[:-2])
+
+
+@pytest.mark.django_db
+def test_cursor_pagination_view(client, dated_posts, default_config):
+    """List views use the cursor paginator when enabled in the config, without counting the posts"""
+    default_config.cursor_pagination = True
+    default_config.paginate_by = 4
+    default_config.save()
+    url = reverse("djangocms_stories:posts-latest")
+
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(url)
+    assert not [query for query in ctx.captured_queries if "COUNT(" in query["sql"].upper()]
+    page = response.context["page_obj"]
+    assert response.context["is_paginated"]
+    assert list(response.context["postcontent_list"]) == page.object_list
+    assert [obj.pk for obj in page] == [obj.pk for obj in dated_posts[8:4:-1]]
+    content = response.content.decode("utf-8")
+    assert 'rel="next"' in content
+    assert 'rel="prev"' not in content
+
+    seen = list(page)
+    while page.has_next():
+        response = client.get(url, {"cursor": page.next_cursor})
+        page = response.context["page_obj"]
+        seen.extend(page)
+    assert len(seen) == len(dated_posts)
+    assert 'rel="prev"' in response.content.decode("utf-8")
+
+    assert client.get(url, {"cursor": "invalid"}).status_code == 404
+
+
+@pytest.mark.django_db
+def test_offset_pagination_view(client, dated_posts, default_config):
+    """List views keep Django's paginator by default"""
+    default_config.paginate_by = 4
+    default_config.save()
+
+    response = client.get(reverse("djangocms_stories:posts-latest"), {"page": 2})
+
+    assert response.context["paginator"].num_pages == 3
+    assert "Page 2 of 3" in response.content.decode("utf-8")
+
+
+@pytest.mark.django_db
+def test_estimated_count_paginator_cached_count(dated_posts):
+    queryset = PostContent.admin_manager.filter(pk__in=[post_content.pk for post_content in dated_posts])
+
+    with CaptureQueriesContext(connection) as ctx:
+        assert EstimatedCountPaginator(queryset, 4, count_key=("list",)).count == 11
+    assert len(ctx.captured_queries) == 1
+    with CaptureQueriesContext(connection) as ctx:
+        paginator = EstimatedCountPaginator(queryset, 4, count_key=("list",))
+        assert paginator.num_pages == 3
+    assert len(ctx.captured_queries) == 0
+    assert paginator.is_exact
+
+    dated_posts[0].post.delete()
+
+    assert EstimatedCountPaginator(queryset, 4, count_key=("list",)).count == 10
+
+
+@pytest.mark.django_db
+def test_estimated_count_paginator_capped(dated_posts, settings):
+    """Ad-hoc lists are counted up to the cap, later pages are still available"""
+    settings.STORIES_PAGINATION_COUNT_CAP = 3
+    queryset = PostContent.admin_manager.filter(pk__in=[post_content.pk for post_content in dated_posts])
+    paginator = EstimatedCountPaginator(queryset.order_by("pk"), 2)
+
+    assert paginator.count == 3
+    assert not paginator.is_exact
+    assert paginator.num_pages == 2
+    assert paginator.page(1).has_next()
+    assert [obj.pk for obj in paginator.page(2)] == [obj.pk for obj in dated_posts[2:4]]
+    assert paginator.page(2).has_next()
+    last = paginator.page(6)
+    assert [obj.pk for obj in last] == [dated_posts[10].pk]
+    assert not last.has_next()
+    assert last.end_index() == 11
+    with pytest.raises(EmptyPage):
+        paginator.page(7)
+
+    settings.STORIES_PAGINATION_COUNT_CAP = 20
+    paginator = EstimatedCountPaginator(queryset, 2)
+    assert paginator.count == 11
+    assert paginator.is_exact
+
+
+@pytest.mark.django_db
+def test_estimated_count_paginator_planner_estimate(dated_posts, settings):
+    queryset = PostContent.admin_manager.all()
+    assert get_planner_estimate(queryset) is None  # not on PostgreSQL
+
+    with patch("djangocms_stories.pagination.get_planner_estimate", return_value=20000):
+        # Estimates are opt-in
+        assert EstimatedCountPaginator(queryset, 4).count == 11
+
+    settings.STORIES_PAGINATION_ESTIMATE_THRESHOLD = 10000
+    with patch("djangocms_stories.pagination.get_planner_estimate", return_value=20000):
+        paginator = EstimatedCountPaginator(queryset, 4, count_key=("estimated",))
+        assert paginator.count == 20000
+        assert not paginator.is_exact
+        settings.STORIES_PAGINATION_ESTIMATE_THRESHOLD = None
+        assert EstimatedCountPaginator(queryset, 4, count_key=("exact",)).count == 11
+
+
+@pytest.mark.django_db
+def test_estimated_count_pagination_view(client, dated_posts, default_config):
+    """List views count the posts once, until posts change"""
+    default_config.paginate_by = 4
+    default_config.save()
+    url = reverse("djangocms_stories:posts-latest")
+
+    client.get(url)
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(url, {"page": 2})
+    assert not [query for query in ctx.captured_queries if "COUNT(" in query["sql"].upper()]
+    assert response.context["paginator"].count == 11
+
+    dated_posts[0].post.delete()
+
+    response = client.get(url, {"page": 2})
+    assert response.context["paginator"].count == 10
+    assert "Page 2 of 3" in response.content.decode("utf-8")
@@ -0,0 +1,142 @@
+from unittest.mock import patch
+
+import pytest
+
+from djangocms_stories.permalinks import (
+    PermalinkBuilder,
+    build_absolute_urls,
+    clear_permalink_builders,
+    get_permalink_builder,
+)
+from djangocms_stories.settings import (
+    PERMALINK_TYPE_CATEGORY,
+    PERMALINK_TYPE_FULL_DATE,
+    PERMALINK_TYPE_SHORT_DATE,
+    PERMALINK_TYPE_SLUG,
+)
+
+from .utils import assert_num_queries
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "url_patterns", [PERMALINK_TYPE_FULL_DATE, PERMALINK_TYPE_SHORT_DATE, PERMALINK_TYPE_CATEGORY, PERMALINK_TYPE_SLUG]
+)
+def test_builder_matches_reverse(page_with_menu, many_posts, default_config, url_patterns):
+    """The precompiled urls are identical to the reversed urls"""
+    default_config.url_patterns = url_patterns
+    default_config.save()
+
+    for post_content in many_posts:
+        post = post_content.post
+        builder = get_permalink_builder(post.app_config)
+        url = builder.get_url(post, "en")
+        with patch.object(PermalinkBuilder, "get_template", return_value=None):
+            assert builder.get_url(post, "en") == url
+
+
+@pytest.mark.django_db
+def test_builder_does_not_reverse(page_with_menu, many_posts, default_config):
+    """Only the first url per language is reversed"""
+    from djangocms_stories import permalinks
+
+    clear_permalink_builders()
+    with patch.object(permalinks, "reverse", wraps=permalinks.reverse) as reverse:
+        urls = [post_content.get_absolute_url("en") for post_content in many_posts]
+
+    assert reverse.call_count == 1
+    assert all(url.startswith("/en/blog/") for url in urls if url)
+
+
+@pytest.mark.django_db
+def test_builder_unicode_slug(page_with_menu, default_config):
+    """Slugs are quoted like reverse() does"""
+    from .factories import PostContentFactory
+
+    post_content = PostContentFactory(post__app_config=default_config, slug="accentué")
+    post = post_content.post
+    post.get_content = lambda *args, **kwargs: post_content
+
+    url = post.get_absolute_url("en")
+    assert url.endswith("/accentu%C3%A9/")
+    with patch.object(PermalinkBuilder, "get_template", return_value=None):
+        assert post.get_absolute_url("en") == url
+
+
+@pytest.mark.django_db
+def test_builder_invalidated_on_config_change(default_config):
+    """Saving a config drops the precompiled urls"""
+    builder = get_permalink_builder(default_config)
+    assert get_permalink_builder(default_config) is builder
+
+    default_config.save()
+
+    assert get_permalink_builder(default_config) is not builder
+
+
+@pytest.mark.django_db
+def test_build_absolute_urls(page_with_menu, many_posts, default_config, admin_user):
+    """Urls of a queryset are built with a constant number of queries"""
+    from djangocms_stories.models import Post
+
+    from .utils import publish_if_necessary
+
+    default_config.url_patterns = PERMALINK_TYPE_CATEGORY
+    default_config.save()
+    publish_if_necessary(many_posts[5:], admin_user)
+    posts = Post.objects.filter(app_config=default_config)
+    # Warm up the builder
+    get_permalink_builder(default_config).get_template("en")
+
+    with assert_num_queries(2):  # posts (with their primary category slugs), contents
+        urls = build_absolute_urls(posts, "en")
+
+    assert len(urls) == len(many_posts)
+    for post in posts:
+        assert urls[post.pk] == post.get_absolute_url("en")
+        assert urls[post.pk].startswith("/en/blog/test-category/")
+
+
+@pytest.mark.django_db
+def test_primary_category_synced(default_config):
+    """The primary category and its slugs follow the categories of the post"""
+    from djangocms_stories.models import Post, PostCategory
+
+    from .factories import PostContentFactory
+
+    post = PostContentFactory(post__app_config=default_config).post
+    first = PostCategory.objects.create(name="First", slug="first", priority=1, app_config=default_config)
+    second = PostCategory.objects.create(name="Second", slug="second", priority=2, app_config=default_config)
+
+    post.categories.add(second, first)
+    assert post.primary_category_id == first.pk
+    assert post.primary_category_slugs == {"en": "first"}
+    with assert_num_queries(0):
+        assert post.get_primary_category_slug("it") == "first"
+
+    first.set_current_language("it")
+    first.name = "Primo"
+    first.slug = "primo"
+    first.save()
+    post.refresh_from_db()
+    assert post.primary_category_slugs == {"en": "first", "it": "primo"}
+    assert post.get_primary_category_slug("it") == "primo"
+
+    first.priority = 3
+    first.save()
+    post.refresh_from_db()
+    assert post.primary_category_id == second.pk
+
+    second.posts.remove(post)
+    post.refresh_from_db()
+    assert post.get_primary_category() == first
+
+    first.delete()
+    post.refresh_from_db()
+    assert post.primary_category is None
+    assert post.primary_category_slugs == {}
+
+    second.posts.add(post)
+    assert Post.objects.get(pk=post.pk).get_primary_category_slug("en") == "second"
+    second.posts.clear()
+    assert Post.objects.get(pk=post.pk).primary_category is None
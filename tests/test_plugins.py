@@ -195,6 +195,43 @@ def test_blog_author_post_list_plugin(placeholder, admin_client, simple_w_placeh
     )
 
 
+@pytest.mark.django_db
+def test_author_entries_plugin_get_authors(
+    placeholder, admin_user, simple_w_placeholder, django_assert_max_num_queries
+):
+    from cms import api
+    from django.contrib.auth.models import AnonymousUser
+    from django.test import RequestFactory
+    from django.utils.translation import override
+
+    from djangocms_stories.models import PostContent
+
+    from .factories import PostContentFactory
+
+    batch = PostContentFactory.create_batch(3, language="en", post__app_config=simple_w_placeholder)
+    batch += PostContentFactory.create_batch(
+        4, language="en", post__app_config=simple_w_placeholder, post__author=batch[0].author
+    )
+    publish_if_necessary(batch, admin_user)
+    plugin = api.add_plugin(
+        placeholder, "BlogAuthorPostsListPlugin", "en", app_config=simple_w_placeholder, latest_posts=2
+    )
+    instance = plugin.get_plugin_instance()[0]
+    instance.authors.add(*{post_content.author for post_content in batch})
+    request = RequestFactory().get("/")
+    request.user = AnonymousUser()
+
+    # Authors, counts, latest contents and their prefetched relations, whatever the number of authors
+    with override("en"), django_assert_max_num_queries(7):
+        authors = instance.get_authors(request)
+
+    for author in authors:
+        expected = PostContent.objects.filter(language="en", post__author=author)
+        assert author.count == expected.count()
+        assert author.post_contents == list(expected[:2])
+    assert [author.count for author in authors if author == batch[0].author] == [5]
+
+
 @pytest.mark.django_db
 def test_blog_tags_plugin(placeholder, admin_client, simple_w_placeholder, assert_html_in_response):
     from cms import api
@@ -259,6 +296,32 @@ def test_blog_category_plugin(placeholder, admin_client, simple_w_placeholder, a
         assert category.name in response.content.decode("utf-8")
 
 
+@pytest.mark.django_db
+def test_blog_category_plugin_counts(placeholder, admin_client, simple_w_placeholder, assert_html_in_response):
+    from cms import api
+
+    from .factories import PostCategoryFactory, PostFactory
+
+    categories = PostCategoryFactory.create_batch(3, app_config=simple_w_placeholder)
+    for post in PostFactory.create_batch(2, app_config=simple_w_placeholder):
+        post.categories.set(categories[:2])
+    categories[1].posts.add(PostFactory(app_config=simple_w_placeholder))
+
+    api.add_plugin(
+        placeholder,
+        "BlogCategoryPlugin",
+        "en",
+        app_config=simple_w_placeholder,
+    )
+
+    response = admin_client.get(get_object_preview_url(placeholder.source))
+    content = response.content.decode("utf-8")
+
+    assert f'<a href="{categories[0].get_absolute_url()}" class="blog-categories-2">' in content
+    assert f'<a href="{categories[1].get_absolute_url()}" class="blog-categories-3">' in content
+    assert f'<a href="{categories[2].get_absolute_url()}" class="blog-categories-0">' in content
+
+
 @pytest.mark.django_db
 def test_blog_archive_plugin(placeholder, admin_client, simple_w_placeholder, assert_html_in_response):
     from cms import api
@@ -284,3 +347,92 @@ def test_blog_archive_plugin(placeholder, admin_client, simple_w_placeholder, as
 
     assert_html_in_response(f'<a href="/en/blog/{post.date_featured.year}/{post.date_featured.month}/">', response)
     assert_html_in_response("<span>( 1 article )</span>", response)
+
+
+@pytest.mark.django_db
+def test_blog_archive_plugin_render_cache(placeholder, admin_user, simple_w_placeholder):
+    from datetime import datetime, timezone
+
+    from cms import api
+    from cms.plugin_rendering import ContentRenderer
+    from django.contrib.auth.models import AnonymousUser
+    from django.template import Context
+    from django.test import RequestFactory
+    from django.utils.translation import override
+
+    from .factories import PostContentFactory
+
+    months = [(2024, 3), (2024, 5)]
+    batch = []
+    for year, month in months:
+        date = datetime(year, month, 10, tzinfo=timezone.utc)
+        batch.append(
+            PostContentFactory(
+                language="en",
+                post__app_config=simple_w_placeholder,
+                post__date_published=date,
+                post__date_featured=date,
+                post__date_published_end=None,
+            )
+        )
+    publish_if_necessary(batch, admin_user)
+    plugin = api.add_plugin(placeholder, "BlogArchivePlugin", "en", app_config=simple_w_placeholder)
+    request = RequestFactory().get("/")
+    request.user = AnonymousUser()
+
+    def render(year, month):
+        context = Context({"request": request, "year": year, "month": month})
+        with override("en"):
+            return ContentRenderer(request).render_plugin(plugin, context, placeholder)
+
+    # The cached output of an archive month does not highlight the month on the other ones
+    for _ in range(2):
+        for year, month in months:
+            content = render(year, month)
+            for other_year, other_month in months:
+                active = f'<li class="active"><a href="/en/blog/{other_year}/{other_month}/">' in content
+                assert active == ((other_year, other_month) == (year, month))
+
+
+@pytest.mark.django_db
+def test_plugin_render_cache(placeholder, admin_user, simple_w_placeholder, django_assert_max_num_queries):
+    from datetime import timedelta
+
+    from cms import api
+    from cms.plugin_rendering import ContentRenderer
+    from django.contrib.auth.models import AnonymousUser
+    from django.template import Context
+    from django.test import RequestFactory
+    from django.utils.timezone import now
+    from django.utils.translation import override
+
+    from djangocms_stories.cms_plugins import BlogLatestEntriesPluginCached
+
+    from .factories import PostContentFactory
+
+    batch = PostContentFactory.create_batch(2, language="en", post__app_config=simple_w_placeholder)
+    publish_if_necessary(batch, admin_user)
+    plugin = api.add_plugin(placeholder, "BlogLatestEntriesPluginCached", "en", app_config=simple_w_placeholder)
+    request = RequestFactory().get("/")
+    request.user = AnonymousUser()
+
+    def render():
+        with override("en"):
+            return ContentRenderer(request).render_plugin(plugin, Context({"request": request}), placeholder)
+
+    content = render()
+    assert all(post_content.title in content for post_content in batch)
+    with django_assert_max_num_queries(1):
+        assert render() == content
+
+    # Post changes are rendered right away
+    batch[0].title = "Changed title"
+    batch[0].save()
+    assert "Changed title" in render()
+
+    # Scheduled posts expire the cache when published
+    scheduled = now() + timedelta(hours=1)
+    batch[1].post.date_published = scheduled
+    batch[1].post.save()
+    plugin_class = BlogLatestEntriesPluginCached()
+    assert plugin_class.get_cache_expiration(request, plugin, placeholder) == scheduled
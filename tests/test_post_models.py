@@ -177,6 +177,26 @@ def test_featured_property(db):
     assert post.featured()
 
 
+@pytest.mark.django_db
+def test_has_changed(db):
+    """Changes are tracked from the loaded or saved values"""
+    from djangocms_stories.models import Post
+
+    from .factories import PostFactory
+
+    assert Post(date_published=now()).has_changed("date_published")
+    post = PostFactory(date_published=now())
+    assert not post.has_changed("date_published", "app_config")
+
+    post = Post.objects.only("pk").get(pk=post.pk)
+    assert not post.has_changed("date_published")
+    post.date_published = now() - datetime.timedelta(days=1)
+    assert post.has_changed("date_published")
+    assert not post.has_changed("app_config")
+    post.save()
+    assert not post.has_changed("date_published")
+
+
 @pytest.mark.django_db
 def test_get_author(db):
     from .factories import PostContentFactory, UserFactory
@@ -0,0 +1,137 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from djangocms_stories.models import Post, PostCategory, RelatedPost
+from djangocms_stories.related import _flush_related_posts, get_score, rebuild_related_posts
+
+from .utils import publish_if_necessary
+
+
+@pytest.fixture
+def related_posts(default_config):
+    """Four posts, the second shares two tags with the first, the third a category, the last nothing"""
+    from .factories import PostContentFactory
+
+    contents = PostContentFactory.create_batch(4, post__app_config=default_config)
+    date = timezone.now()
+    for index, content in enumerate(contents):
+        Post.objects.filter(pk=content.post.pk).update(date_featured=None, date_published=date - timedelta(days=index))
+    category = PostCategory.objects.create(name="Shared", slug="shared", app_config=default_config)
+    contents[0].post.tags.add("django", "cms")
+    contents[0].post.categories.add(category)
+    contents[1].post.tags.add("django", "cms")
+    contents[2].post.categories.add(category)
+    contents[3].post.tags.add("other")
+    return contents
+
+
+def get_related(post):
+    return list(
+        RelatedPost.objects.filter(post=post).order_by("-score", "-related_id").values_list("related", flat=True)
+    )
+
+
+def test_get_score(settings):
+    settings.STORIES_AUTO_RELATED_WEIGHTS = {"tags": 2.0, "categories": 1.0, "recency": 1.0}
+    settings.STORIES_AUTO_RELATED_HALF_LIFE = 10
+    date = timezone.now()
+
+    assert get_score((2, 1), date, date) == 6
+    assert get_score((0, 1), date, date - timedelta(days=10)) == 1.5
+    # Newer related posts are not favoured
+    assert get_score((0, 1), date, date + timedelta(days=10)) == 2
+
+
+@pytest.mark.django_db
+def test_rebuild_related_posts(settings, related_posts):
+    first, second, third, _ = related_posts
+    assert rebuild_related_posts() == 4
+
+    assert get_related(first.post) == [second.post.pk, third.post.pk]
+    assert get_related(second.post) == [first.post.pk]
+    assert get_related(third.post) == [first.post.pk]
+    assert RelatedPost.objects.get(post=first.post, related=second.post).score == pytest.approx(4 + 0.5 ** (1 / 180))
+
+    settings.STORIES_AUTO_RELATED_LIMIT = 1
+    rebuild_related_posts()
+    assert get_related(first.post) == [second.post.pk]
+
+    # Configs without related posts have none
+    first.post.app_config.use_related = 0
+    first.post.app_config.save()
+    rebuild_related_posts()
+    assert RelatedPost.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_rebuild_related_posts_command(settings, related_posts):
+    out = StringIO()
+    settings.STORIES_ENABLE_AUTO_RELATED = True
+    call_command("stories_rebuild_related_posts", stdout=out)
+
+    assert out.getvalue() == "Computed the related posts of 4 posts\n"
+    assert RelatedPost.objects.count() == 4
+
+
+@pytest.mark.django_db
+def test_related_posts_updated(settings, related_posts, django_capture_on_commit_callbacks):
+    from .factories import PostContentFactory
+
+    first, second, third, fourth = related_posts
+    settings.STORIES_ENABLE_AUTO_RELATED = True
+    settings.STORIES_AUTO_RELATED_LIMIT = 1
+    rebuild_related_posts()
+
+    new = PostContentFactory(post__app_config=first.post.app_config).post
+    with django_capture_on_commit_callbacks(execute=True):
+        new.tags.add("django", "cms", "other")
+        new.categories.add(PostCategory.objects.translated(slug="shared").get())
+
+    # The new post scores better than the second one for the first post
+    assert get_related(new) == [first.post.pk]
+    assert get_related(first.post) == [new.pk]
+    assert get_related(fourth.post) == [new.pk]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        new.tags.remove("django", "cms")
+    assert get_related(first.post) == [second.post.pk]
+    assert get_related(fourth.post) == [new.pk]
+
+    # Saves without changes of the date or config do not compute the related posts again
+    with django_capture_on_commit_callbacks() as callbacks:
+        new.save()
+    assert _flush_related_posts not in callbacks
+    with django_capture_on_commit_callbacks() as callbacks:
+        new.date_published = timezone.now()
+        new.save()
+    assert _flush_related_posts in callbacks
+
+    with django_capture_on_commit_callbacks(execute=True):
+        new.delete()
+    assert get_related(fourth.post) == []
+
+    with django_capture_on_commit_callbacks(execute=True):
+        PostCategory.objects.translated(slug="shared").get().delete()
+    assert get_related(third.post) == []
+
+
+@pytest.mark.django_db
+def test_post_detail_auto_related(client, settings, admin_user, related_posts):
+    settings.STORIES_ENABLE_AUTO_RELATED = True
+    first, second, third, _ = related_posts
+    publish_if_necessary(related_posts, admin_user)
+    rebuild_related_posts()
+
+    url = reverse("djangocms_stories:post-detail", kwargs={"slug": first.slug})
+    response = client.get(url)
+    assert [content.pk for content in response.context["related_contents"]] == [second.pk, third.pk]
+
+    # Selected related posts are shown instead
+    first.post.related.add(third.post)
+    response = client.get(url)
+    assert [content.pk for content in response.context["related_contents"]] == [third.pk]
@@ -0,0 +1,187 @@
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from cms.api import add_plugin
+from cms.signals import post_placeholder_operation
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from djangocms_stories.models import PostContent, PostSearchDocument
+from djangocms_stories.search import get_search_config, get_search_terms
+
+from .utils import publish_if_necessary
+
+
+@pytest.fixture
+def searchable_posts(default_config, admin_user):
+    from .factories import PostContentFactory
+
+    # No random meta text, which could contain the searched words
+    defaults = {"post__app_config": default_config, "meta_title": "", "meta_description": ""}
+    contents = [
+        PostContentFactory(
+            **defaults,
+            title="Gardening for beginners",
+            subtitle="Tomatoes and zucchini",
+            post_text="<p>Water the garden&nbsp;every evening</p>",
+        ),
+        PostContentFactory(
+            **defaults,
+            title="Cooking zucchini",
+            subtitle="Zucchini recipes",
+            post_text="<p>Zucchini zucchini zucchini</p>",
+        ),
+        PostContentFactory(
+            **defaults,
+            title="Travelling",
+            subtitle="A trip to the mountains",
+            post_text="<p>Pack light</p>",
+        ),
+        PostContentFactory(
+            **defaults,
+            language="it",
+            title="Zucchine ripiene",
+            subtitle="Ricette",
+            post_text="<p>Zucchini al forno</p>",
+        ),
+    ]
+    publish_if_necessary(contents, admin_user)
+    return contents
+
+
+def test_search_helpers(settings):
+    settings.STORIES_SEARCH_CONFIGS = {"en": "english", "pt-br": "portuguese"}
+
+    assert get_search_config("en") == "english"
+    assert get_search_config("en-us") == "english"
+    assert get_search_config("pt-br") == "portuguese"
+    assert get_search_config("xx") == "simple"
+    assert get_search_terms('"zucchini" -OR garden*') == ["zucchini", "OR", "garden"]
+
+
+@pytest.mark.django_db
+def test_search_document(searchable_posts):
+    content = searchable_posts[0]
+    content.post.tags.add("vegetables")
+    content.save()
+
+    document = PostSearchDocument.objects.get(post_content=content)
+    assert document.language == "en"
+    assert document.config == "english"
+    assert "Gardening for beginners" in document.document
+    assert "Water the garden\xa0every evening" in document.document
+    assert "vegetables" in document.document
+    assert "<p>" not in document.document
+
+
+@pytest.mark.django_db
+def test_search_document_placeholder_plugins(searchable_posts, admin_user):
+    content = searchable_posts[2]
+    add_plugin(content.content, "TextPlugin", "en", body="<p>Bring sunscreen</p>")
+    assert PostContent.admin_manager.search("sunscreen").count() == 0
+
+    post_placeholder_operation.send(sender=None, operation="add_plugin", placeholder=content.content)
+
+    assert list(PostContent.admin_manager.search("sunscreen")) == [content]
+
+
+@pytest.mark.django_db
+def test_search_disabled(client, default_config, settings):
+    from .factories import PostContentFactory
+
+    settings.STORIES_ENABLE_SEARCH = False
+    content = PostContentFactory(post__app_config=default_config)
+
+    assert not PostSearchDocument.objects.filter(post_content=content).exists()
+    assert client.get(reverse("djangocms_stories:posts-search"), {"q": "zucchini"}).status_code == 404
+
+
+@pytest.mark.django_db
+def test_admin_search_disabled_by_default(admin_client, searchable_posts, settings):
+    """Without the search, the admin matches the content fields with icontains lookups"""
+    from djangocms_stories.settings import get_setting
+
+    garden, _, _, _ = searchable_posts
+    del settings.STORIES_ENABLE_SEARCH
+    assert get_setting("ENABLE_SEARCH") is False
+
+    response = admin_client.get(reverse("admin:djangocms_stories_post_changelist"), {"q": "gardenin"})
+
+    assert list(response.context["cl"].result_list) == [garden.post]
+
+
+@pytest.mark.django_db
+def test_search_queryset(searchable_posts):
+    garden, cooking, travelling, italian = searchable_posts
+
+    assert list(PostContent.admin_manager.search("zucchini", "en")) == [cooking, garden]
+    assert set(PostContent.admin_manager.search("zucchini")) == {cooking, garden, italian}
+    assert list(PostContent.admin_manager.search("GARDEN evening", "en")) == [garden]
+    assert list(PostContent.admin_manager.search("mountains", "it")) == []
+    assert list(PostContent.admin_manager.search("\"'*")) == []
+
+    travelling.title = "Travelling with zucchini"
+    travelling.save()
+    assert travelling in PostContent.admin_manager.search("zucchini", "en")
+
+    travelling.delete()
+    assert travelling not in PostContent.admin_manager.search("zucchini", "en")
+
+
+@pytest.mark.django_db
+def test_search_queryset_fallback(searchable_posts):
+    garden, cooking, _, _ = searchable_posts
+
+    with patch("djangocms_stories.search.has_fts_table", return_value=False):
+        assert set(PostContent.admin_manager.search("zucchini", "en")) == {cooking, garden}
+        assert list(PostContent.admin_manager.search("garden evening")) == [garden]
+
+
+@pytest.mark.django_db
+def test_search_view(client, searchable_posts, default_config):
+    garden, cooking, _, _ = searchable_posts
+    default_config.paginate_by = 1
+    default_config.save()
+    url = reverse("djangocms_stories:posts-search")
+
+    response = client.get(url, {"q": "zucchini"})
+    assert response.status_code == 200
+    assert list(response.context["postcontent_list"]) == [cooking]
+    assert response.context["search_query"] == "zucchini"
+    assert response.context["paginator"].count == 2
+    assert "?page=2&amp;q=zucchini" in response.content.decode("utf-8")
+
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(url, {"q": "zucchini", "page": 2})
+    assert list(response.context["postcontent_list"]) == [garden]
+    assert not [query for query in ctx.captured_queries if "MATCH" in query["sql"] and "LIMIT" in query["sql"]]
+
+    assert client.get(url, {"q": "zucchini", "page": 3}).status_code == 404
+    response = client.get(url)
+    assert list(response.context["postcontent_list"]) == []
+
+
+@pytest.mark.django_db
+def test_admin_search(admin_client, searchable_posts):
+    garden, _, _, _ = searchable_posts
+
+    response = admin_client.get(reverse("admin:djangocms_stories_post_changelist"), {"q": "evening"})
+
+    assert list(response.context["cl"].result_list) == [garden.post]
+
+
+@pytest.mark.django_db
+def test_rebuild_search_index_command(searchable_posts):
+    PostSearchDocument.objects.all().delete()
+    assert not PostContent.admin_manager.search("zucchini").exists()
+
+    out = StringIO()
+    call_command("stories_rebuild_search_index", language="en", stdout=out)
+
+    assert out.getvalue() == "Indexed 3 post contents\n"
+
+    assert PostSearchDocument.objects.count() == 3
+    assert PostContent.admin_manager.search("zucchini").count() == 2
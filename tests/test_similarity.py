@@ -0,0 +1,173 @@
+from io import StringIO
+
+import pytest
+from django.apps import apps
+from django.core.management import call_command
+from django.urls import reverse
+
+from djangocms_stories.models import PostContentSignature, SimilarPostContent
+from djangocms_stories.similarity import (
+    get_indexed_contents,
+    get_signature,
+    get_similarity,
+    rebuild_similar_contents,
+)
+
+from .utils import publish_if_necessary
+
+TEXTS = [
+    "The quick brown fox jumps over the lazy dog while the farmer sleeps under the old oak tree",
+    "The quick brown fox jumps over the lazy dog while the farmer sleeps under the big oak tree",
+    "Stock markets closed higher today as investors welcomed the central bank interest rate decision",
+]
+
+
+@pytest.fixture
+def similar_contents(default_config):
+    from .factories import PostContentFactory
+
+    return [
+        PostContentFactory(post__app_config=default_config, title=f"Post {index}", abstract="", post_text=text)
+        for index, text in enumerate(TEXTS)
+    ]
+
+
+def get_similar(content):
+    return list(
+        SimilarPostContent.objects.filter(post_content=content)
+        .order_by("-similarity", "-similar_id")
+        .values_list("similar", flat=True)
+    )
+
+
+def test_get_signature():
+    signatures = [get_signature(text, 64) for text in TEXTS]
+
+    assert get_signature("", 64) is None
+    assert get_signature(TEXTS[0], 64) == signatures[0]
+    assert get_similarity(signatures[0], signatures[0]) == 1
+    assert 0.5 < get_similarity(signatures[0], signatures[1]) < 1
+    assert get_similarity(signatures[0], signatures[2]) < 0.1
+
+
+@pytest.mark.django_db
+def test_rebuild_similar_contents(similar_contents):
+    first, second, third = similar_contents
+    assert rebuild_similar_contents(processes=1) == 3
+
+    assert PostContentSignature.objects.count() == 3
+    assert get_similar(first) == [second.pk]
+    assert get_similar(second) == [first.pk]
+    assert get_similar(third) == []
+
+
+@pytest.mark.django_db
+def test_rebuild_similar_posts_command(settings, similar_contents):
+    first, second, _ = similar_contents
+    out = StringIO()
+    settings.STORIES_ENABLE_SIMILAR_POSTS = True
+    call_command("stories_rebuild_similar_posts", processes=2, stdout=out)
+
+    assert out.getvalue() == "Computed the similar contents of 3 post contents\n"
+    assert get_similar(first) == [second.pk]
+
+
+@pytest.mark.django_db
+def test_similarity_max_bucket_size(settings, similar_contents):
+    """Contents sharing only a crowded bucket are not compared"""
+    from unittest.mock import patch
+
+    from djangocms_stories import similarity
+    from djangocms_stories.similarity import find_similar_contents, get_signature_size, update_similar_contents
+
+    first, second, third = similar_contents
+    settings.STORIES_SIMILARITY_MAX_BUCKET_SIZE = 2
+    get_buckets, get_similarity = similarity.get_buckets, similarity.get_similarity
+
+    def shared_buckets(signature, language):
+        return [*get_buckets(signature, language), (99, 0)]
+
+    def sign(content):
+        return get_signature(similarity.get_similarity_text(content), get_signature_size())
+
+    buckets_patch = patch("djangocms_stories.similarity.get_buckets", shared_buckets)
+    similarity_patch = patch("djangocms_stories.similarity.get_similarity", side_effect=get_similarity)
+    with buckets_patch, similarity_patch as compare:
+        rebuild_similar_contents(processes=1)
+        # The first and second contents share their own buckets, in both directions
+        assert compare.call_count == 2
+
+        compare.reset_mock()
+        assert find_similar_contents(third, sign(third)) == {}
+        assert find_similar_contents(first, sign(first)).keys() == {second.pk}
+        assert compare.call_count == 1
+
+        settings.STORIES_SIMILARITY_MAX_BUCKET_SIZE = 0
+        compare.reset_mock()
+        update_similar_contents(third)
+        assert compare.call_count == 2
+    assert get_similar(first) == [second.pk]
+    assert get_similar(third) == []
+
+
+@pytest.mark.django_db
+def test_similar_contents_updated(settings, similar_contents, django_capture_on_commit_callbacks):
+    from .factories import PostContentFactory
+
+    first, second, third = similar_contents
+    settings.STORIES_ENABLE_SIMILAR_POSTS = True
+    settings.STORIES_SIMILAR_POSTS_LIMIT = 1
+    rebuild_similar_contents(processes=1)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        new = PostContentFactory(
+            post__app_config=first.post.app_config, title="Post 0", abstract="", post_text=TEXTS[0]
+        )
+    # Same text, the new content is the most similar to the first one
+    assert get_similar(new) == [first.pk]
+    assert get_similar(first) == [new.pk]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        new.post_text = TEXTS[2]
+        new.save()
+    assert get_similar(new) == [third.pk]
+    assert get_similar(first) == [second.pk]
+    assert get_similar(third) == [new.pk]
+
+
+@pytest.mark.django_db
+def test_similar_contents_versions(settings, admin_user, similar_contents, django_capture_on_commit_callbacks):
+    """One version of each post and language is compared: the published one, or the latest one"""
+    first, second, _ = similar_contents
+    settings.STORIES_ENABLE_SIMILAR_POSTS = True
+    publish_if_necessary(similar_contents, admin_user)
+    assert set(get_indexed_contents()) == set(similar_contents)
+
+    if apps.is_installed("djangocms_versioning"):
+        from djangocms_versioning.models import Version
+
+        rebuild_similar_contents(processes=1)
+        with django_capture_on_commit_callbacks(execute=True):
+            draft = Version.objects.get_for_content(first).copy(admin_user).content
+        assert set(get_indexed_contents()) == set(similar_contents)
+        assert not PostContentSignature.objects.filter(pk=draft.pk).exists()
+        assert get_similar(second) == [first.pk]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Version.objects.get_for_content(draft).publish(admin_user)
+        assert not PostContentSignature.objects.filter(pk=first.pk).exists()
+        assert get_similar(second) == [draft.pk]
+        assert get_similar(draft) == [second.pk]
+        assert rebuild_similar_contents(processes=1) == 3
+
+
+@pytest.mark.django_db
+def test_post_detail_similar_posts(client, settings, admin_user, similar_contents):
+    settings.STORIES_ENABLE_SIMILAR_POSTS = True
+    first, second, _ = similar_contents
+    publish_if_necessary(similar_contents, admin_user)
+    rebuild_similar_contents(processes=1)
+
+    url = reverse("djangocms_stories:post-detail", kwargs={"slug": first.slug})
+    response = client.get(url)
+    assert [content.pk for content in response.context["related_contents"]] == [second.pk]
@@ -1,4 +1,6 @@
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 
 @pytest.mark.django_db
@@ -15,15 +17,63 @@ def test_sitemap(page_with_menu, many_posts):
     for post in many_posts:
         absolute_url = post.get_absolute_url()
         assert not absolute_url or absolute_url in urls
+    assert len(urls) == len(set(urls))
 
 
 @pytest.mark.django_db
-def test_sitemap_priority_and_changefreq(page_with_menu, many_posts):
+def test_sitemap_priority_and_changefreq(page_with_menu, many_posts, default_config):
     """Tests if the sitemap priority and changefreq are set correctly"""
     from djangocms_stories.sitemaps import StoriesSitemap
 
+    default_config.refresh_from_db()
     sitemap = StoriesSitemap()
     # Check frequencies and priorities
     for item in sitemap.items():
-        assert sitemap.priority(item) == item.app_config.sitemap_priority
-        assert sitemap.changefreq(item) == item.app_config.sitemap_changefreq
+        assert sitemap.priority(item) == default_config.sitemap_priority
+        assert sitemap.changefreq(item) == default_config.sitemap_changefreq
+
+
+@pytest.mark.django_db
+def test_sitemap_queries(page_with_menu, many_posts, default_config, settings):
+    """Urls are built in bulk, the number of queries does not depend on the number of posts"""
+    from djangocms_stories.settings import get_setting
+    from djangocms_stories.sitemaps import StoriesSitemap
+
+    settings.STORIES_PERMALINK_URLS = {**get_setting("PERMALINK_URLS"), "full_date": "<str:category>/<slug:slug>/"}
+    sitemap = StoriesSitemap(default_config.namespace, "en")
+    sitemap.chunk_size = 4
+    expected = [content.post.get_absolute_url("en") for content in many_posts]
+
+    with CaptureQueriesContext(connection) as ctx:
+        urls = [sitemap.location(item) for item in sitemap.items()]
+
+    assert set(urls) == {url for url in expected if url}
+    assert all("/test-category/" in url for url in urls)
+    stories_queries = [query for query in ctx.captured_queries if "djangocms_stories" in query["sql"]]
+    chunks = -(-len(urls) // sitemap.chunk_size)
+    # Contents stream, configs registry, then primary categories and their slugs for each chunk of 4 contents
+    assert len(stories_queries) <= 1 + 2 + 2 * chunks
+
+
+@pytest.mark.django_db
+def test_sitemap_index(client, page_with_menu, many_posts, default_config):
+    """The sitemap index has a section for each config and language, each paginated"""
+    from djangocms_stories.sitemaps import StoriesSitemap
+
+    response = client.get("/sitemap-index.xml")
+    assert response.status_code == 200
+    content = response.content.decode("utf-8")
+    assert f"/sitemap-stories-{default_config.namespace}-en.xml" in content
+    assert f"/sitemap-stories-{default_config.namespace}-it.xml" in content
+
+    response = client.get(f"/sitemap-stories-{default_config.namespace}-en.xml")
+    assert response.status_code == 200
+    content = response.content.decode("utf-8")
+    for item in StoriesSitemap(default_config.namespace, "en").items():
+        assert item["location"] in content
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(StoriesSitemap, "limit", 2)
+        response = client.get(f"/sitemap-stories-{default_config.namespace}-en.xml", {"p": 2})
+        assert response.status_code == 200
+        assert response.content.decode("utf-8").count("<url>") == 2
@@ -4,13 +4,14 @@ from cms.sitemaps import CMSSitemap
 from django.conf import settings
 from django.conf.urls.i18n import i18n_patterns
 from django.contrib import admin
-from django.contrib.sitemaps.views import sitemap
+from django.contrib.sitemaps.views import index, sitemap
 from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 from django.urls import include, path
 from django.views.i18n import JavaScriptCatalog
 from django.views.static import serve
 
-from djangocms_stories.sitemaps import StoriesSitemap
+from djangocms_stories.sitemaps import StoriesSitemap, StoriesSitemaps
+from djangocms_stories.sitemaps import sitemap as stories_sitemap
 
 admin.autodiscover()
 
@@ -19,6 +20,8 @@ urlpatterns = [
     path("jsi18n/", JavaScriptCatalog.as_view(), name="javascript-catalog"),
     path("taggit_autosuggest/", include("taggit_autosuggest.urls")),
     path("sitemap.xml", sitemap, {"sitemaps": {"cmspages": CMSSitemap, "blog": StoriesSitemap}}),
+    path("sitemap-index.xml", index, {"sitemaps": StoriesSitemaps(), "sitemap_url_name": "stories-sitemap"}),
+    path("sitemap-<section>.xml", stories_sitemap, {"sitemaps": StoriesSitemaps()}, name="stories-sitemap"),
 ]
 
 urlpatterns += staticfiles_urlpatterns()
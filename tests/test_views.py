@@ -1,6 +1,9 @@
 import pytest
+from cms.signals import post_placeholder_operation
 from django.apps import apps
-from django.test import RequestFactory
+from django.db import connection
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from djangocms_stories.cms_appconfig import get_app_instance
@@ -51,6 +54,33 @@ def test_post_detail_endpoint(admin_client, admin_user, post_content):
     assert f"<h4>{related_post.subtitle}</h4>" in content  # Subtitle appears in the related posts section
 
 
+@pytest.mark.django_db
+def test_post_detail_related_contents(client, admin_user, post_content):
+    from .factories import PostContentFactory
+
+    related = [PostContentFactory() for _ in range(4)]
+    post_content.post.related.add(*[content.post for content in related])
+    unpublished = PostContentFactory()
+    post_content.post.related.add(unpublished.post)
+    publish_if_necessary([post_content, *related], admin_user)
+    if not apps.is_installed("djangocms_versioning"):
+        unpublished.delete()  # Posts without (published) content are left out
+
+    url = reverse("djangocms_stories:post-detail", kwargs={"slug": post_content.slug})
+    response = client.get(url)
+    assert [content.pk for content in response.context["related_contents"]] == [content.pk for content in related]
+
+    # Related posts are loaded at once
+    more = PostContentFactory()
+    post_content.post.related.add(more.post)
+    publish_if_necessary([more], admin_user)
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    related_queries = [query for query in queries if "djangocms_stories_post_related" in query["sql"]]
+    assert len(related_queries) == 1
+    assert response.context["related_contents"][-1].pk == more.pk
+
+
 @pytest.mark.django_db
 def test_post_list_view_queryset(admin_client, default_config):
     """
@@ -213,6 +243,35 @@ def test_post_category_view(client, admin_user, default_config):
     assert f'<meta name="description" content="{category.meta_description}">' in content
 
 
+@pytest.mark.django_db
+def test_post_category_view_subcategories(client, admin_user, default_config, settings):
+    from .factories import PostCategoryFactory, PostContentFactory
+
+    category = PostCategoryFactory(app_config=default_config)
+    subcategory = PostCategoryFactory(app_config=default_config, parent=category)
+    post_contents = PostContentFactory.create_batch(2, post__app_config=default_config)
+    post_contents[0].post.categories.add(category)
+    post_contents[1].post.categories.add(category, subcategory)
+    publish_if_necessary(post_contents, admin_user)
+
+    url = reverse("djangocms_stories:posts-category", kwargs={"category": category.slug})
+    subcategory_url = reverse("djangocms_stories:posts-category", kwargs={"category": subcategory.slug})
+
+    response = client.get(subcategory_url)
+    assert list(response.context["postcontent_list"]) == [post_contents[1]]
+
+    settings.STORIES_CATEGORY_INCLUDE_SUBCATEGORIES = True
+    response = client.get(url)
+    assert set(response.context["postcontent_list"]) == set(post_contents)
+    post_contents[0].post.categories.set([subcategory])
+    response = client.get(url)
+    assert set(response.context["postcontent_list"]) == set(post_contents)
+
+    settings.STORIES_CATEGORY_INCLUDE_SUBCATEGORIES = False
+    response = client.get(url)
+    assert list(response.context["postcontent_list"]) == [post_contents[1]]
+
+
 @pytest.mark.django_db
 def test_post_category_view_404(client, default_config):
     url = reverse("djangocms_stories:posts-category", kwargs={"category": "This-Category-Does-Not-Exist"})
@@ -241,3 +300,50 @@ def test_post_category_list_view(client, default_config, assert_html_in_response
     for category in categories:
         assert_html_in_response(f'<section id="category-{category.slug}" class="category-item">', response)
         assert_html_in_response(f'<div class="category-header"><h3>{category.name}</h3></div>', response)
+
+
+@pytest.mark.django_db
+def test_post_detail_view_conditional_get(client, admin_user, post_content):
+    """Unchanged posts are answered with a 304, without rendering them"""
+    from cms.api import add_plugin
+
+    publish_if_necessary([post_content], admin_user)
+    url = reverse("djangocms_stories:post-detail", kwargs={"slug": post_content.slug})
+
+    response = client.get(url)
+    etag, last_modified = response["ETag"], response["Last-Modified"]
+
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert len([query for query in ctx.captured_queries if "djangocms_stories" in query["sql"]]) == 1
+    assert client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code == 304
+
+    content = post_content.post.postcontent_set(manager="admin_manager").latest_content().get(language="en")
+    add_plugin(content.content, "TextPlugin", "en", body="<p>Changed</p>")
+    post_placeholder_operation.send(sender=None, operation="add_plugin", placeholder=content.content)
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    admin_client = Client()
+    admin_client.force_login(admin_user)
+    etag = client.get(url)["ETag"]
+    response = admin_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert not response.has_header("ETag")
+
+
+@pytest.mark.django_db
+def test_post_list_view_conditional_get(client, admin_user, default_config):
+    from .factories import PostContentFactory
+
+    post_contents = PostContentFactory.create_batch(2, post__app_config=default_config)
+    publish_if_necessary(post_contents, admin_user)
+    url = reverse("djangocms_stories:posts-latest")
+
+    etag = client.get(url)["ETag"]
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    assert client.get(url, {"page": 1}, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    post_contents[0].title = "Changed title"
+    post_contents[0].save()
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200